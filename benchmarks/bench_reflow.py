@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+查看窗口网格重排基准：分别用 1k 和 10k 个条目的图片网格，
+反复改变窗口宽度，统计每次重排的耗时以及重排期间新提交的缩略图加载任务数。
+
+用法: python benchmarks/bench_reflow.py [条目数 ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtGui import QPixmap, QColor
+from PySide6.QtCore import QSize
+
+import gui_viewer
+
+WIDTHS = (800, 1024, 1280, 1600, 1920, 1366, 900, 640)
+
+def run(item_count, app):
+    requests = []
+    placeholder = QPixmap(*gui_viewer.THUMBNAIL_SIZE)
+    placeholder.fill(QColor("#888888"))
+
+    def request_thumbnail(key, name, path):
+        requests.append(key)
+        model.set_thumbnail(key, placeholder) # 模拟缩略图已在缓存中
+
+    model = gui_viewer.ScreenshotItemModel(request_thumbnail, key_index=1)
+    delegate = gui_viewer.ThumbnailDelegate(QSize(220, 190), QSize(*gui_viewer.THUMBNAIL_SIZE), "无法加载")
+    view = gui_viewer.ScreenshotGridView(model, delegate)
+    view.resize(WIDTHS[0], 700)
+    view.show()
+    model.set_items([(f"{i:06d}.png", f"/bench/{i:06d}.png") for i in range(item_count)])
+    view.reflow()
+    app.processEvents()
+
+    timings = []
+    requests_before = len(requests)
+    for width in WIDTHS:
+        view.resize(width, 700)
+        app.processEvents()
+        timings.append(view.reflow())
+        app.processEvents()
+    new_requests = len(requests) - requests_before
+    view.close()
+    return timings, new_requests
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000]
+    app = QApplication.instance() or QApplication(sys.argv)
+    for count in counts:
+        started = time.perf_counter()
+        timings, new_requests = run(count, app)
+        total = (time.perf_counter() - started) * 1000
+        print(f"{count} 项: 重排平均 {sum(timings) / len(timings):.2f}ms, 最大 {max(timings):.2f}ms, "
+              f"重排期间新加载任务 {new_requests} 个 (总耗时 {total:.0f}ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+截图与查看热路径的基准套件。只使用 capture_engine（合成画面 + 假截图后端），
+不需要 Windows、显示器或 PySide6，每次运行的输入都相同，结果可以和保存的基线比较。
+
+测量项目:
+- capture: 热键处理返回耗时（抓取 + 入队，即 nativeEvent 中的同步部分）和截图到文件延迟，
+  分别测量单次截图（每次等写盘完成）和连续截图（队列满时 block 背压）；
+- encode: 各输出格式在 1080p、1440p、4K、三屏 4K 下的单帧编码耗时和吞吐量；
+- thumbnails: 截图时由内存帧生成缩略图、以及重建缩略图缓存（解码已有文件）的吞吐量；
+- library: 1k/10k/100k 张截图的文件夹首次扫描、无变化时的重新扫描以及打开文件夹（查询目录）的耗时。
+
+用法:
+    python benchmarks/bench_suite.py                          # 运行全部，结果写入 bench_results.json 并与基线比较
+    python benchmarks/bench_suite.py --quick --only encode capture
+    python benchmarks/bench_suite.py --update-baseline        # 把本次结果保存为基线
+基线与机器相关，请在同一台机器上生成和比较。存在超过阈值的退化时退出码为 1。
+"""
+import os
+import sys
+import argparse
+import io
+import json
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from capture_engine import (
+    CaptureEngine, FakeCaptureBackend, MonitorInfo, LibraryCatalog, LatencyStats, LIBRARY_DB_NAME, configure_logging,
+    OUTPUT_FORMAT_NAMES, build_output_format, encode_thumbnail, percentile, synthetic_image,
+)
+
+RESOLUTIONS = {
+    "1080p": (1920, 1080),
+    "1440p": (2560, 1440),
+    "4k": (3840, 2160),
+    "3x4k": (3 * 3840, 2160),
+}
+LIBRARY_SIZES = (1000, 10000, 100000)
+SECTIONS = ("capture", "encode", "thumbnails", "library")
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+class Results:
+    """收集指标：名称 -> {value, unit, better}，better 为 lower / higher / None（只记录，不比较）。"""
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better="lower"):
+        self.metrics[name] = {"value": round(value, 3), "unit": unit, "better": better}
+        print(f"  {name}: {value:.2f} {unit}")
+
+    def add_latency(self, name, samples):
+        samples = sorted(samples)
+        self.add(f"{name}.p50", percentile(samples, 0.5), "ms")
+        self.add(f"{name}.p95", percentile(samples, 0.95), "ms")
+        self.add(f"{name}.max", samples[-1], "ms")
+
+def bench_capture(results, workdir, args):
+    print("[capture] 热键返回耗时与截图到文件延迟 (1440p, png)")
+    backend = FakeCaptureBackend([MonitorInfo(0, 0, *RESOLUTIONS["1440p"], "FAKE1")])
+    engine = CaptureEngine(root=os.path.join(workdir, "capture"), backend=backend, output_format="png")
+    shots = 5 if args.quick else 15
+    try:
+        engine.capture() # 预热：生成合成画面、创建缓冲、打开数据库
+        engine.wait_idle()
+        engine.pipeline.shot_to_file = LatencyStats("截图到文件延迟")
+        handler = []
+        for _ in range(shots):
+            started = time.perf_counter()
+            engine.capture(hotkey_time=started)
+            handler.append((time.perf_counter() - started) * 1000)
+            engine.wait_idle()
+        results.add_latency("capture.single.hotkey_return_ms", handler)
+        single = engine.pipeline.shot_to_file.summary()
+        results.add("capture.single.shot_to_file_ms.p50", single["p50"], "ms")
+
+        # 连续按键：队列满后 block 背压会让热键处理等待编码
+        engine.pipeline.shot_to_file = LatencyStats("截图到文件延迟")
+        handler = []
+        started_all = time.perf_counter()
+        for _ in range(shots):
+            started = time.perf_counter()
+            engine.capture(hotkey_time=started)
+            handler.append((time.perf_counter() - started) * 1000)
+        engine.wait_idle()
+        results.add_latency("capture.burst.hotkey_return_ms", handler)
+        burst = engine.pipeline.shot_to_file.summary()
+        results.add("capture.burst.shot_to_file_ms.p95", burst["p95"], "ms")
+        results.add("capture.burst.fps", shots / (time.perf_counter() - started_all), "fps", "higher")
+        results.add("capture.allocated_mb", engine.context.buffer_pool.stats()["allocated_mb"], "MB")
+    finally:
+        engine.close()
+
+def bench_encode(results, workdir, args):
+    resolutions = ("1080p", "4k") if args.quick else tuple(RESOLUTIONS)
+    repeat = 1 if args.quick else 3
+    for label in resolutions:
+        size = RESOLUTIONS[label]
+        print(f"[encode] {label} {size[0]}x{size[1]}")
+        image = synthetic_image(size)
+        megapixels = size[0] * size[1] / 1e6
+        for name in OUTPUT_FORMAT_NAMES:
+            output_format = build_output_format(name)
+            if output_format.name != name:
+                print(f"  {name}: 当前 Pillow 不支持，跳过")
+                continue
+            timings = []
+            for _ in range(repeat):
+                out = io.BytesIO()
+                started = time.perf_counter()
+                output_format.save(image, out)
+                timings.append(time.perf_counter() - started)
+            elapsed = statistics.median(timings)
+            results.add(f"encode.{name}.{label}.ms", elapsed * 1000, "ms")
+            results.add(f"encode.{name}.{label}.mpix_per_s", megapixels / elapsed, "MP/s", "higher")
+            results.add(f"encode.{name}.{label}.kb", len(out.getvalue()) / 1024, "KB", None)
+
+def bench_thumbnails(results, workdir, args):
+    print("[thumbnails] 缩略图生成吞吐量")
+    image = synthetic_image(RESOLUTIONS["1440p"])
+    count = 10 if args.quick else 30
+    started = time.perf_counter()
+    for _ in range(count):
+        encode_thumbnail(image)
+    results.add("thumbnails.from_frame.per_s", count / (time.perf_counter() - started), "张/秒", "higher")
+
+    # 重建缩略图缓存：从磁盘解码已有截图（JPEG 走降分辨率解码，PNG 需要完整解码）
+    source = synthetic_image(RESOLUTIONS["1080p"])
+    for pil_format, extension in (("PNG", ".png"), ("JPEG", ".jpg")):
+        root = os.path.join(workdir, f"thumbs_{extension[1:]}")
+        folder = os.path.join(root, "Game")
+        os.makedirs(folder)
+        source.save(os.path.join(folder, f"20240101_120000_000{extension}"), pil_format)
+        for index in range(1, count):
+            shutil.copyfile(os.path.join(folder, f"20240101_120000_000{extension}"),
+                            os.path.join(folder, f"20240101_120000_{index:03d}{extension}"))
+        engine = CaptureEngine(root=root, backend=FakeCaptureBackend())
+        try:
+            engine.folders()
+            result = engine.rebuild_thumbnails(workers=4)
+            results.add(f"thumbnails.rebuild_{extension[1:]}.per_s", result["built"] / result["elapsed"], "张/秒", "higher")
+        finally:
+            engine.close()
+
+def make_library(folder, count):
+    """生成 count 张极小的截图文件（1x1 PNG），文件名带时间戳，与真实截图目录结构相同。"""
+    os.makedirs(folder)
+    out = io.BytesIO()
+    Image.new('RGB', (1, 1)).save(out, "PNG")
+    data = out.getvalue()
+    for index in range(count):
+        seconds, millis = divmod(index, 1000)
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        name = f"20240101_{hours:02d}{minutes:02d}{seconds:02d}_{millis:03d}.png"
+        with open(os.path.join(folder, name), 'wb') as f:
+            f.write(data)
+
+def bench_library(results, workdir, args):
+    sizes = LIBRARY_SIZES[:2] if args.quick else LIBRARY_SIZES
+    for count in sizes:
+        print(f"[library] {count} 张截图的文件夹")
+        root = os.path.join(workdir, f"library_{count}")
+        make_library(os.path.join(root, "Game"), count)
+        catalog = LibraryCatalog(os.path.join(root, LIBRARY_DB_NAME))
+        try:
+            for label in ("first_scan_ms", "rescan_ms"): # 首次扫描登记所有文件；第二次文件夹没有变化，应当直接跳过
+                started = time.perf_counter()
+                catalog.reconcile()
+                results.add(f"library.{count}.{label}", (time.perf_counter() - started) * 1000, "ms")
+            timings = []
+            for _ in range(5):
+                started = time.perf_counter()
+                images = catalog.images("Game")
+                timings.append((time.perf_counter() - started) * 1000)
+            assert len(images) == count, (len(images), count)
+            results.add(f"library.{count}.open_folder_ms", statistics.median(timings), "ms")
+        finally:
+            catalog.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+def compare(metrics, baseline, threshold):
+    """与基线比较，返回退化的指标列表 [(名称, 基线值, 当前值, 变化比例)]。"""
+    regressions = []
+    print(f"\n与基线比较（阈值 {threshold:.0%}）:")
+    for name, metric in sorted(metrics.items()):
+        base = baseline.get(name)
+        if base is None or metric["better"] is None or not base["value"]:
+            continue
+        change = (metric["value"] - base["value"]) / base["value"]
+        worse = change > threshold if metric["better"] == "lower" else change < -threshold
+        if metric["unit"] == "ms" and abs(metric["value"] - base["value"]) < 1.0:
+            worse = False # 亚毫秒级的抖动不算退化
+        mark = "退化" if worse else ""
+        print(f"  {name}: {base['value']:.2f} -> {metric['value']:.2f} {metric['unit']} ({change:+.1%}) {mark}")
+        if worse:
+            regressions.append((name, base["value"], metric["value"], change))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="F10Capture 基准套件")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, help="只运行这些部分")
+    parser.add_argument("--quick", action="store_true", help="减少分辨率、文件数和重复次数，用于快速检查")
+    parser.add_argument("--output", default="bench_results.json", help="结果文件（默认 bench_results.json）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件（默认 benchmarks/baseline.json）")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写入基线文件")
+    parser.add_argument("--threshold", type=float, default=0.15, help="判定退化的变化比例，默认 0.15")
+    args = parser.parse_args()
+    configure_logging("off") # 按发布配置测量，引擎不输出任何日志
+
+    results = Results()
+    workdir = tempfile.mkdtemp(prefix="f10bench_")
+    try:
+        for section in args.only or SECTIONS:
+            globals()[f"bench_{section}"](results, workdir, args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pillow": Image.__version__,
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "metrics": results.metrics,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f).get("metrics", {})
+        baseline.update(results.metrics) # 只运行部分项目时保留其他项目的基线
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"meta": report["meta"], "metrics": baseline}, f, ensure_ascii=False, indent=2)
+        print(f"基线已更新: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"没有基线文件 {args.baseline}，使用 --update-baseline 生成。")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get("meta", {}).get("quick") != args.quick:
+        print("警告: 基线与本次运行的 --quick 设置不同，结果可能不可比。")
+    regressions = compare(results.metrics, baseline.get("metrics", {}), args.threshold)
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项退化。")
+        return 1
+    print("\n没有发现退化。")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
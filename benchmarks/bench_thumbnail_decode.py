@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+缩略图解码基准：对比原来的 "Qt 完整解码 + QPixmap 平滑缩放"（在GUI线程中）和
+decode_thumbnail（JPEG 用 draft 降分辨率解码，其余格式解码为 QImage 后缩小，可在工作线程中执行）两种方式，
+按格式统计每秒能生成的缩略图数量。不读写缩略图缓存。
+
+用法: python benchmarks/bench_thumbnail_decode.py [每种格式的图片数]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+from PySide6.QtWidgets import QApplication
+from PySide6.QtGui import QPixmap
+from PySide6.QtCore import Qt, QSize
+
+import capture_engine
+import gui_viewer
+
+FORMATS = (("PNG", ".png"), ("JPEG", ".jpg"), ("WEBP", ".webp"))
+SCREEN_SIZE = (1920, 1080)
+
+def make_images(directory, count):
+    """生成类似游戏截图的测试图片：渐变背景加一些色块。"""
+    base = Image.linear_gradient('L').resize(SCREEN_SIZE).convert('RGB')
+    paths = {}
+    for pil_format, extension in FORMATS:
+        paths[pil_format] = []
+        for i in range(count):
+            image = base.copy()
+            draw = ImageDraw.Draw(image)
+            for j in range(40):
+                x, y = (i * 97 + j * 131) % SCREEN_SIZE[0], (i * 53 + j * 71) % SCREEN_SIZE[1]
+                draw.rectangle((x, y, x + 120, y + 80), fill=((i * 40 + j * 7) % 256, j * 6 % 256, 200))
+            path = os.path.join(directory, f"{i:03d}{extension}")
+            image.save(path, pil_format)
+            paths[pil_format].append(path)
+    return paths
+
+def pil_reduce_path(path, size):
+    """PIL 完整解码 + reduce() 盒式缩小，作为对照。"""
+    with Image.open(path) as image:
+        target = capture_engine.fit_size(image.size, (size.width(), size.height()))
+        image = image.reduce(max(1, min(image.width // target[0], image.height // target[1])))
+        return QPixmap.fromImage(gui_viewer.pil_to_qimage(capture_engine.shrink_image(image.convert('RGB'), (size.width(), size.height()))))
+
+def old_path(path, size):
+    pixmap = QPixmap.fromImage(gui_viewer.load_qimage(path))
+    return pixmap.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+def new_path(path, size):
+    return QPixmap.fromImage(gui_viewer.decode_thumbnail(path, (size.width(), size.height())))
+
+def images_per_second(decode, paths, size):
+    started = time.perf_counter()
+    for path in paths:
+        decode(path, size)
+    return len(paths) / (time.perf_counter() - started)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    app = QApplication.instance() or QApplication(sys.argv)
+    size = QSize(*gui_viewer.THUMBNAIL_SIZE)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_images(directory, count)
+        for pil_format, _ in FORMATS:
+            old = images_per_second(old_path, paths[pil_format], size)
+            new = images_per_second(new_path, paths[pil_format], size)
+            reduce = images_per_second(pil_reduce_path, paths[pil_format], size)
+            print(f"{pil_format}: 原方式 {old:.1f} 张/秒, decode_thumbnail {new:.1f} 张/秒 ({new / old:.1f}x), "
+                  f"PIL reduce {reduce:.1f} 张/秒")
+    app.processEvents()
+
+if __name__ == "__main__":
+    main()
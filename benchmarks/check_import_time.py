@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+检查启动路径的导入耗时预算。用 `python -X importtime` 在子进程中导入模块，
+取多次运行的中位数与预算比较，并确认启动时不需要的重量级依赖没有被提前导入。
+
+- capture_engine: 任何平台都可以检查；
+- gui_app: 依赖 PySide6 和 pywin32。没有 pywin32 的平台（Linux CI）上用空模块代替 win32 模块，
+  这些模块在 Windows 上也几乎不占导入时间，测得的仍是 gui_app 自身和 Qt 的导入耗时。
+  查看窗口（gui_viewer）和设置窗口（gui_settings）只在第一次打开时导入，启动时不应出现。
+
+用法:
+    python benchmarks/check_import_time.py
+    python benchmarks/check_import_time.py --runs 10 --budget-scale 1.5   # 较慢的机器放宽预算
+超出预算、提前导入了禁止的模块或者无法导入时退出码为 1。tests/test_import_time.py 在 pytest 中执行同样的检查。
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WIN32_MODULES = ("win32api", "win32gui", "win32con", "win32process", "win32event", "winerror")
+
+# 模块 -> (导入耗时预算 ms, 启动时不应导入的模块, 无法导入时用空模块代替的模块)
+TARGETS = {
+    "capture_engine": (80, ("PIL", "psutil", "pynput", "playsound", "PySide6", "win32api", "argparse"), ()),
+    "gui_app": (450, ("PIL", "psutil", "pynput", "playsound", "screeninfo", "gui_viewer", "gui_settings"), WIN32_MODULES),
+}
+
+# 在导入被测模块之前执行：找不到的模块用空模块代替，任何属性都返回 0（win32con 的常量在导入时就会用到）
+STUB_PRELUDE = """
+import importlib.util, sys, types
+for name in {stubs!r}:
+    if importlib.util.find_spec(name) is None:
+        stub = types.ModuleType(name)
+        stub.__getattr__ = lambda attr: 0
+        sys.modules[name] = stub
+"""
+
+class ImportFailed(Exception):
+    pass
+
+def measure(module, stubs=()):
+    """导入一次 module，返回 (累计导入耗时 ms, 导入过的模块名集合)；无法导入时抛出 ImportFailed。"""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None) # 与正常运行一样使用 .pyc 缓存
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    code = (STUB_PRELUDE.format(stubs=tuple(stubs)) if stubs else "") + f"import {module}"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=ROOT, env=env, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise ImportFailed(errors[-1] if errors else f"退出码 {result.returncode}")
+    total_ms = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue # 表头
+        imported.add(name.strip())
+        if name.strip() == module and not name[1:].startswith(" "):
+            total_ms = int(cumulative) / 1000
+    return total_ms, imported
+
+def check(module, budget_ms, forbidden, stubs=(), runs=5):
+    """测量 module 的导入耗时并输出结果，返回是否在预算内。无法导入也算未通过，不会跳过。"""
+    try:
+        measure(module, stubs) # 第一次运行会生成 .pyc，不计入结果
+        samples = []
+        for _ in range(runs):
+            total_ms, imported = measure(module, stubs)
+            samples.append(total_ms)
+    except ImportFailed as e:
+        print(f"{module}: 无法导入，未通过: {e}")
+        return False
+    median = statistics.median(samples)
+    eager = sorted(name for name in forbidden if name in imported)
+    ok = median <= budget_ms and not eager
+    print(f"{module}: 导入耗时中位数 {median:.1f}ms（预算 {budget_ms:.0f}ms），"
+          f"共导入 {len(imported)} 个模块 {'OK' if ok else '未通过'}")
+    if eager:
+        print(f"  启动时不应导入: {', '.join(eager)}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="检查启动路径的导入耗时预算")
+    parser.add_argument("--runs", type=int, default=5, help="每个模块测量的次数，默认 5")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="预算倍数，较慢的机器可以适当放宽")
+    parser.add_argument("--only", nargs="+", choices=list(TARGETS), help="只检查这些模块")
+    args = parser.parse_args()
+
+    ok = True
+    for module in args.only or TARGETS:
+        budget_ms, forbidden, stubs = TARGETS[module]
+        ok &= check(module, budget_ms * args.budget_scale, forbidden, stubs, max(1, args.runs))
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
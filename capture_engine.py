@@ -0,0 +1,2627 @@
+"""
+截图引擎：不依赖 Qt 界面的截图、编码、缩略图缓存和截图库逻辑。
+托盘程序（gui_app.py）和命令行都使用这里的类；像素来源由可替换的截图后端决定，
+导入本模块时不会加载 win32、pynput 或 PySide6，因此在 Linux 上也可以用假后端或 Xvfb 跑通整条流水线。
+
+命令行用法示例:
+    python capture_engine.py capture --backend fake --count 5
+    python capture_engine.py folders
+    python capture_engine.py images 某个进程文件夹
+    python capture_engine.py rebuild-thumbnails
+    python capture_engine.py stats
+"""
+import os
+import sys
+import atexit
+import collections
+import contextlib
+import ctypes
+import datetime
+import importlib
+import io
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sqlite3
+import threading
+import time
+
+class LazyModule:
+    """
+    第一次访问属性时才导入的模块代理。托盘程序启动时只需要注册热键和显示图标，
+    Pillow、psutil 这类较重的依赖推迟到第一次截图或打开查看窗口时再加载。
+    可以在多个线程中同时访问；load() 可用于在后台提前加载。
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+Image = LazyModule("PIL.Image")
+
+CONFIG_FILE = "config.ini"
+BASE_SCREENSHOT_DIR = "ScreenShots"
+
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "spill")
+# 截图范围: cursor 只截鼠标所在显示器；stitched 截所有显示器并拼成一张虚拟桌面图片；per_monitor 每个显示器各存一张
+CAPTURE_MODES = ("cursor", "stitched", "per_monitor")
+OUTPUT_FORMAT_NAMES = ("png", "webp", "qoi", "raw")
+
+THUMBNAIL_SIZE = (200, 150) # 图片列表中缩略图的尺寸
+THUMBNAIL_DB_NAME = ".f10_thumbnails.db" # 缩略图缓存数据库，位于截图根目录
+LIBRARY_DB_NAME = ".f10_library.db" # 截图库目录数据库，位于截图根目录
+
+# 查看窗口能识别的图片扩展名
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.qoi')
+# raw 快速转储文件的后缀，转码为 PNG 后删除
+RAW_DUMP_SUFFIX = ".raw.bmp"
+
+# 各子系统的日志记录器，统一挂在 "f10" 下，由 configure_logging 配置级别和输出。
+# 消息一律用 %s 占位符传参：级别关闭时调用直接返回，不会格式化字符串。
+capture_log = logging.getLogger("f10.capture")
+pipeline_log = logging.getLogger("f10.pipeline")
+replay_log = logging.getLogger("f10.replay")
+library_log = logging.getLogger("f10.library")
+thumbnail_log = logging.getLogger("f10.thumbnails")
+trace_log = logging.getLogger("f10.trace")
+config_log = logging.getLogger("f10.config")
+sound_log = logging.getLogger("f10.sound")
+
+LOG_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "off": logging.CRITICAL + 1, # 发布配置：不输出任何日志
+}
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+_log_listener = None
+
+def _stop_log_listener():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop() # 写完队列中剩余的记录
+        _log_listener = None
+
+def configure_logging(level="info", log_file=None, console=True, stream=None):
+    """
+    配置所有 "f10.*" 日志记录器，可以重复调用（设置变化后重新配置）。
+    低于 level 的日志在调用处就被丢弃；控制台和文件输出都经过队列交给后台线程，
+    截图线程只负责把记录放进队列，不做任何 I/O。level 为 "off" 且不写文件时完全静默。
+    """
+    root = logging.getLogger("f10")
+    _stop_log_listener()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.propagate = False
+    root.setLevel(LOG_LEVELS.get(level, logging.INFO))
+
+    handlers = []
+    if console:
+        stream = stream if stream is not None else sys.stderr
+        if stream is not None: # pythonw 下没有控制台，sys.stderr 为 None
+            console_handler = logging.StreamHandler(stream)
+            console_handler.setFormatter(logging.Formatter("%(message)s"))
+            handlers.append(console_handler)
+    if log_file and level != "off":
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+            file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(threadName)s [%(name)s] %(message)s"))
+            handlers.append(file_handler)
+        except OSError as e:
+            # 此时日志还没配置好，直接写到标准错误
+            if sys.stderr is not None:
+                sys.stderr.write(f"打开日志文件 {log_file} 失败: {e}\n")
+    if not handlers or level == "off":
+        # 没有任何输出时也要挂一个处理器，否则 logging 会把警告打印到 stderr
+        root.addHandler(logging.NullHandler())
+        return
+
+    global _log_listener
+    log_queue = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+
+atexit.register(_stop_log_listener)
+
+def percentile(sorted_samples, fraction):
+    """已排序样本的百分位数（最近秩法），fraction 取 0-1。"""
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+class CaptureTrace:
+    """
+    一次截图的分阶段耗时记录。各阶段用单调时钟（perf_counter）记录开始和结束时间，
+    保存为相对热键按下时刻的毫秒数；info 中记录帧尺寸、输出字节数等附加信息。
+    各阶段可能在热键线程、编码线程和线程池中记录，所有持有者都 release() 之后才算完成。
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, started=None):
+        self.id = next(self._ids)
+        self.started = started if started is not None else time.perf_counter()
+        self.wall_time = time.time()
+        self.stages = [] # [(阶段名, 开始ms, 耗时ms)]
+        self.info = {}
+        self._refs = 1
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, start, time.perf_counter())
+
+    def add_stage(self, name, start, end):
+        with self._lock: # 多显示器截图时各显示器在不同线程中同时记录
+            self.stages.append((name, (start - self.started) * 1000, (end - start) * 1000))
+
+    def set(self, **info):
+        self.info.update(info)
+
+    def hold(self):
+        """还有阶段要在其他线程中记录（例如保存图标），完成后调用 release()。"""
+        with self._lock:
+            self._refs += 1
+
+    def release(self):
+        """释放一个持有者，返回该记录是否已经完整。"""
+        with self._lock:
+            self._refs -= 1
+            return self._refs == 0
+
+    def total_ms(self):
+        return max((start + duration for _, start, duration in self.stages), default=0.0)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "time": datetime.datetime.fromtimestamp(self.wall_time).isoformat(timespec='milliseconds'),
+            "total_ms": round(self.total_ms(), 3),
+            "stages": [{"name": name, "start_ms": round(start, 3), "ms": round(duration, 3)}
+                       for name, start, duration in self.stages],
+            **self.info,
+        }
+
+class _NullTrace:
+    """不需要记录时使用的空记录。"""
+    def stage(self, name):
+        return contextlib.nullcontext()
+
+    def add_stage(self, name, start, end):
+        pass
+
+    def set(self, **info):
+        pass
+
+NULL_TRACE = _NullTrace()
+
+class TraceRecorder:
+    """
+    保存最近 capacity 次截图的分阶段记录（环形缓冲），可选地把每条记录追加到 JSONL 文件，
+    并按阶段汇总 p50/p95/p99。
+    """
+    def __init__(self, capacity=500, jsonl_path=None):
+        self._traces = collections.deque(maxlen=max(1, capacity))
+        self.jsonl_path = jsonl_path or None
+        self._lock = threading.Lock()
+        self._write_failed = False
+
+    def configure(self, capacity=None, jsonl_path=None):
+        """修改缓冲容量和 JSONL 文件（空字符串表示不写文件），保留已有记录。"""
+        with self._lock:
+            if capacity is not None and capacity != self._traces.maxlen:
+                self._traces = collections.deque(self._traces, maxlen=max(1, capacity))
+            if jsonl_path is not None:
+                self.jsonl_path = jsonl_path or None
+                self._write_failed = False
+
+    def finish(self, trace):
+        """一个持有者完成记录；所有持有者都完成后把记录放入缓冲并写入 JSONL 文件。"""
+        if not trace.release():
+            return
+        with self._lock:
+            self._traces.append(trace)
+            path = self.jsonl_path
+            if not path or self._write_failed:
+                return
+            try:
+                with open(path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+            except OSError as e:
+                # 只提示一次，避免每次截图都刷屏
+                self._write_failed = True
+                trace_log.warning("写入截图耗时记录 %s 失败: %s", path, e)
+
+    def traces(self):
+        with self._lock:
+            return list(self._traces)
+
+    def summary(self):
+        """返回 {阶段名: {count, p50, p95, p99, max}}，"total" 为整次截图的耗时，按各阶段首次出现的顺序排列。"""
+        samples = {}
+        traces = self.traces()
+        if not traces:
+            return {}
+        for trace in traces:
+            for name, _, duration in trace.stages:
+                samples.setdefault(name, []).append(duration)
+            samples.setdefault("total", []).append(trace.total_ms())
+        samples["total"] = samples.pop("total") # 整次截图的耗时放在最后
+        result = {}
+        for name, values in samples.items():
+            values.sort()
+            result[name] = {"count": len(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95),
+                            "p99": percentile(values, 0.99), "max": values[-1]}
+        return result
+
+    def format_summary(self):
+        summary = self.summary()
+        if not summary:
+            return "暂无截图耗时记录。"
+        lines = [f"最近 {summary['total']['count']} 次截图的各阶段耗时 (ms):",
+                 f"{'阶段':<10}{'次数':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'最大':>9}"]
+        for name, s in summary.items():
+            lines.append(f"{name:<10}{s['count']:>6}{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}{s['max']:>9.1f}")
+        return "\n".join(lines)
+
+class CaptureBackend:
+    """
+    截图后端接口。CaptureContext 只通过这些方法访问系统，
+    因此缓存与失效逻辑可以用一个假的后端在非 Windows 平台上测试。
+    name 是在日志和统计中显示的后端名称。
+    """
+    name = "截图后端"
+
+    def topology_signature(self):
+        """返回一个廉价计算的显示器布局签名，布局变化时签名必须变化。"""
+        raise NotImplementedError
+
+    def enumerate_monitors(self):
+        """返回显示器列表，每项至少包含 x、y、width、height 属性。"""
+        raise NotImplementedError
+
+    def create_surface(self, monitor):
+        """为指定显示器创建可重复使用的抓取资源（DC、位图等）。"""
+        raise NotImplementedError
+
+    def grab(self, surface, monitor, buffer):
+        """把显示器当前画面抓取到 surface 中，并将 BGRX 原始数据原地写入 buffer（可写的 bytearray）。"""
+        raise NotImplementedError
+
+    def release_surface(self, surface):
+        """释放 create_surface 创建的资源。"""
+        raise NotImplementedError
+
+class GdiSurface:
+    """单个显示器的 GDI 抓取资源：桌面DC、兼容内存DC和位图。"""
+    def __init__(self, hdesktop, desktop_dc, img_dc, mem_dc, bitmap):
+        self.hdesktop = hdesktop
+        self.desktop_dc = desktop_dc
+        self.img_dc = img_dc
+        self.mem_dc = mem_dc
+        self.bitmap = bitmap
+
+class GdiCaptureBackend(CaptureBackend):
+    """
+    基于 Windows GDI（BitBlt）的截图后端。win32 模块在创建后端时才导入。
+    """
+    name = "Windows API"
+
+    def __init__(self):
+        import win32api, win32con, win32gui, win32ui
+        self._win32api, self._win32con, self._win32gui, self._win32ui = win32api, win32con, win32gui, win32ui
+        # 直接调用 gdi32.GetBitmapBits，把像素写入调用方提供的缓冲区，
+        # 避免 pywin32 的 GetBitmapBits(True) 每次返回一个新的 bytes 对象
+        self._gdi32 = ctypes.windll.gdi32
+        self._gdi32.GetBitmapBits.argtypes = [ctypes.c_void_p, ctypes.c_long, ctypes.c_void_p]
+        self._gdi32.GetBitmapBits.restype = ctypes.c_long
+
+    def topology_signature(self):
+        # GetSystemMetrics 的开销远小于 get_monitors()，适合每次截图时检查
+        win32api, win32con = self._win32api, self._win32con
+        return (
+            win32api.GetSystemMetrics(win32con.SM_CMONITORS),
+            win32api.GetSystemMetrics(win32con.SM_XVIRTUALSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_YVIRTUALSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_CXVIRTUALSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_CYVIRTUALSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_CXSCREEN),
+            win32api.GetSystemMetrics(win32con.SM_CYSCREEN),
+        )
+
+    def enumerate_monitors(self):
+        from screeninfo import get_monitors
+        return get_monitors()
+
+    def create_surface(self, monitor):
+        win32gui, win32ui = self._win32gui, self._win32ui
+        hdesktop = win32gui.GetDesktopWindow()
+        desktop_dc = win32gui.GetWindowDC(hdesktop)
+        img_dc = win32ui.CreateDCFromHandle(desktop_dc)
+        mem_dc = img_dc.CreateCompatibleDC()
+        bitmap = win32ui.CreateBitmap()
+        bitmap.CreateCompatibleBitmap(img_dc, monitor.width, monitor.height)
+        mem_dc.SelectObject(bitmap)
+        return GdiSurface(hdesktop, desktop_dc, img_dc, mem_dc, bitmap)
+
+    def grab(self, surface, monitor, buffer):
+        surface.mem_dc.BitBlt((0, 0), (monitor.width, monitor.height),
+                              surface.img_dc, (monitor.x, monitor.y), self._win32con.SRCCOPY)
+        c_buffer = (ctypes.c_char * len(buffer)).from_buffer(buffer)
+        copied = self._gdi32.GetBitmapBits(surface.bitmap.GetHandle(), len(buffer), c_buffer)
+        if copied != len(buffer):
+            raise OSError(f"GetBitmapBits 只复制了 {copied}/{len(buffer)} 字节")
+
+    def release_surface(self, surface):
+        win32gui = self._win32gui
+        try:
+            win32gui.DeleteObject(surface.bitmap.GetHandle())
+            surface.mem_dc.DeleteDC()
+            surface.img_dc.DeleteDC()
+            win32gui.ReleaseDC(surface.hdesktop, surface.desktop_dc)
+        except Exception as e:
+            capture_log.warning("释放截图资源失败: %s", e)
+
+def get_peak_rss():
+    """
+    返回当前进程的峰值常驻内存（字节），无法获取时返回 0。
+    """
+    try:
+        import psutil
+        mem = psutil.Process().memory_info()
+        # Windows 上是 peak_wset；其他平台退回到当前 RSS
+        return getattr(mem, 'peak_wset', mem.rss)
+    except Exception:
+        return 0
+
+class FrameBuffer:
+    """
+    帧缓冲池中的一块可重复使用的 BGRX 像素内存。
+    """
+    __slots__ = ('size', 'data', 'view')
+
+    def __init__(self, size):
+        self.size = size
+        self.data = bytearray(size[0] * size[1] * 4)
+        self.view = memoryview(self.data)
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+class FrameBufferPool:
+    """
+    按分辨率预分配并复用的帧缓冲池。
+    截图直接写入池中的缓冲区，编码完成后归还，连拍时不再为每一帧分配几十 MB 内存。
+    """
+    def __init__(self, max_free_per_size=4, max_sizes=4):
+        self.max_free_per_size = max_free_per_size
+        self.max_sizes = max_sizes # 最多保留多少种分辨率的空闲缓冲
+        self._free = collections.OrderedDict() # size -> [FrameBuffer]
+        self._lock = threading.Lock()
+        self.allocated_bytes = 0 # 累计新分配的字节数
+        self.allocations = 0
+        self.reuses = 0
+        self.outstanding = 0
+
+    def acquire(self, size):
+        """
+        取得一块 size=(宽, 高) 的缓冲区。返回 (buffer, 本次新分配的字节数)。
+        """
+        with self._lock:
+            self.outstanding += 1
+            free = self._free.get(size)
+            if free:
+                self._free.move_to_end(size)
+                self.reuses += 1
+                return free.pop(), 0
+        buffer = FrameBuffer(size)
+        with self._lock:
+            self.allocations += 1
+            self.allocated_bytes += buffer.nbytes
+        return buffer, buffer.nbytes
+
+    def release(self, buffer):
+        """把缓冲区归还到池中。"""
+        with self._lock:
+            self.outstanding -= 1
+            free = self._free.setdefault(buffer.size, [])
+            self._free.move_to_end(buffer.size)
+            if len(free) < self.max_free_per_size:
+                free.append(buffer)
+            # 分辨率变化后，丢弃最久未使用的分辨率的空闲缓冲
+            while len(self._free) > self.max_sizes:
+                self._free.popitem(last=False)
+
+    def preallocate(self, size, count):
+        """为指定分辨率预先分配 count 块缓冲。"""
+        for _ in range(count):
+            buffer, _ = self.acquire(size)
+            self.release(buffer)
+
+    def stats(self):
+        with self._lock:
+            free_bytes = sum(b.nbytes for bufs in self._free.values() for b in bufs)
+            return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "allocated_mb": self.allocated_bytes / (1024 * 1024),
+                "free_mb": free_bytes / (1024 * 1024),
+                "outstanding": self.outstanding,
+            }
+
+class CaptureContext:
+    """
+    持久的截图上下文：缓存显示器布局以及每个显示器的抓取资源，
+    只有在显示布局变化（WM_DISPLAYCHANGE 或布局签名不一致）时才重建。
+    """
+    def __init__(self, backend, buffer_pool=None):
+        self.backend = backend
+        self.buffer_pool = buffer_pool or FrameBufferPool()
+        self._lock = threading.Lock()
+        self._signature = None
+        self._monitors = []
+        self._surfaces = {} # 显示器下标 -> surface
+        self._executor = None # 并行抓取所有显示器的线程池，第一次使用时创建
+        self._executor_size = 0
+        self.rebuild_count = 0
+
+    def invalidate(self):
+        """丢弃缓存的布局和资源，下次截图时重建。"""
+        with self._lock:
+            self._release_all_locked()
+            self._signature = None
+
+    def close(self):
+        self.invalidate()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _release_all_locked(self):
+        for surface in self._surfaces.values():
+            self.backend.release_surface(surface)
+        self._surfaces = {}
+        self._monitors = []
+
+    def _ensure_topology_locked(self):
+        """检查显示器布局，返回是否重建了布局。"""
+        signature = self.backend.topology_signature()
+        if signature == self._signature and self._monitors:
+            return False
+        self._release_all_locked()
+        self._monitors = list(self.backend.enumerate_monitors())
+        self._signature = signature
+        self.rebuild_count += 1
+        capture_log.info("显示器布局已更新，共 %s 个显示器。", len(self._monitors))
+        return True
+
+    def monitors(self):
+        with self._lock:
+            self._ensure_topology_locked()
+            return list(self._monitors)
+
+    def _monitor_index_at_locked(self, x, y):
+        for i, m in enumerate(self._monitors):
+            if m.x <= x < m.x + m.width and m.y <= y < m.y + m.height:
+                return i
+        # 如果鼠标不在任何已知显示器上，则默认截取主显示器
+        return 0 if self._monitors else None
+
+    def grab_at(self, x, y, trace=NULL_TRACE):
+        """
+        抓取坐标 (x, y) 所在显示器的画面。
+        返回 (FrameBuffer, 本次新分配的字节数, monitor)；没有任何显示器时返回 None。
+        缓冲区来自 buffer_pool，使用完毕后需要归还。
+        trace 记录 topology（检查/重建显示器布局）、surface（创建抓取资源）和 grab（抓取像素）阶段。
+        """
+        with self._lock:
+            with trace.stage("topology"):
+                if self._ensure_topology_locked():
+                    trace.set(topology_rebuilt=True)
+            index = self._monitor_index_at_locked(x, y)
+            if index is None:
+                return None
+            return self._grab_index_locked(index, trace)
+
+    def grab_all(self, trace=NULL_TRACE):
+        """
+        同时抓取所有显示器的画面。返回 [(FrameBuffer, 本次新分配的字节数, monitor)]，顺序与显示器列表相同，
+        没有任何显示器时返回空列表。每个显示器使用各自缓存的抓取资源，在常驻线程中并行抓取，
+        总耗时接近抓取单个显示器。任何一个显示器失败时归还已抓取的缓冲区并抛出异常。
+        trace 记录 topology、surface 和 grab（所有显示器都抓取完成）阶段，
+        以及每个显示器各自的 grab_M1、grab_M2… 阶段。
+        """
+        with self._lock:
+            with trace.stage("topology"):
+                if self._ensure_topology_locked():
+                    trace.set(topology_rebuilt=True)
+            count = len(self._monitors)
+            if count <= 1:
+                return [self._grab_index_locked(0, trace)] if count else []
+            missing = [index for index in range(count) if index not in self._surfaces]
+            if missing:
+                with trace.stage("surface"):
+                    for index in missing:
+                        self._surfaces[index] = self.backend.create_surface(self._monitors[index])
+            if self._executor is None or self._executor_size < count:
+                from concurrent.futures import ThreadPoolExecutor
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                self._executor = ThreadPoolExecutor(max_workers=count, thread_name_prefix="MonitorGrab")
+                self._executor_size = count
+            results = []
+            error = None
+            with trace.stage("grab"):
+                futures = [self._executor.submit(self._grab_index_locked, index, trace, f"_M{index + 1}")
+                           for index in range(count)]
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as e:
+                        error = error or e
+            if error is not None:
+                for buffer, _, _ in results:
+                    self.buffer_pool.release(buffer)
+                raise error
+            return results
+
+    def _grab_index_locked(self, index, trace=NULL_TRACE, suffix=""):
+        # suffix 加在阶段名后面，用于区分并行抓取的各个显示器
+        monitor = self._monitors[index]
+        surface = self._surfaces.get(index)
+        if surface is None:
+            with trace.stage("surface" + suffix):
+                surface = self.backend.create_surface(monitor)
+            self._surfaces[index] = surface
+        buffer, allocated = self.buffer_pool.acquire((monitor.width, monitor.height))
+        try:
+            try:
+                with trace.stage("grab" + suffix):
+                    self.backend.grab(surface, monitor, buffer.data)
+            except Exception as e:
+                # 资源可能已失效（例如锁屏、切换会话），重建一次后重试
+                capture_log.warning("使用缓存的截图资源失败: %s，重建后重试。", e)
+                self.backend.release_surface(surface)
+                with trace.stage("surface" + suffix):
+                    surface = self.backend.create_surface(monitor)
+                self._surfaces[index] = surface
+                with trace.stage("grab" + suffix):
+                    self.backend.grab(surface, monitor, buffer.data)
+        except Exception:
+            self.buffer_pool.release(buffer)
+            raise
+        return buffer, allocated, monitor
+
+class OutputFormat:
+    """
+    截图的输出格式：扩展名以及传给 PIL 的保存参数。
+    deferred 为 True 表示文件先以未压缩形式写出，之后由后台任务转码为 PNG。
+    """
+    def __init__(self, name, extension, pil_format, save_options=None, deferred=False):
+        self.name = name
+        self.extension = extension
+        self.pil_format = pil_format
+        self.save_options = save_options or {}
+        self.deferred = deferred
+
+    def save(self, image, filename):
+        image.save(filename, self.pil_format, **self.save_options)
+
+_format_support = {}
+
+def _pil_can_save(pil_format):
+    if pil_format not in _format_support:
+        Image.init()
+        _format_support[pil_format] = pil_format in Image.SAVE
+    return _format_support[pil_format]
+
+def build_output_format(name, png_compress_level=6):
+    """
+    根据格式名称构造 OutputFormat。当前 Pillow 不支持的格式回退为 PNG。
+    """
+    if name == "webp":
+        if _pil_can_save("WEBP"):
+            # method=0 是最快的无损 WebP 编码
+            return OutputFormat("webp", ".webp", "WEBP", {"lossless": True, "method": 0, "quality": 0})
+        pipeline_log.warning("当前Pillow不支持WebP编码，改用PNG。")
+    elif name == "qoi":
+        if _pil_can_save("QOI"):
+            return OutputFormat("qoi", ".qoi", "QOI")
+        pipeline_log.warning("当前Pillow不支持QOI编码，改用PNG。")
+    elif name == "raw":
+        # 未压缩的BMP写出最快，查看窗口也能直接显示
+        return OutputFormat("raw", RAW_DUMP_SUFFIX, "BMP", deferred=True)
+    return OutputFormat("png", ".png", "PNG", {"compress_level": png_compress_level})
+
+_filename_lock = threading.Lock()
+_last_filename_stem = None
+_filename_counter = 0
+
+def make_screenshot_filename(screenshot_dir, extension, when=None):
+    """
+    生成精确到毫秒且不会重复的截图文件名，例如 20231026_143000_123.png。
+    同一毫秒内的多次截图以及磁盘上已有的同名文件会追加序号。
+    when 为截图时间（datetime），默认为当前时间。
+    """
+    global _last_filename_stem, _filename_counter
+    stem = (when or datetime.datetime.now()).strftime("%Y%m%d_%H%M%S_%f")[:-3]
+    with _filename_lock:
+        if stem == _last_filename_stem:
+            _filename_counter += 1
+        else:
+            _last_filename_stem = stem
+            _filename_counter = 0
+        counter = _filename_counter
+        while True:
+            name = stem if counter == 0 else f"{stem}_{counter}"
+            filename = os.path.join(screenshot_dir, f"{name}{extension}")
+            if not os.path.exists(filename):
+                break
+            counter += 1
+        _filename_counter = counter
+    return filename
+
+class CaptureTarget:
+    """
+    一次截图的目标：鼠标位置、前景进程以及保存目录和格式。连拍时所有帧共用同一个目标。
+    """
+    def __init__(self, mouse_x, mouse_y, process_name, screenshot_dir, output_format):
+        self.mouse_x = mouse_x
+        self.mouse_y = mouse_y
+        self.process_name = process_name
+        self.screenshot_dir = screenshot_dir
+        self.output_format = output_format
+
+class CaptureFrame:
+    """
+    一帧已经抓取、但尚未编码保存的截图。
+    Windows API 抓取到的是帧缓冲池中的原始 BGRX 像素（buffer），ImageGrab 回退路径得到的是 PIL 图像（image）。
+    当流水线采用 spill 策略时，原始像素会被临时写入磁盘（spill_path），缓冲区立即归还，编码时再读回。
+    """
+    def __init__(self, process_name, screenshot_dir, filename, buffer=None, buffer_pool=None, image=None, hotkey_time=None, output_format=None, trace=None):
+        self.process_name = process_name
+        self.screenshot_dir = screenshot_dir
+        self.filename = filename
+        self.output_format = output_format or build_output_format("png")
+        self.buffer = buffer
+        self.buffer_pool = buffer_pool
+        self.size = buffer.size if buffer is not None else None
+        self.image = image
+        self.parts = None # 拼接的帧: [(FrameBuffer, 在画面中的左上角坐标)]，size 为整个虚拟桌面的大小
+        self._spilled_parts = None # 拼接的帧写入临时文件后记录各部分的大小和位置
+        self.spill_path = None
+        self.allocated_bytes = 0 # 抓取本帧时帧缓冲池新分配的字节数
+        self.post_process = True # 是否保存进程图标并播放音效（连拍时只有第一帧需要）
+        self.monitor = None # 抓取的显示器（名称或左上角坐标），ImageGrab 全屏回退时为 "all"
+        self.queued_at = None # 进入流水线队列的时间
+        self.hotkey_time = hotkey_time if hotkey_time is not None else time.perf_counter()
+        # 本帧的分阶段耗时记录，热键处理中已经开始记录时沿用同一个
+        self.trace = trace if trace is not None else CaptureTrace(self.hotkey_time)
+
+    def set_buffer(self, buffer, buffer_pool, allocated_bytes=0):
+        self.buffer = buffer
+        self.buffer_pool = buffer_pool
+        self.size = buffer.size
+        self.allocated_bytes = allocated_bytes
+
+    def set_parts(self, parts, buffer_pool, size, allocated_bytes=0):
+        """设置拼接的帧：parts 中每块缓冲区在编码时按各自的位置贴到 size 大小的画面上。"""
+        self.parts = parts
+        self.buffer_pool = buffer_pool
+        self.size = size
+        self.allocated_bytes = allocated_bytes
+
+    @property
+    def in_memory(self):
+        return self.spill_path is None
+
+    def spill(self, spill_dir):
+        """将帧数据写入磁盘临时文件并释放内存。"""
+        import uuid # 只有溢出到磁盘时用到
+        os.makedirs(spill_dir, exist_ok=True)
+        spill_path = os.path.join(spill_dir, f"{uuid.uuid4().hex}.spill")
+        with open(spill_path, 'wb') as f:
+            if self.image is not None:
+                # ImageGrab 得到的图像统一转成 BGRX 原始数据，读回时走同一条路径
+                self.size = self.image.size
+                f.write(self.image.convert('RGB').tobytes('raw', 'BGRX'))
+            elif self.parts is not None:
+                for buffer, _ in self.parts:
+                    f.write(buffer.view)
+                self._spilled_parts = [(buffer.size, offset) for buffer, offset in self.parts]
+            else:
+                f.write(self.buffer.view)
+        self.spill_path = spill_path
+        self.image = None
+        self._release_buffer()
+
+    def _release_buffer(self):
+        if self.buffer is not None and self.buffer_pool is not None:
+            self.buffer_pool.release(self.buffer)
+        self.buffer = None
+        if self.parts is not None and self.buffer_pool is not None:
+            for buffer, _ in self.parts:
+                self.buffer_pool.release(buffer)
+        self.parts = None
+
+    def to_image(self):
+        """编码阶段：把帧数据转换成 PIL 图像（BGRX -> RGB 转换在这里进行，而不是在热键处理中）。"""
+        if self.image is not None:
+            return self.image
+        if self.spill_path is not None:
+            # 读回到池中的缓冲区，而不是新建 bytes 对象
+            with open(self.spill_path, 'rb') as f:
+                if self._spilled_parts is not None:
+                    parts = []
+                    for size, offset in self._spilled_parts:
+                        buffer, allocated = self.buffer_pool.acquire(size)
+                        self.allocated_bytes += allocated
+                        f.readinto(buffer.data)
+                        parts.append((buffer, offset))
+                    self.parts = parts
+                    self._spilled_parts = None
+                else:
+                    buffer, allocated = self.buffer_pool.acquire(self.size)
+                    self.set_buffer(buffer, self.buffer_pool, self.allocated_bytes + allocated)
+                    f.readinto(buffer.data)
+            os.remove(self.spill_path)
+            self.spill_path = None
+        if self.parts is not None:
+            # 按各显示器在虚拟桌面中的位置拼接，显示器之间没有覆盖的区域为黑色
+            canvas = Image.new('RGB', self.size)
+            for buffer, offset in self.parts:
+                canvas.paste(Image.frombuffer('RGB', buffer.size, buffer.view, 'raw', 'BGRX', 0, 1), offset)
+            return canvas
+        # 直接在 memoryview 上做 BGRX -> RGB 转换，这是整个流程中唯一的一次像素复制
+        return Image.frombuffer('RGB', self.size, self.buffer.view, 'raw', 'BGRX', 0, 1)
+
+    def release(self):
+        """释放帧持有的像素数据，缓冲区归还到帧缓冲池。"""
+        self._release_buffer()
+        self.image = None
+        self._spilled_parts = None
+        if self.spill_path is not None:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
+            self.spill_path = None
+
+class LatencyStats:
+    """
+    记录最近若干次耗时样本（毫秒），用于统计热键返回延迟等指标。
+    """
+    def __init__(self, name, max_samples=200):
+        self.name = name
+        self._samples = collections.deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, value_ms):
+        with self._lock:
+            self._samples.append(value_ms)
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "avg": sum(samples) / len(samples),
+            "p50": percentile(samples, 0.5),
+            "p95": percentile(samples, 0.95),
+            "p99": percentile(samples, 0.99),
+            "max": samples[-1],
+        }
+
+    def __str__(self):
+        s = self.summary()
+        if not s["count"]:
+            return f"{self.name}: 暂无数据"
+        return f"{self.name}: n={s['count']} 平均={s['avg']:.1f}ms p50={s['p50']:.1f}ms p95={s['p95']:.1f}ms 最大={s['max']:.1f}ms"
+
+class _TimedWriter:
+    """
+    包装写入截图的文件对象，累计 write() 和 flush() 花费的时间。编码器把数据直接流式写入文件，
+    内存中不保留整份编码结果，同时仍能把磁盘写入耗时从编码耗时中分出来。
+    不提供 fileno()，Pillow 因此通过 write() 写出全部数据。
+    """
+    def __init__(self, file):
+        self._file = file
+        self.write_seconds = 0.0
+
+    def write(self, data):
+        start = time.perf_counter()
+        try:
+            return self._file.write(data)
+        finally:
+            self.write_seconds += time.perf_counter() - start
+
+    def flush(self):
+        start = time.perf_counter()
+        try:
+            self._file.flush()
+        finally:
+            self.write_seconds += time.perf_counter() - start
+
+    def tell(self):
+        return self._file.tell()
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+class CapturePipeline:
+    """
+    截图流水线：热键处理中只负责抓取像素并把帧放入有界队列，
+    编码、写盘以及后续处理（保存图标、播放音效）由后台线程完成。
+
+    队列满时的背压策略：
+    - block: 阻塞抓取线程，直到有帧被编码完成；
+    - drop_oldest: 丢弃队列中最旧的帧；
+    - spill: 把新帧的原始像素临时写入磁盘，不占用内存队列名额。
+    """
+    def __init__(self, queue_size=4, policy="block", workers=2, spill_dir=None, on_saved=None, on_encoded=None, tracer=None):
+        if policy not in BACKPRESSURE_POLICIES:
+            pipeline_log.warning("未知的背压策略 '%s'，使用 block。", policy)
+            policy = "block"
+        self.queue_size = max(1, queue_size)
+        self.policy = policy
+        self.worker_count = max(1, workers)
+        # 临时文件放在系统临时目录，避免出现在截图查看窗口的文件夹列表中
+        if not spill_dir:
+            import tempfile # 流水线在第一次截图时才创建，不占启动时间
+            spill_dir = os.path.join(tempfile.gettempdir(), "F10Capture_spill")
+        self.spill_dir = spill_dir
+        self.on_saved = on_saved # 回调: on_saved(frame)，在编码线程中调用
+        self.on_encoded = on_encoded # 回调: on_encoded(frame, image)，文件写完后、内存中的图像释放前调用
+        self.tracer = tracer # TraceRecorder，每帧处理完后提交其分阶段耗时记录
+
+        self._frames = collections.deque()
+        self._in_memory = 0
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+
+        # 统计信息
+        self.submitted = 0
+        self.saved = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+        self.high_water = 0
+        self.allocated_bytes = 0 # 已保存的帧在抓取时累计新分配的缓冲字节数
+        self.shot_to_file = LatencyStats("截图到文件延迟")
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.worker_count):
+            t = threading.Thread(target=self._worker_loop, name=f"CaptureEncoder-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        pipeline_log.info("截图流水线已启动: 队列=%s, 策略=%s, 编码线程=%s",
+                          self.queue_size, self.policy, self.worker_count)
+
+    def ensure_workers(self, count):
+        """
+        确保至少有 count 个编码线程（不超过 CPU 核心数），例如一次提交多个显示器的截图时让它们并行编码。
+        只增加不减少，流水线未运行时只修改线程数。
+        """
+        count = min(count, os.cpu_count() or 1)
+        with self._cond:
+            if count <= self.worker_count:
+                return
+            first = self.worker_count if self._running else count
+            self.worker_count = count
+        for i in range(first, count):
+            t = threading.Thread(target=self._worker_loop, name=f"CaptureEncoder-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        if first < count:
+            pipeline_log.info("编码线程增加到 %s 个。", count)
+
+    def submit(self, frame):
+        """
+        提交一帧到流水线。返回 True 表示已入队；False 表示流水线未运行（包括等待期间被停止），
+        此时帧仍归调用方所有，需要调用 frame.release()。
+        """
+        submit_start = time.perf_counter()
+        spill_needed = False
+        dropped = None
+        with self._cond:
+            if not self._running:
+                return False
+            if self.policy == "block":
+                while self._in_memory >= self.queue_size and self._running:
+                    self._cond.wait()
+                if not self._running: # 等待期间流水线被停止，工作线程已退出，不能再入队
+                    return False
+            elif self._in_memory >= self.queue_size:
+                if self.policy == "drop_oldest":
+                    dropped = self._drop_oldest_locked()
+                else:
+                    spill_needed = True
+
+        if dropped is not None:
+            pipeline_log.warning("截图队列已满，丢弃最旧的帧: %s", dropped.filename)
+            dropped.release()
+            dropped.trace.set(dropped=True)
+            self._finish_trace(dropped)
+
+        if spill_needed:
+            try:
+                with frame.trace.stage("spill"):
+                    frame.spill(self.spill_dir)
+            except Exception as e:
+                pipeline_log.warning("帧写入临时文件失败: %s，改为直接排队。", e)
+
+        with self._cond:
+            if not self._running: # 写临时文件期间流水线被停止
+                return False
+            # submit 阶段包含 block 策略下等待队列空位的时间
+            frame.queued_at = time.perf_counter()
+            frame.trace.add_stage("submit", submit_start, frame.queued_at)
+            self._frames.append(frame)
+            if frame.in_memory:
+                self._in_memory += 1
+            else:
+                self.spilled += 1
+            self.submitted += 1
+            self.high_water = max(self.high_water, len(self._frames))
+            self._cond.notify_all()
+        return True
+
+    def _drop_oldest_locked(self):
+        """从队列中移除最旧的内存帧并返回它（没有时返回 None）。记录可能要写文件，由调用方在释放锁之后完成。"""
+        for i, old in enumerate(self._frames):
+            if old.in_memory:
+                del self._frames[i]
+                self._in_memory -= 1
+                self.dropped += 1
+                return old
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._frames and self._running:
+                    self._cond.wait()
+                if not self._frames:
+                    return
+                frame = self._frames.popleft()
+                frame.trace.add_stage("queued", frame.queued_at, time.perf_counter())
+                if frame.in_memory:
+                    self._in_memory -= 1
+                self._busy += 1
+                self._cond.notify_all()
+            try:
+                self._encode_and_save(frame)
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify_all()
+
+    def _finish_trace(self, frame):
+        if self.tracer is not None:
+            self.tracer.finish(frame.trace)
+
+    def _encode_and_save(self, frame):
+        trace = frame.trace
+        # 先写入临时文件再改名，扫描和查看窗口不会读到写了一半的截图
+        temp_filename = frame.filename + ".tmp"
+        try:
+            with trace.stage("convert"):
+                img = frame.to_image()
+            os.makedirs(frame.screenshot_dir, exist_ok=True)
+            # 编码结果直接写入文件；write 阶段是其中累计的磁盘写入耗时（含改名），encode 阶段是其余的编码耗时
+            encode_start = time.perf_counter()
+            with open(temp_filename, 'wb') as f:
+                writer = _TimedWriter(f)
+                frame.output_format.save(img, writer)
+                output_bytes = f.tell()
+            encode_end = time.perf_counter()
+            os.replace(temp_filename, frame.filename)
+            write_end = time.perf_counter()
+            write_start = encode_end - writer.write_seconds
+            trace.add_stage("encode", encode_start, write_start)
+            trace.add_stage("write", write_start, write_end)
+        except Exception as e:
+            with self._cond:
+                self.failed += 1
+            pipeline_log.error("保存截图文件失败: %s", e)
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+            frame.release()
+            trace.set(error=str(e))
+            self._finish_trace(frame)
+            return
+        trace.set(process=frame.process_name, monitor=frame.monitor, width=img.width, height=img.height,
+                  frame_bytes=img.width * img.height * 4, output_bytes=output_bytes,
+                  format=frame.output_format.name, file=frame.filename)
+        elapsed_ms = (time.perf_counter() - frame.hotkey_time) * 1000
+        self.shot_to_file.record(elapsed_ms)
+        with self._cond:
+            self.saved += 1
+            self.allocated_bytes += frame.allocated_bytes
+        if pipeline_log.isEnabledFor(logging.INFO):
+            # 峰值RSS需要查询进程信息，日志关闭时不做这一步
+            pipeline_log.info("截图已保存到: %s (耗时 %.1fms, 新分配 %.1fMB, 峰值RSS %.0fMB)",
+                              frame.filename, elapsed_ms, frame.allocated_bytes / (1024 * 1024),
+                              get_peak_rss() / (1024 * 1024))
+        if self.on_saved:
+            try:
+                self.on_saved(frame)
+            except Exception as e:
+                pipeline_log.error("截图后处理失败: %s", e)
+        if self.on_encoded:
+            try:
+                with trace.stage("index"):
+                    self.on_encoded(frame, img)
+            except Exception as e:
+                pipeline_log.error("处理已编码截图失败: %s", e)
+        frame.release()
+        self._finish_trace(frame)
+
+    def wait_idle(self, timeout=None):
+        """等待队列中所有帧编码完成。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._frames or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def is_busy(self):
+        with self._cond:
+            return bool(self._frames or self._busy)
+
+    def stop(self, timeout=10):
+        """停止流水线；已入队的帧会先写完再退出。"""
+        self.wait_idle(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def stats(self):
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "saved": self.saved,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "failed": self.failed,
+                "queued": len(self._frames),
+                "high_water": self.high_water,
+                "allocated_mb": self.allocated_bytes / (1024 * 1024),
+                "peak_rss_mb": get_peak_rss() / (1024 * 1024),
+            }
+
+class DeferredTranscoder:
+    """
+    后台转码任务：把 raw 快速转储的截图转成归档用的 PNG，完成后删除原文件。
+    截图流水线忙碌时暂停，避免和连续截图争抢CPU和磁盘。
+    """
+    def __init__(self, compress_level=9, is_busy=None, on_transcoded=None):
+        self.compress_level = compress_level
+        self.is_busy = is_busy # 返回 True 时暂缓转码
+        self.on_transcoded = on_transcoded # 回调: on_transcoded(原路径, 新路径)
+        self._pending = collections.deque()
+        self._queued = set()
+        self._cond = threading.Condition()
+        self._running = False
+        self._draining = False
+        self._thread = None
+        self.transcoded = 0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="DeferredTranscoder", daemon=True)
+        self._thread.start()
+
+    def stop(self, drain=False):
+        """停止后台转码。drain=True 时先转完队列中的文件（命令行退出前使用），否则未完成的文件留到下次启动时再扫描。"""
+        with self._cond:
+            self._running = False
+            self._draining = drain
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(None if drain else 5)
+            self._thread = None
+
+    def enqueue(self, path):
+        with self._cond:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+            self._pending.append(path)
+            self._cond.notify_all()
+
+    def enqueue_existing(self, root_dir, run=None):
+        """
+        扫描截图根目录，把上次运行时未完成转码的文件加入队列（在后台线程中执行）。
+        run(fn) 用来在后台执行扫描（例如托盘程序的维护线程池），默认新建一个守护线程。
+        """
+        def scan():
+            try:
+                for dirpath, _, filenames in os.walk(root_dir):
+                    for name in filenames:
+                        if name.lower().endswith(RAW_DUMP_SUFFIX):
+                            self.enqueue(os.path.join(dirpath, name))
+            except Exception as e:
+                pipeline_log.warning("扫描待转码文件失败: %s", e)
+        if run is None:
+            threading.Thread(target=scan, name="TranscodeScan", daemon=True).start()
+        else:
+            run(scan)
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and self._running:
+                    self._cond.wait()
+                if not self._running and not (self._draining and self._pending):
+                    return
+                path = self._pending[0]
+                running = self._running
+            if running and self.is_busy and self.is_busy():
+                time.sleep(1)
+                continue
+            with self._cond:
+                self._pending.popleft()
+                self._queued.discard(path)
+            self._transcode(path)
+
+    def _transcode(self, path):
+        if not os.path.exists(path):
+            return
+        target = path[:-len(RAW_DUMP_SUFFIX)] + ".png"
+        temp_target = target + ".tmp"
+        try:
+            with Image.open(path) as img:
+                img.save(temp_target, "PNG", compress_level=self.compress_level)
+            os.replace(temp_target, target)
+            os.remove(path)
+        except Exception as e:
+            pipeline_log.error("转码 %s 失败: %s", path, e)
+            try:
+                os.remove(temp_target)
+            except OSError:
+                pass
+            return
+        self.transcoded += 1
+        pipeline_log.info("已转码为PNG: %s", target)
+        if self.on_transcoded:
+            try:
+                self.on_transcoded(path, target)
+            except Exception as e:
+                # 例如文件刚被用户移走；不能让异常结束转码线程
+                pipeline_log.error("处理已转码截图 %s 失败: %s", target, e)
+
+
+class BurstCapture:
+    """
+    连拍：按固定间隔抓取 frame_count 帧并提交到截图流水线。
+    所有帧共用同一个截图上下文和目标，编码全部在后台进行，
+    因此持续帧率只受抓取速度限制。落后超过一个间隔的帧会被跳过并计为丢帧。
+    """
+    def __init__(self, frame_count, interval_ms, grab_frame, submit, on_finished=None):
+        self.frame_count = max(1, frame_count)
+        self.interval = max(0, interval_ms) / 1000.0
+        self.grab_frame = grab_frame # grab_frame(index) -> CaptureFrame 或 None
+        self.submit = submit # submit(frame) -> bool
+        self.on_finished = on_finished # 回调: on_finished(stats)
+        self._thread = None
+        self.captured = 0
+        self.dropped = 0
+        self.elapsed = 0.0
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return False
+        self._thread = threading.Thread(target=self._run, name="BurstCapture", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        start = time.perf_counter()
+        next_slot = start
+        for index in range(self.frame_count):
+            now = time.perf_counter()
+            if next_slot > now:
+                time.sleep(next_slot - now)
+            elif self.interval and now - next_slot > self.interval:
+                # 抓取速度跟不上设定的帧率，跳过这一帧
+                self.dropped += 1
+                next_slot += self.interval
+                continue
+            next_slot += self.interval
+            frame = self.grab_frame(index)
+            if frame is not None and self.submit(frame):
+                self.captured += 1
+            else:
+                if frame is not None: # 流水线未运行，帧缓冲归还到池中
+                    frame.release()
+                self.dropped += 1
+        self.elapsed = time.perf_counter() - start
+        stats = self.stats()
+        pipeline_log.info("连拍完成: %s/%s 帧, 实际 %.1f fps, 丢帧 %s",
+                          stats['captured'], self.frame_count, stats['fps'], stats['dropped'])
+        if self.on_finished:
+            self.on_finished(stats)
+
+    def stats(self):
+        # 最后一帧之后不需要再等一个间隔，按帧间隔数计算实际帧率
+        fps = (self.captured - 1) / self.elapsed if self.captured > 1 and self.elapsed > 0 else 0.0
+        return {"captured": self.captured, "dropped": self.dropped, "elapsed": self.elapsed, "fps": fps}
+
+class ReplayFrame:
+    """环形缓冲中的一帧：抓取时间和缩小后的 JPEG 数据。"""
+    __slots__ = ('captured_at', 'data', 'size')
+
+    def __init__(self, captured_at, data, size):
+        self.captured_at = captured_at
+        self.data = data
+        self.size = size
+
+class ReplayBuffer:
+    """
+    即时回放：后台以较低帧率持续抓取鼠标所在屏幕，缩小并压缩为 JPEG 后放入有内存上限的环形缓冲。
+    按下回放热键时把缓冲中的帧写入截图目录。
+    """
+    def __init__(self, context, cursor_pos, fps=2.0, seconds=10, memory_mb=128, scale=2, jpeg_quality=85):
+        self.context = context
+        self.cursor_pos = cursor_pos # 返回鼠标位置 (x, y) 的函数
+        self.interval = 1.0 / max(0.1, fps)
+        self.max_age = seconds
+        self.memory_budget = int(memory_mb * 1024 * 1024)
+        self.scale = max(1, int(scale))
+        self.jpeg_quality = jpeg_quality
+        self._frames = collections.deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.grab_time = LatencyStats("回放抓取耗时")
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ReplayBuffer", daemon=True)
+        self._thread.start()
+        replay_log.info("即时回放已开启: %.1f fps, 最多 %s 秒 / %sMB",
+                        1 / self.interval, self.max_age, self.memory_budget // (1024 * 1024))
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(5)
+            self._thread = None
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
+
+    def _run(self):
+        next_time = time.perf_counter()
+        while not self._stop_event.is_set():
+            started = time.perf_counter()
+            try:
+                self._capture_one()
+            except Exception as e:
+                replay_log.warning("即时回放抓取失败: %s", e)
+            self.grab_time.record((time.perf_counter() - started) * 1000)
+            next_time += self.interval
+            delay = next_time - time.perf_counter()
+            if delay < 0:
+                # 抓取太慢时不追赶，避免持续占满CPU
+                next_time = time.perf_counter()
+                delay = self.interval
+            self._stop_event.wait(delay)
+
+    def _capture_one(self):
+        x, y = self.cursor_pos()
+        grabbed = self.context.grab_at(x, y)
+        if not grabbed:
+            return
+        buffer, _, _ = grabbed
+        try:
+            img = Image.frombuffer('RGB', buffer.size, buffer.view, 'raw', 'BGRX', 0, 1)
+        finally:
+            self.context.buffer_pool.release(buffer)
+        if self.scale > 1:
+            img = img.reduce(self.scale) # 盒式滤波缩小，开销远小于高质量缩放
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=self.jpeg_quality)
+        self._append(ReplayFrame(datetime.datetime.now(), out.getvalue(), img.size))
+
+    def _append(self, frame):
+        with self._lock:
+            self._frames.append(frame)
+            self._bytes += len(frame.data)
+            oldest_allowed = frame.captured_at - datetime.timedelta(seconds=self.max_age)
+            while self._frames and (self._bytes > self.memory_budget or self._frames[0].captured_at < oldest_allowed):
+                old = self._frames.popleft()
+                self._bytes -= len(old.data)
+
+    def snapshot(self):
+        """返回当前缓冲中所有帧（从旧到新）。"""
+        with self._lock:
+            return list(self._frames)
+
+    def stats(self):
+        with self._lock:
+            return {"frames": len(self._frames), "memory_mb": self._bytes / (1024 * 1024)}
+
+def fit_size(size, bounds):
+    """按比例缩放 size 使其刚好放入 bounds（与 Qt.KeepAspectRatio 一致）。"""
+    width, height = size
+    scale = min(bounds[0] / width, bounds[1] / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def shrink_image(image, thumb_size=THUMBNAIL_SIZE):
+    """
+    把 PIL 图像缩小到缩略图尺寸。
+    reducing_gap 让 PIL 先用盒式滤波整数倍缩小，再做精细缩放，比直接高质量缩放快得多。
+    """
+    target = fit_size(image.size, thumb_size)
+    if image.size == target:
+        return image
+    return image.resize(target, Image.BICUBIC, reducing_gap=2.0)
+
+def encode_thumbnail(image, thumb_size=THUMBNAIL_SIZE):
+    """从内存中的 PIL 图像生成缩略图并编码为 JPEG 字节。"""
+    out = io.BytesIO()
+    shrink_image(image, thumb_size).convert('RGB').save(out, "JPEG", quality=85)
+    return out.getvalue()
+
+
+class ThumbnailStore:
+    """
+    持久化的缩略图缓存：截图根目录下的一个 SQLite 数据库。
+    以 (路径, 缩略图尺寸) 为主键，并校验文件的修改时间和大小，文件变化后旧缩略图自动失效。
+    总大小超过 budget_bytes 时按最近访问时间（LRU）淘汰。
+    """
+    TOUCH_INTERVAL = 60 # 同一条记录的访问时间最多每隔多少秒写回一次，减少写入
+
+    def __init__(self, db_path, budget_bytes=256 * 1024 * 1024):
+        self.db_path = db_path
+        self.budget_bytes = budget_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS thumbnails (
+                path TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (path, width, height)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS thumbnails_lru ON thumbnails (last_access)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbnails").fetchone()
+        self.total_bytes = row[0]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key_path(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def get(self, path, mtime_ns, size, thumb_size):
+        """
+        返回缓存的缩略图数据（JPEG 字节）；不存在或文件已变化时返回 None。
+        """
+        key = self._key_path(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size, data, last_access FROM thumbnails WHERE path=? AND width=? AND height=?",
+                (key, thumb_size[0], thumb_size[1])).fetchone()
+            if row is None or row[0] != mtime_ns or row[1] != size:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[3] > self.TOUCH_INTERVAL:
+                self._conn.execute(
+                    "UPDATE thumbnails SET last_access=? WHERE path=? AND width=? AND height=?",
+                    (now, key, thumb_size[0], thumb_size[1]))
+                self._conn.commit()
+            self.hits += 1
+            return row[2]
+
+    def put(self, path, mtime_ns, size, thumb_size, data):
+        """写入一张缩略图，必要时淘汰最久未访问的记录。"""
+        key = self._key_path(path)
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT nbytes FROM thumbnails WHERE path=? AND width=? AND height=?",
+                (key, thumb_size[0], thumb_size[1])).fetchone()
+            if old:
+                self.total_bytes -= old[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO thumbnails (path, width, height, mtime_ns, size, data, nbytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, thumb_size[0], thumb_size[1], mtime_ns, size, sqlite3.Binary(data), len(data), time.time()))
+            self.total_bytes += len(data)
+            if self.total_bytes > self.budget_bytes:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        # 一次淘汰到预算的 90%，避免每次写入都触发淘汰
+        target = int(self.budget_bytes * 0.9)
+        rows = self._conn.execute("SELECT rowid, nbytes FROM thumbnails ORDER BY last_access").fetchall()
+        evicted = []
+        for rowid, nbytes in rows:
+            if self.total_bytes <= target:
+                break
+            evicted.append((rowid,))
+            self.total_bytes -= nbytes
+        self._conn.executemany("DELETE FROM thumbnails WHERE rowid=?", evicted)
+        thumbnail_log.info("缩略图缓存超出容量，已淘汰 %s 条记录。", len(evicted))
+
+    def rename(self, old_path, new_path, mtime_ns, size):
+        """
+        文件被转码或改名后，把旧路径的缩略图转移到新路径（缩略图内容不变）。
+        """
+        old_key = self._key_path(old_path)
+        new_key = self._key_path(new_path)
+        with self._lock:
+            self._conn.execute("DELETE FROM thumbnails WHERE path=?", (new_key,))
+            self._conn.execute("UPDATE thumbnails SET path=?, mtime_ns=?, size=? WHERE path=?",
+                               (new_key, mtime_ns, size, old_key))
+            self._conn.commit()
+
+    def remove(self, path):
+        """删除某个文件的所有缩略图。"""
+        key = self._key_path(path)
+        with self._lock:
+            row = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbnails WHERE path=?", (key,)).fetchone()
+            self._conn.execute("DELETE FROM thumbnails WHERE path=?", (key,))
+            self._conn.commit()
+            self.total_bytes -= row[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM thumbnails").fetchone()[0]
+        return {"entries": count, "mb": self.total_bytes / (1024 * 1024), "hits": self.hits, "misses": self.misses}
+
+def parse_capture_time(filename):
+    """
+    从截图文件名（例如 20231026_143000_123.png）解析截图时间，返回时间戳；无法解析时返回 None。
+    """
+    stem = os.path.basename(filename)[:19]
+    try:
+        return datetime.datetime.strptime(stem, "%Y%m%d_%H%M%S_%f").timestamp()
+    except ValueError:
+        try:
+            return datetime.datetime.strptime(stem[:15], "%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            return None
+
+def is_library_image(name):
+    """截图库中收录的文件：图片扩展名，且不是进程图标。"""
+    lower = name.lower()
+    return lower.endswith(IMAGE_EXTENSIONS) and lower != 'icon.png'
+
+class LibraryCatalog:
+    """
+    截图库目录：截图根目录下的一个 SQLite 数据库，每张截图一行，
+    记录进程文件夹、截图时间、显示器、宽高、文件大小和格式。
+    截图保存时直接写入；在程序外新增或删除的文件由 reconcile() 扫描补齐，
+    扫描时跳过修改时间没有变化的文件夹，因此大型截图库的增量扫描也很快。
+    查看窗口直接查询目录，不再每次遍历文件系统。
+    每条记录的增删改都会调用 on_change(kind, folder, filename)（可能在任意线程中），
+    kind 为 "added"、"changed"（扫描发现修改时间或大小变化）、"removed"、
+    "folder_added" 或 "folder_removed"（后两者 filename 为 None）。
+    """
+    def __init__(self, db_path, on_change=None):
+        self.db_path = db_path
+        self.root = os.path.dirname(db_path)
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS folders (
+                name TEXT PRIMARY KEY,
+                mtime_ns INTEGER
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS screenshots (
+                folder TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                taken_at REAL,
+                monitor TEXT,
+                width INTEGER,
+                height INTEGER,
+                bytes INTEGER NOT NULL,
+                format TEXT,
+                mtime_ns INTEGER NOT NULL,
+                PRIMARY KEY (folder, filename)
+            )
+        """)
+        self._conn.commit()
+
+    def _split(self, path):
+        """把截图路径拆分为 (文件夹, 文件名)；不在截图根目录的直接子文件夹中时返回 None。"""
+        folder_path, filename = os.path.split(os.path.abspath(path))
+        if os.path.normcase(os.path.dirname(folder_path)) != os.path.normcase(os.path.abspath(self.root)):
+            return None
+        return os.path.basename(folder_path), filename
+
+    @staticmethod
+    def _read_header(path):
+        """只读取文件头获取宽高和格式，不解码像素。"""
+        try:
+            with Image.open(path) as image:
+                return image.size, image.format
+        except Exception:
+            return None, None
+
+    def _notify(self, changes):
+        if self.on_change:
+            for kind, folder, filename in changes:
+                self.on_change(kind, folder, filename)
+
+    def add_file(self, path, monitor=None, size=None, image_format=None, stat=None):
+        """
+        登记一张截图。size/image_format 未知时读取文件头获取。
+        """
+        parts = self._split(path)
+        if parts is None:
+            return
+        stat = stat or os.stat(path)
+        if size is None or image_format is None:
+            header_size, header_format = self._read_header(path)
+            size = size or header_size
+            image_format = image_format or header_format
+        width, height = size if size else (None, None)
+        taken_at = parse_capture_time(parts[1]) or stat.st_mtime
+        changes = []
+        with self._lock:
+            if self._conn.execute("INSERT OR IGNORE INTO folders (name, mtime_ns) VALUES (?, NULL)", (parts[0],)).rowcount:
+                changes.append(("folder_added", parts[0], None))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO screenshots "
+                "(folder, filename, taken_at, monitor, width, height, bytes, format, mtime_ns) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (parts[0], parts[1], taken_at, monitor, width, height, stat.st_size, image_format, stat.st_mtime_ns))
+            self._conn.commit()
+        changes.append(("added", parts[0], parts[1]))
+        self._notify(changes)
+
+    def move(self, old_path, new_path):
+        """文件被转码或改名后更新记录，保留截图时间和显示器信息。"""
+        old_parts = self._split(old_path)
+        new_parts = self._split(new_path)
+        if old_parts is None or new_parts is None:
+            return
+        stat = os.stat(new_path)
+        _, image_format = self._read_header(new_path)
+        with self._lock:
+            self._conn.execute("DELETE FROM screenshots WHERE folder=? AND filename=?", new_parts)
+            self._conn.execute(
+                "UPDATE screenshots SET folder=?, filename=?, bytes=?, format=?, mtime_ns=? WHERE folder=? AND filename=?",
+                (new_parts[0], new_parts[1], stat.st_size, image_format, stat.st_mtime_ns, old_parts[0], old_parts[1]))
+            self._conn.commit()
+        self._notify([("removed",) + old_parts, ("added",) + new_parts])
+
+    def remove(self, path):
+        parts = self._split(path)
+        if parts is None:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM screenshots WHERE folder=? AND filename=?", parts)
+            self._conn.commit()
+        self._notify([("removed",) + parts])
+
+    def folders(self):
+        """返回 [(文件夹名, 路径)]，按名称排序。"""
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM folders ORDER BY name").fetchall()
+        return [(name, os.path.join(self.root, name)) for (name,) in rows]
+
+    def images(self, folder):
+        """返回某个文件夹中的 [(文件名, 路径)]，按文件名排序。"""
+        folder_path = os.path.join(self.root, folder)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename FROM screenshots WHERE folder=? ORDER BY filename", (folder,)).fetchall()
+        return [(filename, os.path.join(folder_path, filename)) for (filename,) in rows]
+
+    def reconcile(self):
+        """
+        扫描截图根目录，补齐在程序外新增、修改或删除的文件，返回发生变化的文件夹名集合。
+        文件夹的修改时间与上次扫描相同时跳过（新增、删除或替换文件都会更新文件夹的修改时间）。
+        同一时间只运行一次扫描。
+        """
+        if not self._reconcile_lock.acquire(blocking=False):
+            return set()
+        changed = set()
+        try:
+            started = time.perf_counter()
+            with self._lock:
+                known = dict(self._conn.execute("SELECT name, mtime_ns FROM folders").fetchall())
+            seen = set()
+            with os.scandir(self.root) as entries:
+                folder_entries = [e for e in entries if e.is_dir() and not e.name.startswith('.')]
+            for entry in folder_entries:
+                seen.add(entry.name)
+                try:
+                    mtime_ns = entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+                if known.get(entry.name) == mtime_ns:
+                    continue
+                if entry.name not in known:
+                    self._notify([("folder_added", entry.name, None)])
+                if self._reconcile_folder(entry.name, entry.path, mtime_ns) or entry.name not in known:
+                    changed.add(entry.name)
+            removed = set(known) - seen
+            if removed:
+                with self._lock:
+                    for name in removed:
+                        self._conn.execute("DELETE FROM screenshots WHERE folder=?", (name,))
+                        self._conn.execute("DELETE FROM folders WHERE name=?", (name,))
+                    self._conn.commit()
+                changed |= removed
+                self._notify([("folder_removed", name, None) for name in removed])
+            library_log.info("截图库扫描完成: %s 个文件夹, %s 个有变化, 耗时 %.0fms",
+                             len(seen), len(changed), (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            library_log.error("截图库扫描失败: %s", e)
+        finally:
+            self._reconcile_lock.release()
+        return changed
+
+    def reconcile_folder(self, folder):
+        """只同步一个文件夹（由文件系统监视触发），文件夹已不存在时交给完整扫描处理。"""
+        folder_path = os.path.join(self.root, folder)
+        try:
+            mtime_ns = os.stat(folder_path).st_mtime_ns
+        except OSError:
+            return self.reconcile()
+        with self._reconcile_lock:
+            return self._reconcile_folder(folder, folder_path, mtime_ns)
+
+    def _reconcile_folder(self, folder, folder_path, mtime_ns):
+        """同步一个文件夹的记录，返回是否有文件新增、变化或删除。"""
+        with self._lock:
+            rows = {filename: (file_mtime, nbytes) for filename, file_mtime, nbytes in self._conn.execute(
+                "SELECT filename, mtime_ns, bytes FROM screenshots WHERE folder=?", (folder,))}
+        upserts = []
+        present = set()
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                if not entry.is_file() or not is_library_image(entry.name):
+                    continue
+                present.add(entry.name)
+                stat = entry.stat()
+                if rows.get(entry.name) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                size, image_format = self._read_header(entry.path)
+                width, height = size if size else (None, None)
+                upserts.append((folder, entry.name, parse_capture_time(entry.name) or stat.st_mtime, None,
+                                width, height, stat.st_size, image_format, stat.st_mtime_ns))
+        deleted = [(folder, name) for name in rows if name not in present]
+        with self._lock:
+            # 已有记录只更新文件信息，保留截图时写入的显示器等信息
+            self._conn.executemany(
+                "INSERT INTO screenshots "
+                "(folder, filename, taken_at, monitor, width, height, bytes, format, mtime_ns) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (folder, filename) DO UPDATE SET width=excluded.width, height=excluded.height, "
+                "bytes=excluded.bytes, format=excluded.format, mtime_ns=excluded.mtime_ns", upserts)
+            self._conn.executemany("DELETE FROM screenshots WHERE folder=? AND filename=?", deleted)
+            self._conn.execute("INSERT OR REPLACE INTO folders (name, mtime_ns) VALUES (?, ?)", (folder, mtime_ns))
+            self._conn.commit()
+        self._notify([("added" if row[1] not in rows else "changed", folder, row[1]) for row in upserts] +
+                     [("removed", folder, name) for _, name in deleted])
+        return bool(upserts or deleted)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        with self._lock:
+            folders = self._conn.execute("SELECT COUNT(*) FROM folders").fetchone()[0]
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM screenshots").fetchone()
+        return {"folders": folders, "screenshots": count, "mb": total / (1024 * 1024)}
+
+def grab_target_frame(context, target, hotkey_time=None, fallback=True, trace=None):
+    """
+    抓取阶段：抓取 target 中鼠标位置所在显示器的原始像素，不做任何转换和编码。
+    后端抓取失败或没有任何显示器时，fallback 为 True 则尝试使用 ImageGrab 进行全屏截图。
+    trace 为热键处理中已经开始的耗时记录（没有时新建）。返回 CaptureFrame，失败时返回 None。
+    """
+    filename = make_screenshot_filename(target.screenshot_dir, target.output_format.extension)
+    frame = CaptureFrame(target.process_name, target.screenshot_dir, filename,
+                         hotkey_time=hotkey_time, output_format=target.output_format, trace=trace)
+    backend_name = context.backend.name
+
+    try:
+        grabbed = context.grab_at(target.mouse_x, target.mouse_y, frame.trace)
+        if grabbed:
+            # 只取原始 BGRX 数据，RGB 转换推迟到编码线程
+            buffer, allocated, monitor = grabbed
+            frame.set_buffer(buffer, context.buffer_pool, allocated)
+            frame.monitor = _monitor_label(monitor)
+            capture_log.debug("使用%s成功截图。", backend_name)
+            return frame
+        if not fallback:
+            capture_log.error("未找到任何显示器信息。")
+            return None
+        capture_log.warning("未找到任何显示器信息，尝试使用ImageGrab进行全屏截图。")
+    except Exception as e:
+        if not fallback:
+            capture_log.error("%s截图失败: %s", backend_name, e)
+            return None
+        capture_log.warning("%s截图失败: %s，尝试使用ImageGrab进行全屏截图。", backend_name, e)
+    return _imagegrab_fallback(frame)
+
+def _imagegrab_fallback(frame, all_screens=False):
+    """后端抓取失败时用 ImageGrab 抓取主屏幕（all_screens 为 True 时抓取整个虚拟桌面），失败时返回 None。"""
+    try:
+        from PIL import ImageGrab
+        with frame.trace.stage("grab"):
+            frame.image = ImageGrab.grab(all_screens=all_screens) # 回退到ImageGrab进行全屏截图
+        frame.monitor = "all"
+        capture_log.info("使用ImageGrab进行全屏截图。")
+    except Exception as grab_e:
+        capture_log.error("ImageGrab截图也失败: %s", grab_e)
+        return None
+    return frame
+
+def _monitor_label(monitor):
+    return getattr(monitor, 'name', None) or f"{monitor.x},{monitor.y}"
+
+def grab_target_frames(context, target, mode="cursor", hotkey_time=None, fallback=True, trace=None):
+    """
+    按截图范围抓取，返回帧列表（失败时为空列表）。
+    - cursor: 与 grab_target_frame 相同，只抓取鼠标所在显示器；
+    - stitched: 并行抓取所有显示器，编码时按虚拟桌面坐标（可以为负）拼成一张图片。
+      拼接后的图片由一个编码线程整体编码，耗时随总像素数增长；需要总耗时接近单个显示器时使用 per_monitor；
+    - per_monitor: 并行抓取所有显示器，每个显示器一帧，文件名追加 _M1、_M2……（按显示器列表顺序）。
+      第一帧沿用 trace 并负责保存图标和播放音效，其余帧各自记录耗时。
+    后端抓取失败时 fallback 为 True 则用 ImageGrab 抓取整个虚拟桌面。
+    """
+    if mode == "cursor":
+        frame = grab_target_frame(context, target, hotkey_time, fallback, trace)
+        return [frame] if frame is not None else []
+    extension = target.output_format.extension
+    filename = make_screenshot_filename(target.screenshot_dir, extension)
+    frame = CaptureFrame(target.process_name, target.screenshot_dir, filename,
+                         hotkey_time=hotkey_time, output_format=target.output_format, trace=trace)
+    backend_name = context.backend.name
+
+    try:
+        grabbed = context.grab_all(frame.trace)
+        if grabbed:
+            capture_log.debug("使用%s同时抓取了 %s 个显示器。", backend_name, len(grabbed))
+            if len(grabbed) == 1:
+                buffer, allocated, monitor = grabbed[0]
+                frame.set_buffer(buffer, context.buffer_pool, allocated)
+                frame.monitor = _monitor_label(monitor)
+                return [frame]
+            if mode == "stitched":
+                left = min(monitor.x for _, _, monitor in grabbed)
+                top = min(monitor.y for _, _, monitor in grabbed)
+                right = max(monitor.x + monitor.width for _, _, monitor in grabbed)
+                bottom = max(monitor.y + monitor.height for _, _, monitor in grabbed)
+                parts = [(buffer, (monitor.x - left, monitor.y - top)) for buffer, _, monitor in grabbed]
+                frame.set_parts(parts, context.buffer_pool, (right - left, bottom - top),
+                                sum(allocated for _, allocated, _ in grabbed))
+                frame.monitor = "all"
+                return [frame]
+            frames = []
+            stem = filename[:-len(extension)]
+            for index, (buffer, allocated, monitor) in enumerate(grabbed):
+                if index > 0:
+                    frame = CaptureFrame(target.process_name, target.screenshot_dir, "",
+                                         hotkey_time=frame.hotkey_time, output_format=target.output_format)
+                    frame.post_process = False
+                frame.filename = f"{stem}_M{index + 1}{extension}"
+                frame.set_buffer(buffer, context.buffer_pool, allocated)
+                frame.monitor = _monitor_label(monitor)
+                frames.append(frame)
+            return frames
+        if not fallback:
+            capture_log.error("未找到任何显示器信息。")
+            return []
+        capture_log.warning("未找到任何显示器信息，尝试使用ImageGrab进行全屏截图。")
+    except Exception as e:
+        if not fallback:
+            capture_log.error("%s截图失败: %s", backend_name, e)
+            return []
+        capture_log.warning("%s截图失败: %s，尝试使用ImageGrab进行全屏截图。", backend_name, e)
+    frame = _imagegrab_fallback(frame, all_screens=True)
+    return [frame] if frame is not None else []
+
+class MonitorInfo:
+    """显示器描述，属性与 screeninfo.Monitor 相同，供不使用 screeninfo 的后端使用。"""
+    def __init__(self, x, y, width, height, name=None):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.name = name
+
+    def __repr__(self):
+        return f"MonitorInfo({self.x}, {self.y}, {self.width}, {self.height}, {self.name!r})"
+
+def synthetic_image(size):
+    """
+    生成一张合成画面（RGB）：水平、垂直渐变加上平滑过的高斯噪声。
+    纯色画面几乎不用压缩，这样的画面编码耗时和文件大小更接近真实截图，适合用来测量。
+    """
+    width, height = size
+    gradient = Image.linear_gradient('L')
+    noise = Image.effect_noise((max(1, width // 4), max(1, height // 4)), 64).resize(size, Image.BILINEAR)
+    return Image.merge('RGB', (gradient.resize(size), noise, gradient.rotate(90).resize(size)))
+
+class FakeCaptureBackend(CaptureBackend):
+    """
+    生成合成画面的截图后端，用于在没有显示器的环境（Linux、CI）中跑通流水线以及做性能测量。
+    每个显示器的画面在 create_surface 时生成一次，grab 只做一次内存复制，耗时接近 GDI 的 GetBitmapBits。
+    grab_delay（秒）可以模拟较慢的抓取。
+    """
+    name = "合成画面"
+
+    def __init__(self, monitors=None, grab_delay=0.0):
+        self.monitors = list(monitors or [MonitorInfo(0, 0, 1920, 1080, "FAKE1")])
+        self.grab_delay = grab_delay
+        self.grabs = 0
+
+    def topology_signature(self):
+        return tuple((m.x, m.y, m.width, m.height) for m in self.monitors)
+
+    def enumerate_monitors(self):
+        return list(self.monitors)
+
+    def create_surface(self, monitor):
+        return synthetic_image((monitor.width, monitor.height)).tobytes('raw', 'BGRX')
+
+    def grab(self, surface, monitor, buffer):
+        if self.grab_delay:
+            time.sleep(self.grab_delay)
+        buffer[:] = surface
+        self.grabs += 1
+
+    def release_surface(self, surface):
+        pass
+
+class ImageGrabCaptureBackend(CaptureBackend):
+    """
+    基于 PIL ImageGrab 的截图后端：Windows/macOS 上抓取桌面，Linux 上通过 XCB 抓取 X 服务器（包括 Xvfb）。
+    比 GDI 后端慢（每次都会新建图像），主要用于非 Windows 平台。
+    无法廉价地检测显示器布局变化，布局变化后需要调用 CaptureContext.invalidate()。
+    """
+    name = "ImageGrab"
+
+    def __init__(self, xdisplay=None):
+        from PIL import ImageGrab
+        self._grab = ImageGrab.grab
+        self.xdisplay = xdisplay
+
+    def topology_signature(self):
+        return self.xdisplay
+
+    def enumerate_monitors(self):
+        if self.xdisplay is None:
+            try:
+                from screeninfo import get_monitors
+                monitors = get_monitors()
+                if monitors:
+                    return monitors
+            except Exception as e:
+                capture_log.warning("获取显示器列表失败: %s，按单个屏幕处理。", e)
+        width, height = self._grab(xdisplay=self.xdisplay).size
+        return [MonitorInfo(0, 0, width, height, "SCREEN")]
+
+    def create_surface(self, monitor):
+        return None
+
+    def grab(self, surface, monitor, buffer):
+        bbox = (monitor.x, monitor.y, monitor.x + monitor.width, monitor.y + monitor.height)
+        image = self._grab(bbox=bbox, all_screens=True, xdisplay=self.xdisplay)
+        if image.size != (monitor.width, monitor.height):
+            raise OSError(f"ImageGrab 返回的尺寸 {image.size} 与显示器 {monitor.width}x{monitor.height} 不一致")
+        buffer[:] = image.convert('RGB').tobytes('raw', 'BGRX')
+
+    def release_surface(self, surface):
+        pass
+
+# 截图后端名称 -> 后端类
+CAPTURE_BACKENDS = {
+    "gdi": GdiCaptureBackend,
+    "imagegrab": ImageGrabCaptureBackend,
+    "fake": FakeCaptureBackend,
+}
+
+def create_capture_backend(name=None):
+    """按名称创建截图后端；未指定时 Windows 上使用 GDI，其他平台使用 ImageGrab。"""
+    if name is None:
+        name = "gdi" if sys.platform == "win32" else "imagegrab"
+    if name not in CAPTURE_BACKENDS:
+        raise ValueError(f"未知的截图后端 '{name}'，可选: {', '.join(CAPTURE_BACKENDS)}")
+    return CAPTURE_BACKENDS[name]()
+
+def load_thumbnail_image(image_path, thumb_size=THUMBNAIL_SIZE):
+    """
+    用 PIL 以尽量低的分辨率解码图片并缩小为缩略图，返回 PIL 图像。
+    JPEG 用 draft() 直接按 1/2、1/4、1/8 的比例解码；其他格式解码后先 reduce() 整数倍盒式缩小，再做精细缩放。
+    """
+    with Image.open(image_path) as image:
+        target = fit_size(image.size, thumb_size)
+        if image.format == 'JPEG':
+            image.draft('RGB', target)
+            image = image.convert('RGB')
+        else:
+            factor = min(image.width // target[0], image.height // target[1])
+            if factor >= 2:
+                image = image.reduce(factor)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        thumbnail = shrink_image(image, thumb_size)
+        # 没有发生任何转换时 thumbnail 就是打开的文件本身，离开 with 之前复制一份
+        return thumbnail.copy() if thumbnail is image else thumbnail
+
+class SoundBackend:
+    """
+    音效输出接口。open() 接收完整的 WAV 文件内容并做好播放准备，play() 播放一次。
+    open/play/close 都只在 SoundPlayer 的播放线程中调用。
+    """
+    name = "音效输出"
+
+    def open(self, wav_data):
+        raise NotImplementedError
+
+    def play(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class _WaveFormat(ctypes.Structure):
+    _fields_ = [
+        ("wFormatTag", ctypes.c_ushort),
+        ("nChannels", ctypes.c_ushort),
+        ("nSamplesPerSec", ctypes.c_uint),
+        ("nAvgBytesPerSec", ctypes.c_uint),
+        ("nBlockAlign", ctypes.c_ushort),
+        ("wBitsPerSample", ctypes.c_ushort),
+        ("cbSize", ctypes.c_ushort),
+    ]
+
+class _WaveHeader(ctypes.Structure):
+    pass
+
+_WaveHeader._fields_ = [
+    ("lpData", ctypes.c_void_p),
+    ("dwBufferLength", ctypes.c_uint),
+    ("dwBytesRecorded", ctypes.c_uint),
+    ("dwUser", ctypes.c_void_p),
+    ("dwFlags", ctypes.c_uint),
+    ("dwLoops", ctypes.c_uint),
+    ("lpNext", ctypes.POINTER(_WaveHeader)),
+    ("reserved", ctypes.c_void_p),
+]
+
+class WaveOutSoundBackend(SoundBackend):
+    """
+    通过 winmm 的 waveOut 播放：打开一次输出设备并提交预先准备好的 PCM 缓冲，
+    每次播放只需 waveOutReset + waveOutWrite，不再重新打开文件或设备，调用立即返回。
+    新的播放会打断仍在播放的上一次（与游戏截图的快门声一致）。只支持 PCM 编码的 WAV。
+    """
+    name = "waveOut"
+    WAVE_MAPPER = 0xFFFFFFFF
+    WAVE_FORMAT_PCM = 1
+
+    def __init__(self):
+        winmm = ctypes.WinDLL("winmm")
+        header_args = [ctypes.c_void_p, ctypes.POINTER(_WaveHeader), ctypes.c_uint]
+        winmm.waveOutOpen.argtypes = [ctypes.POINTER(ctypes.c_void_p), ctypes.c_uint, ctypes.POINTER(_WaveFormat),
+                                      ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint]
+        winmm.waveOutPrepareHeader.argtypes = header_args
+        winmm.waveOutUnprepareHeader.argtypes = header_args
+        winmm.waveOutWrite.argtypes = header_args
+        winmm.waveOutReset.argtypes = [ctypes.c_void_p]
+        winmm.waveOutClose.argtypes = [ctypes.c_void_p]
+        self._winmm = winmm
+        self._handle = None
+        self._header = None
+        self._buffer = None
+
+    def _check(self, result, action):
+        if result != 0: # MMSYSERR_NOERROR
+            raise OSError(f"{action} 失败，错误码 {result}")
+
+    def open(self, wav_data):
+        import wave
+        with wave.open(io.BytesIO(wav_data)) as wav: # 非 PCM 格式会抛出 wave.Error
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+        fmt = _WaveFormat(self.WAVE_FORMAT_PCM, channels, rate, rate * channels * width, channels * width, width * 8, 0)
+        handle = ctypes.c_void_p()
+        self._check(self._winmm.waveOutOpen(ctypes.byref(handle), self.WAVE_MAPPER, ctypes.byref(fmt), None, None, 0),
+                    "waveOutOpen")
+        self._handle = handle
+        self._buffer = ctypes.create_string_buffer(frames, len(frames)) # 设备播放期间必须保持有效
+        self._header = _WaveHeader()
+        self._header.lpData = ctypes.cast(self._buffer, ctypes.c_void_p)
+        self._header.dwBufferLength = len(frames)
+        self._check(self._winmm.waveOutPrepareHeader(self._handle, ctypes.byref(self._header), ctypes.sizeof(self._header)),
+                    "waveOutPrepareHeader")
+
+    def play(self):
+        self._winmm.waveOutReset(self._handle) # 停止上一次播放，缓冲重新可用
+        self._check(self._winmm.waveOutWrite(self._handle, ctypes.byref(self._header), ctypes.sizeof(self._header)),
+                    "waveOutWrite")
+
+    def close(self):
+        if self._handle is None:
+            return
+        self._winmm.waveOutReset(self._handle)
+        self._winmm.waveOutUnprepareHeader(self._handle, ctypes.byref(self._header), ctypes.sizeof(self._header))
+        self._winmm.waveOutClose(self._handle)
+        self._handle = None
+
+class WinsoundSoundBackend(SoundBackend):
+    """
+    用 winsound.PlaySound(SND_MEMORY) 从内存播放，支持系统能播放的任何 WAV。
+    调用会阻塞到播放结束，期间的新请求由 SoundPlayer 合并。
+    """
+    name = "winsound"
+
+    def __init__(self):
+        import winsound
+        self._winsound = winsound
+        self._data = None
+
+    def open(self, wav_data):
+        self._data = wav_data
+
+    def play(self):
+        self._winsound.PlaySound(self._data, self._winsound.SND_MEMORY | self._winsound.SND_NODEFAULT)
+
+class NullSoundBackend(SoundBackend):
+    """不发出声音的输出，记录播放次数；duration 模拟每次播放阻塞的秒数，用于测试合并与限速。"""
+    name = "无声"
+
+    def __init__(self, duration=0.0):
+        self.duration = duration
+        self.plays = 0
+        self.wav_bytes = 0
+
+    def open(self, wav_data):
+        self.wav_bytes = len(wav_data)
+
+    def play(self):
+        self.plays += 1
+        if self.duration:
+            time.sleep(self.duration)
+
+# 音效输出名称 -> 输出类
+SOUND_BACKENDS = {
+    "waveout": WaveOutSoundBackend,
+    "winsound": WinsoundSoundBackend,
+    "null": NullSoundBackend,
+}
+
+def create_sound_backend(name):
+    if name not in SOUND_BACKENDS:
+        raise ValueError(f"未知的音效输出 '{name}'，可选: {', '.join(SOUND_BACKENDS)}")
+    return SOUND_BACKENDS[name]()
+
+class SoundPlayer:
+    """
+    快门音效服务：WAV 文件只读取一次，由一个专用线程通过常驻的输出播放，不占用线程池。
+    play() 只设置一个标志后立即返回：正在等待播放时的新请求直接合并，
+    两次播放的开始时间至少相隔 min_interval 秒，连拍时音效不会堆积。
+    backend 为 None 时 Windows 上依次尝试 waveout、winsound，其他平台使用 null。
+    """
+    def __init__(self, path, backend=None, min_interval=0.08):
+        self.path = path
+        self.backend = backend
+        self.min_interval = max(0.0, min_interval)
+        self._cond = threading.Condition()
+        self._pending = False
+        self._requested_at = 0.0
+        self._stopped = False
+        self._unavailable = False
+        self._thread = None
+        self.active_backend = None # 实际使用的输出，加载完成后设置
+        self.played = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.trigger_latency = LatencyStats("音效触发延迟")
+
+    def start(self):
+        """启动播放线程并在其中加载 WAV；可以提前调用，避免第一次播放时等待加载。"""
+        with self._cond:
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="SoundPlayer", daemon=True)
+                self._thread.start()
+
+    def play(self):
+        """请求播放一次。被合并或音效不可用时返回 False。"""
+        self.start()
+        with self._cond:
+            if self._stopped or self._unavailable:
+                return False
+            if self._pending:
+                self.coalesced += 1
+                return False
+            self._pending = True
+            self._requested_at = time.perf_counter()
+            self._cond.notify()
+        return True
+
+    def _open_backend(self, wav_data):
+        if self.backend is not None:
+            self.backend.open(wav_data)
+            return self.backend
+        names = ("waveout", "winsound") if sys.platform == "win32" else ("null",)
+        for name in names:
+            try:
+                backend = create_sound_backend(name)
+                backend.open(wav_data)
+                return backend
+            except Exception as e:
+                sound_log.warning("无法使用%s播放音效: %s", name, e)
+        raise OSError("没有可用的音效输出")
+
+    def _run(self):
+        try:
+            with open(self.path, 'rb') as f:
+                wav_data = f.read()
+            backend = self._open_backend(wav_data)
+        except Exception as e:
+            sound_log.error("加载截图音效 %s 失败: %s", self.path, e)
+            with self._cond:
+                self._unavailable = True
+                self._pending = False
+            return
+        self.active_backend = backend
+        sound_log.info("截图音效已加载: %s (%s, %.0fKB)", self.path, backend.name, len(wav_data) / 1024)
+        last_started = None
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not self._stopped:
+                        self._cond.wait()
+                    if self._stopped:
+                        return
+                    requested_at = self._requested_at
+                if last_started is not None:
+                    wait = self.min_interval - (time.perf_counter() - last_started)
+                    if wait > 0:
+                        time.sleep(wait) # 限速期间的新请求会被合并
+                with self._cond:
+                    self._pending = False
+                last_started = time.perf_counter()
+                self.trigger_latency.record((last_started - requested_at) * 1000)
+                try:
+                    backend.play()
+                except Exception as e:
+                    with self._cond:
+                        self.failed += 1
+                    sound_log.warning("播放截图音效失败: %s", e)
+                else:
+                    with self._cond:
+                        self.played += 1
+        finally:
+            backend.close()
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "played": self.played,
+                "coalesced": self.coalesced,
+                "failed": self.failed,
+                "backend": self.active_backend.name if self.active_backend is not None else None,
+            }
+
+class CaptureEngine:
+    """
+    不依赖界面的截图引擎：组合截图上下文、截图流水线、缩略图缓存和截图库目录，供命令行和测试使用。
+    截图保存到 root/<folder>/，写盘后直接登记到截图库并生成缩略图（与托盘程序相同的数据库）。
+    """
+    def __init__(self, root=BASE_SCREENSHOT_DIR, backend=None, output_format="png", png_compress_level=6,
+                 archive_compress_level=9, queue_size=4, policy="block", workers=2, thumbnail_cache_mb=256,
+                 on_change=None, trace_capacity=500, trace_file=None, capture_mode="cursor"):
+        self.root = root
+        self.capture_mode = capture_mode if capture_mode in CAPTURE_MODES else "cursor"
+        self.backend = backend if backend is not None else create_capture_backend()
+        # 排队中的帧、正在编码的帧各占一块缓冲，再多留一块给正在抓取的帧
+        self.context = CaptureContext(self.backend, FrameBufferPool(max_free_per_size=queue_size + workers + 1))
+        self.output_format = build_output_format(output_format, png_compress_level)
+        self.traces = TraceRecorder(trace_capacity, trace_file)
+        self.pipeline = CapturePipeline(queue_size=queue_size, policy=policy, workers=workers,
+                                        on_saved=self._on_saved, on_encoded=self._on_encoded, tracer=self.traces)
+        self.archive_compress_level = archive_compress_level
+        self.thumbnail_budget = thumbnail_cache_mb * 1024 * 1024
+        self.on_change = on_change # 截图库变化回调，参见 LibraryCatalog
+        # 只有真实桌面后端才回退到 ImageGrab 全屏截图
+        self.fallback = isinstance(self.backend, GdiCaptureBackend)
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._thumbnails = None
+        self._transcoder = None
+
+    def catalog(self):
+        """截图库目录（首次使用时打开）。"""
+        with self._lock:
+            if self._catalog is None:
+                os.makedirs(self.root, exist_ok=True)
+                self._catalog = LibraryCatalog(os.path.join(self.root, LIBRARY_DB_NAME), on_change=self.on_change)
+            return self._catalog
+
+    def thumbnails(self):
+        """缩略图缓存（首次使用时打开）。"""
+        with self._lock:
+            if self._thumbnails is None:
+                os.makedirs(self.root, exist_ok=True)
+                self._thumbnails = ThumbnailStore(os.path.join(self.root, THUMBNAIL_DB_NAME), self.thumbnail_budget)
+            return self._thumbnails
+
+    def _get_transcoder(self):
+        with self._lock:
+            if self._transcoder is None:
+                self._transcoder = DeferredTranscoder(
+                    compress_level=self.archive_compress_level,
+                    is_busy=self.pipeline.is_busy,
+                    on_transcoded=self._on_transcoded,
+                )
+                self._transcoder.start()
+            return self._transcoder
+
+    def _on_saved(self, frame):
+        if frame.output_format.deferred:
+            self._get_transcoder().enqueue(frame.filename)
+
+    def _on_encoded(self, frame, image):
+        stat = os.stat(frame.filename)
+        self.catalog().add_file(frame.filename, monitor=frame.monitor, size=image.size,
+                                image_format=frame.output_format.pil_format, stat=stat)
+        self.thumbnails().put(frame.filename, stat.st_mtime_ns, stat.st_size, THUMBNAIL_SIZE, encode_thumbnail(image))
+
+    def _on_transcoded(self, old_path, new_path):
+        stat = os.stat(new_path)
+        self.thumbnails().rename(old_path, new_path, stat.st_mtime_ns, stat.st_size)
+        self.catalog().move(old_path, new_path)
+
+    def monitors(self):
+        return self.context.monitors()
+
+    def capture(self, x=0, y=0, folder="Capture", hotkey_time=None, mode=None):
+        """
+        按截图范围 mode（默认 capture_mode，参见 CAPTURE_MODES）抓取并提交到截图流水线，编码在后台进行；
+        cursor 模式抓取坐标 (x, y) 所在显示器。返回将要写入的文件路径列表，抓取失败时为空列表。
+        需要等文件写完时调用 wait_idle()。
+        """
+        self.pipeline.start()
+        target = CaptureTarget(x, y, folder, os.path.join(self.root, folder), self.output_format)
+        frames = grab_target_frames(self.context, target, mode or self.capture_mode, hotkey_time, fallback=self.fallback)
+        if len(frames) > 1:
+            self.pipeline.ensure_workers(len(frames)) # 各显示器的截图并行编码
+        filenames = []
+        for frame in frames:
+            if self.pipeline.submit(frame):
+                filenames.append(frame.filename)
+            else:
+                frame.release()
+        return filenames
+
+    def wait_idle(self, timeout=None):
+        """等待已提交的截图全部写盘。"""
+        return self.pipeline.wait_idle(timeout)
+
+    def folders(self, refresh=True):
+        """返回 [(文件夹名, 路径)]；refresh 为 True 时先扫描截图根目录，补齐在程序外发生的变化。"""
+        if refresh and os.path.isdir(self.root):
+            self.catalog().reconcile()
+        return self.catalog().folders()
+
+    def images(self, folder, refresh=True):
+        """返回某个文件夹中的 [(文件名, 路径)]。"""
+        if refresh and os.path.isdir(os.path.join(self.root, folder)):
+            self.catalog().reconcile_folder(folder)
+        return self.catalog().images(folder)
+
+    def rebuild_thumbnails(self, folder=None, thumb_size=THUMBNAIL_SIZE, force=False, workers=None):
+        """
+        为截图库中的图片生成缩略图并写入缩略图缓存（解码在多个线程中并行进行）。
+        force 为 False 时跳过缓存中已有且仍然有效的缩略图。返回统计信息。
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        started = time.perf_counter()
+        store = self.thumbnails()
+        folders = [folder] if folder else [name for name, _ in self.folders()]
+        pending = []
+        skipped = 0
+        for name in folders:
+            for _, path in self.images(name):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if not force and store.get(path, stat.st_mtime_ns, stat.st_size, thumb_size) is not None:
+                    skipped += 1
+                    continue
+                pending.append((path, stat))
+
+        def build(item):
+            path, stat = item
+            try:
+                return path, stat, encode_thumbnail(load_thumbnail_image(path, thumb_size), thumb_size)
+            except Exception as e:
+                thumbnail_log.warning("生成缩略图 %s 失败: %s", path, e)
+                return path, stat, None
+
+        built = failed = 0
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as executor:
+            for path, stat, data in executor.map(build, pending):
+                if data is None:
+                    failed += 1
+                    continue
+                store.put(path, stat.st_mtime_ns, stat.st_size, thumb_size, data)
+                built += 1
+        return {"built": built, "skipped": skipped, "failed": failed, "elapsed": time.perf_counter() - started}
+
+    def stats(self):
+        """返回引擎各部分的统计信息（字典，可以直接序列化为 JSON）。"""
+        return {
+            "backend": self.backend.name,
+            "root": os.path.abspath(self.root),
+            "topology_rebuilds": self.context.rebuild_count,
+            "buffer_pool": self.context.buffer_pool.stats(),
+            "pipeline": self.pipeline.stats(),
+            "shot_to_file_ms": self.pipeline.shot_to_file.summary(),
+            "stages_ms": self.traces.summary(),
+            "transcoded": self._transcoder.transcoded if self._transcoder else 0,
+            "library": self.catalog().stats(),
+            "thumbnails": self.thumbnails().stats(),
+        }
+
+    def close(self):
+        """写完已提交的截图、转完 raw 格式的截图后释放所有资源。"""
+        self.pipeline.stop()
+        if self._transcoder is not None:
+            self._transcoder.stop(drain=True)
+        self.context.close()
+        with self._lock:
+            for resource in (self._catalog, self._thumbnails):
+                if resource is not None:
+                    resource.close()
+            self._catalog = self._thumbnails = None
+
+def load_engine_settings(config_file=CONFIG_FILE):
+    """
+    读取 config.ini 中与截图引擎有关的设置（截图根目录、输出格式、流水线参数），返回 CaptureEngine 的关键字参数。
+    读取规则与托盘程序一致，缺省或无效的项使用默认值。
+    """
+    import configparser # 只有命令行和脚本用到，托盘程序有自己的配置读取
+    settings = {"root": BASE_SCREENSHOT_DIR}
+    config = configparser.ConfigParser()
+    if not os.path.exists(config_file):
+        return settings
+    config.read(config_file, encoding='utf-8')
+    try:
+        if 'Settings' in config:
+            custom_dir = config['Settings'].get('custom_screenshot_dir', '')
+            if custom_dir and os.path.isdir(custom_dir):
+                settings["root"] = custom_dir
+        if 'Capture' in config:
+            capture = config['Capture']
+            settings["queue_size"] = max(1, capture.getint('queue_size', 4))
+            settings["workers"] = max(1, capture.getint('encode_workers', 2))
+            policy = capture.get('backpressure', 'block').strip().lower()
+            if policy in BACKPRESSURE_POLICIES:
+                settings["policy"] = policy
+            mode = capture.get('mode', 'cursor').strip().lower()
+            if mode in CAPTURE_MODES:
+                settings["capture_mode"] = mode
+        if 'Output' in config:
+            output = config['Output']
+            fmt = output.get('format', 'png').strip().lower()
+            if fmt in OUTPUT_FORMAT_NAMES:
+                settings["output_format"] = fmt
+            settings["png_compress_level"] = min(9, max(0, output.getint('png_compress_level', 6)))
+            settings["archive_compress_level"] = min(9, max(0, output.getint('archive_compress_level', 9)))
+        if 'Viewer' in config:
+            settings["thumbnail_cache_mb"] = max(8, config['Viewer'].getint('thumbnail_cache_mb', 256))
+        if 'Trace' in config:
+            settings["trace_capacity"] = max(1, config['Trace'].getint('buffer_size', 500))
+            settings["trace_file"] = config['Trace'].get('jsonl_file', '').strip() or None
+    except ValueError as e:
+        config_log.warning("读取 %s 失败: %s，部分设置使用默认值。", config_file, e)
+    return settings
+
+def parse_monitor_layout(text):
+    """解析假后端的显示器布局，例如 "1920x1080,2560x1440"，从左到右依次排列。"""
+    monitors = []
+    x = 0
+    for index, item in enumerate(text.split(',')):
+        width, height = (int(v) for v in item.lower().split('x'))
+        monitors.append(MonitorInfo(x, 0, width, height, f"FAKE{index + 1}"))
+        x += width
+    return monitors
+
+def main(argv=None):
+    import argparse # 只有命令行用到
+
+    def add_common_options(target, defaults=True):
+        # 公共选项既可以写在子命令前也可以写在子命令后；子命令上的默认值为 SUPPRESS，不会覆盖写在前面的值
+        def default(value):
+            return value if defaults else argparse.SUPPRESS
+        target.add_argument("--config", default=default(CONFIG_FILE), help="配置文件（默认 config.ini）")
+        target.add_argument("--root", default=default(None), help="截图根目录（默认使用配置文件中的设置）")
+        target.add_argument("--backend", choices=sorted(CAPTURE_BACKENDS), default=default(None),
+                            help="截图后端（默认 Windows 上为 gdi，其他平台为 imagegrab）")
+        target.add_argument("--monitors", default=default("1920x1080"), help="fake 后端的显示器布局，例如 1920x1080,2560x1440")
+        target.add_argument("--xdisplay", default=default(None), help="imagegrab 后端使用的 X 显示，例如 :99")
+        target.add_argument("--log-level", choices=list(LOG_LEVELS), default=default("info"), help="日志级别（输出到标准错误，默认 info）")
+        target.add_argument("--log-file", default=default(None), help="同时把日志写入该文件")
+
+    parser = argparse.ArgumentParser(prog="capture_engine", description="F10Capture 截图引擎命令行")
+    add_common_options(parser)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, help):
+        command = commands.add_parser(name, help=help)
+        add_common_options(command, defaults=False)
+        return command
+
+    capture = add_command("capture", "截图并保存")
+    capture.add_argument("--folder", default="Capture", help="保存到截图根目录下的哪个文件夹")
+    capture.add_argument("--format", choices=OUTPUT_FORMAT_NAMES, help="输出格式（默认使用配置文件中的设置）")
+    capture.add_argument("--mode", choices=CAPTURE_MODES, help="截图范围（默认使用配置文件中的设置）")
+    capture.add_argument("--x", type=int, default=0, help="cursor 模式下截取该坐标所在的显示器")
+    capture.add_argument("--y", type=int, default=0)
+    capture.add_argument("--count", type=int, default=1, help="连续截图的张数")
+    capture.add_argument("--interval-ms", type=int, default=0, help="连续截图的间隔（毫秒）")
+    capture.add_argument("--trace-file", help="把每次截图的分阶段耗时追加到该 JSONL 文件")
+
+    add_command("folders", "列出截图文件夹")
+    images = add_command("images", "列出文件夹中的截图")
+    images.add_argument("folder")
+    rebuild = add_command("rebuild-thumbnails", "重新生成缩略图缓存")
+    rebuild.add_argument("--folder", help="只处理这个文件夹")
+    rebuild.add_argument("--force", action="store_true", help="缓存中已有有效缩略图时也重新生成")
+    stats = add_command("stats", "显示截图库和缩略图缓存的统计信息")
+    stats.add_argument("--json", action="store_true", help="以 JSON 输出")
+
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level, args.log_file)
+    settings = load_engine_settings(args.config)
+    if args.root:
+        settings["root"] = args.root
+    if args.command == "capture" and args.format:
+        settings["output_format"] = args.format
+    if args.command == "capture" and args.trace_file:
+        settings["trace_file"] = args.trace_file
+
+    backend = None
+    if args.backend == "fake":
+        backend = FakeCaptureBackend(parse_monitor_layout(args.monitors))
+    elif args.backend == "imagegrab":
+        backend = ImageGrabCaptureBackend(args.xdisplay)
+    elif args.backend or args.command == "capture":
+        backend = create_capture_backend(args.backend)
+    else:
+        # 不截图的命令不需要真实的截图后端
+        backend = FakeCaptureBackend()
+
+    engine = CaptureEngine(backend=backend, **settings)
+    try:
+        if args.command == "capture":
+            saved = []
+            for index in range(max(1, args.count)):
+                if index and args.interval_ms:
+                    time.sleep(args.interval_ms / 1000.0)
+                saved.extend(engine.capture(args.x, args.y, args.folder, mode=args.mode))
+            engine.wait_idle()
+            print(f"已保存 {len(saved)} 张截图。{engine.pipeline.shot_to_file}")
+            print(engine.traces.format_summary())
+            return 0 if saved else 1
+        if args.command == "folders":
+            for name, _ in engine.folders():
+                print(f"{name}\t{len(engine.images(name, refresh=False))}")
+        elif args.command == "images":
+            for _, path in engine.images(args.folder):
+                print(path)
+        elif args.command == "rebuild-thumbnails":
+            result = engine.rebuild_thumbnails(args.folder, force=args.force)
+            print(f"缩略图已生成: {result['built']} 张, 跳过 {result['skipped']} 张, "
+                  f"失败 {result['failed']} 张, 耗时 {result['elapsed']:.1f}s")
+        elif args.command == "stats":
+            engine.folders()
+            result = engine.stats()
+            if args.json:
+                print(json.dumps(result, ensure_ascii=False, indent=2))
+            else:
+                library, thumbnails = result["library"], result["thumbnails"]
+                print(f"截图根目录: {result['root']}")
+                print(f"截图库: {library['folders']} 个文件夹, {library['screenshots']} 张截图, {library['mb']:.1f}MB")
+                print(f"缩略图缓存: {thumbnails['entries']} 条, {thumbnails['mb']:.1f}MB")
+        return 0
+    finally:
+        engine.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
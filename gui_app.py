@@ -1,42 +1,66 @@
 # -*- coding: utf-8 -*-
+import time # 导入time模块用于模拟耗时操作或延迟
+STARTUP_STARTED = time.perf_counter() # 用于统计启动到热键就绪的耗时
+
 import os
-import datetime
 import threading
-from pynput import keyboard, mouse
-from screeninfo import get_monitors
-from PIL import Image, ImageGrab # 导入ImageGrab
 import win32api
 import win32gui
-import win32ui
 import win32con
-import win32process
-import psutil
 import configparser
 import sys
 import win32event
 import winerror
-from playsound import playsound # 导入playsound库
 import ctypes # 导入ctypes
-import time # 导入time模块用于模拟耗时操作或延迟
+import logging
 
 from ctypes.wintypes import MSG # 导入MSG结构体
 
+# 托盘进程启动时只导入热键、托盘和主窗口用到的类；查看窗口（gui_viewer）和设置窗口（gui_settings）
+# 连同它们的列表视图、QGraphics* 等依赖在第一次打开时才导入
 from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QSystemTrayIcon, QMenu, QFileDialog,
-    QMessageBox, QFrame, QSizePolicy, QGridLayout, QScrollArea,
-    QGraphicsScene, QGraphicsView, QGraphicsPixmapItem
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QLabel, QSystemTrayIcon, QMenu, QMessageBox
+)
+from PySide6.QtGui import QIcon, QAction, QActionGroup, QImage
+from PySide6.QtCore import Qt, QThread, QRunnable, QThreadPool
+
+# 截图、编码、缩略图缓存和截图库目录的实现位于不依赖界面的 capture_engine 模块
+from capture_engine import (
+    BACKPRESSURE_POLICIES, CAPTURE_MODES, OUTPUT_FORMAT_NAMES, THUMBNAIL_SIZE, THUMBNAIL_DB_NAME, LIBRARY_DB_NAME,
+    LazyModule, Image, GdiCaptureBackend, FrameBufferPool, CaptureContext, CaptureTarget, CapturePipeline,
+    DeferredTranscoder, BurstCapture, ReplayBuffer, LatencyStats, CaptureTrace, TraceRecorder,
+    ThumbnailStore, LibraryCatalog,
+    SoundPlayer, SOUND_BACKENDS, create_sound_backend,
+    NULL_TRACE, LOG_LEVELS, configure_logging, build_output_format, make_screenshot_filename, grab_target_frame, grab_target_frames,
+    encode_thumbnail,
 )
-from PySide6.QtGui import QIcon, QAction, QKeySequence, QPixmap, QImage, QPainter
-from PySide6.QtCore import Qt, QThread, Signal, QSettings, QSize, QDir, QRunnable, QThreadPool, QTimer
 
 # 配置文件路径
 CONFIG_FILE = "config.ini"
 
-# 全局线程池，用于管理后台任务
-thread_pool = QThreadPool.globalInstance()
-thread_pool.setMaxThreadCount(os.cpu_count() or 4) # 设置线程池最大线程数，默认为CPU核心数或4
-print(f"线程池已初始化，最大线程数: {thread_pool.maxThreadCount()}")
+# 启动时用不到的依赖在第一次使用时才加载：psutil 和 win32process 在第一次识别进程时，
+# Pillow（capture_engine.Image）在第一次截图或解码时，pynput 只在设置窗口录制按键时使用
+psutil = LazyModule("psutil")
+win32process = LazyModule("win32process")
+
+# 各子系统的日志记录器；截图、流水线、截图库等引擎部分的日志记录器在 capture_engine 中
+app_log = logging.getLogger("f10.app")
+config_log = logging.getLogger("f10.config")
+hotkey_log = logging.getLogger("f10.hotkey")
+process_log = logging.getLogger("f10.process")
+viewer_log = logging.getLogger("f10.viewer")
+pool_log = logging.getLogger("f10.pool")
+capture_log = logging.getLogger("f10.capture")
+pipeline_log = logging.getLogger("f10.pipeline")
+replay_log = logging.getLogger("f10.replay")
+trace_log = logging.getLogger("f10.trace")
+
+# 后台线程池设置（config.ini 的 [Pools] 节）
+# 截图后处理（保存图标、播放音效）、查看窗口解码和后台维护各用一个线程池，
+# 查看窗口解码再多也不会让新截图的音效排队
+POOL_CAPTURE_THREADS = 2
+POOL_VIEWER_THREADS = max(2, (os.cpu_count() or 4) - 2)
+POOL_MAINTENANCE_THREADS = 1
 
 # 互斥量名称，用于实现单例模式
 MUTEX_NAME = "F10CaptureAppMutex"
@@ -46,9 +70,182 @@ BASE_SCREENSHOT_DIR = "ScreenShots"
 # 用户自定义截图目录
 CUSTOM_SCREENSHOT_DIR = ""
 
-# 默认截图按键
-KEYBINDING = keyboard.Key.f10 # 初始设置为F10
+# 默认截图按键，保存为键名（与 config.ini 中的写法相同）
+KEYBINDING = "f10" # 初始设置为F10
+
+# 截图流水线设置（config.ini 的 [Capture] 节）
+CAPTURE_QUEUE_SIZE = 4 # 内存中最多排队等待编码的帧数
+CAPTURE_BACKPRESSURE = "block" # 队列满时的策略: block / drop_oldest / spill
+CAPTURE_ENCODE_WORKERS = 2 # 后台编码线程数
+CAPTURE_MODE = "cursor" # 截图范围: cursor（鼠标所在显示器）/ stitched（所有显示器拼成一张）/ per_monitor（每个显示器一张）
+
+# 截图输出格式设置（config.ini 的 [Output] 节，[FolderFormats] 节可按进程文件夹单独指定格式）
+OUTPUT_FORMAT = "png" # png / webp / qoi / raw
+PNG_COMPRESS_LEVEL = 6 # 0-9，越小越快、文件越大
+ARCHIVE_COMPRESS_LEVEL = 9 # raw 快速转储在后台转成 PNG 时使用的压缩级别
+FOLDER_OUTPUT_FORMATS = {} # 进程文件夹名（小写） -> 输出格式
+# 连拍设置（config.ini 的 [Burst] 节）
+BURST_FRAME_COUNT = 10 # 每次连拍的帧数
+BURST_INTERVAL_MS = 100 # 帧间隔（毫秒）
+BURST_MODIFIER = "none" # 连拍热键 = 修饰键 + 截图按键；默认 none 不注册（Shift+F10 是系统的“打开右键菜单”快捷键）
+HOTKEY_MODIFIER_NAMES = ("none", "shift", "ctrl", "alt")
+
+# 即时回放设置（config.ini 的 [Replay] 节）
+REPLAY_ENABLED = False # 是否在后台持续缓存画面
+REPLAY_FPS = 2.0 # 后台抓取帧率
+REPLAY_SECONDS = 10 # 最多保留最近多少秒
+REPLAY_MEMORY_MB = 128 # 环形缓冲的内存上限
+REPLAY_SCALE = 2 # 缩小倍数（1 表示原始分辨率）
+REPLAY_JPEG_QUALITY = 85
+REPLAY_MODIFIER = "none" # 回放热键 = 修饰键 + 截图按键，只在即时回放开启时注册；默认 none 不注册（Ctrl+F10 是许多程序的常用快捷键）
+
+# 查看窗口设置（config.ini 的 [Viewer] 节）
+THUMBNAIL_CACHE_MB = 256 # 缩略图缓存数据库的容量上限
+FULLSCREEN_CACHE_MB = 256 # 全屏浏览时预取的已解码图片在内存中的上限
+FULLSCREEN_PREFETCH_AHEAD = 2 # 向浏览方向预取的图片数（反方向预取 1 张）
+# 截图耗时记录设置（config.ini 的 [Trace] 节）
+TRACE_BUFFER_SIZE = 500 # 内存中保留最近多少次截图的分阶段耗时
+TRACE_JSONL_FILE = "" # 非空时把每次截图的耗时记录追加到该 JSONL 文件
+# 日志设置（config.ini 的 [Logging] 节）。level = off 且 console = false 时完全静默
+LOG_LEVEL = "info" # debug / info / warning / error / off
+LOG_FILE = "" # 非空时同时写入该文件（后台线程写入，按大小轮转）
+LOG_CONSOLE = True # 是否输出到控制台
+# 截图音效设置（config.ini 的 [Sound] 节）
+SOUND_ENABLED = True
+SOUND_FILE = "screenshot_sound.wav" # 相对路径相对于程序所在目录，而不是当前工作目录
+SOUND_BACKEND = "" # waveout / winsound / null，留空时自动选择
+SOUND_MIN_INTERVAL_MS = 80 # 两次快门声的最短间隔，连拍时更密集的请求会被合并
+# 启动设置（config.ini 的 [Startup] 节）
+PRELOAD_MODULES = True # 热键就绪后在后台加载截图用到的模块；关闭时空闲内存更少，但第一次截图要等待加载
+
+class ProcessIdentity:
+    """
+    一个进程的身份信息：进程名（不含 .exe）、可执行文件路径、创建时间以及已提取的图标。
+    """
+    __slots__ = ('pid', 'name', 'exe', 'create_time', 'icon')
+
+    def __init__(self, pid, name, exe, create_time):
+        self.pid = pid
+        self.name = name
+        self.exe = exe
+        self.create_time = create_time
+        self.icon = None # 提取出的图标（QImage），由调用方填充
+
+class ProcessIdentityCache:
+    """
+    进程身份缓存：pid -> ProcessIdentity，进程名 -> 可执行文件路径。
+    截图时由前景窗口的 pid 填充，进程退出或 pid 被复用时失效，
+    这样保存图标时不再需要用 psutil.process_iter 遍历所有进程。
+    """
+    def __init__(self, negative_ttl=30.0):
+        self._by_pid = {}
+        self._exe_by_name = {} # 小写进程名 -> exe 路径
+        self._missing = {} # 小写进程名 -> 上次全量扫描未找到的时间
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.scans = 0
+
+    def identify(self, pid):
+        """
+        返回 pid 对应的 ProcessIdentity；进程不存在时返回 None。
+        缓存项通过创建时间校验，pid 被新进程复用时会重新读取。
+        """
+        try:
+            create_time = psutil.Process(pid).create_time()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            self.invalidate(pid)
+            return None
+        with self._lock:
+            identity = self._by_pid.get(pid)
+            if identity is not None and identity.create_time == create_time:
+                self.hits += 1
+                return identity
+            self.misses += 1
+        try:
+            process = psutil.Process(pid)
+            name = process.name().replace(".exe", "")
+            try:
+                exe = process.exe()
+            except (psutil.AccessDenied, psutil.ZombieProcess):
+                exe = None
+        except psutil.NoSuchProcess:
+            self.invalidate(pid)
+            return None
+        identity = ProcessIdentity(pid, name, exe, create_time)
+        with self._lock:
+            self._by_pid[pid] = identity
+            if exe:
+                self._exe_by_name[name.lower()] = exe
+                self._missing.pop(name.lower(), None)
+        return identity
+
+    def invalidate(self, pid):
+        """进程已退出，移除对应的缓存项。"""
+        with self._lock:
+            self._by_pid.pop(pid, None)
+
+    def exe_for_name(self, process_name):
+        """
+        返回进程名（不含 .exe）对应的可执行文件路径。
+        缓存未命中时做一次全量扫描并缓存扫描到的所有进程，找不到的名称在 negative_ttl 秒内不再扫描。
+        """
+        key = process_name.lower()
+        with self._lock:
+            exe = self._exe_by_name.get(key)
+            missing_since = self._missing.get(key)
+        if exe and os.path.exists(exe):
+            return exe
+        if missing_since is not None and time.monotonic() - missing_since < self.negative_ttl:
+            return None
+        self._scan()
+        with self._lock:
+            exe = self._exe_by_name.get(key)
+            if not exe:
+                self._missing[key] = time.monotonic()
+        return exe
+
+    def _scan(self):
+        with self._lock:
+            self.scans += 1
+        found = {}
+        try:
+            for proc in psutil.process_iter(['name', 'exe']):
+                name = proc.info['name']
+                exe = proc.info['exe']
+                if name and exe:
+                    found[name.lower().replace(".exe", "")] = exe
+        except Exception as e:
+            process_log.warning("扫描进程列表失败: %s", e)
+        with self._lock:
+            self._exe_by_name.update(found)
+            # 清理已经退出的进程
+            for pid in [pid for pid in self._by_pid if not psutil.pid_exists(pid)]:
+                del self._by_pid[pid]
+
+    def icon_for_exe(self, exe):
+        """返回已为该可执行文件提取过的图标。"""
+        with self._lock:
+            for identity in self._by_pid.values():
+                if identity.exe == exe and identity.icon is not None:
+                    return identity.icon
+        return None
+
+    def remember_icon(self, exe, icon):
+        """记录为该可执行文件提取出的图标，供后续查找复用。"""
+        with self._lock:
+            for identity in self._by_pid.values():
+                if identity.exe == exe:
+                    identity.icon = icon
+
+    def stats(self):
+        with self._lock:
+            return {"pids": len(self._by_pid), "names": len(self._exe_by_name),
+                    "hits": self.hits, "misses": self.misses, "scans": self.scans}
 
+# 全局进程身份缓存
+process_cache = ProcessIdentityCache()
 
 def get_foreground_process_name():
     """
@@ -58,247 +255,623 @@ def get_foreground_process_name():
         hwnd = win32gui.GetForegroundWindow()
         if hwnd:
             thread_id, process_id = win32process.GetWindowThreadProcessId(hwnd)
-            try:
-                process = psutil.Process(process_id)
-                return process.name().replace(".exe", "")
-            except psutil.NoSuchProcess:
+            identity = process_cache.identify(process_id)
+            if identity is None:
                 return "UnknownProcess"
+            return identity.name
         return "NoActiveWindow"
     except Exception as e:
-        print(f"获取前景进程名称失败: {e}")
+        process_log.warning("获取前景进程名称失败: %s", e)
         return "Erro  rProcess"
 
-def save_process_icon(process_name, target_dir):
+def is_valid_icon_file(icon_filename):
     """
-    根据进程名称获取其可执行文件的图标并保存到指定目录。
+    检查文件夹中已有的 icon.png 是否是一个完整的 PNG 文件。
     """
-    icon_filename = os.path.join(target_dir, "icon.png")
     try:
-        for proc in psutil.process_iter(['name', 'exe']):
-            if proc.info['name'] and proc.info['name'].lower() == process_name.lower() + ".exe":
-                exe_path = proc.info['exe']
-                if exe_path and os.path.exists(exe_path):
-                    try:
-                        hicon = win32gui.ExtractIcon(0, exe_path, 0)
-                        if hicon:
-                            pixmap = QPixmap.fromImage(QImage.fromHICON(hicon))
-                            if not pixmap.isNull():
-                                pixmap.save(icon_filename, "PNG")
-                                print(f"进程 '{process_name}' 的图标已保存到: {icon_filename}")
-                            win32gui.DestroyIcon(hicon)
-                            return True
-                    except Exception as icon_e:
-                        print(f"从 '{exe_path}' 提取并保存图标失败: {icon_e}")
-                break
-    except Exception as e:
-        print(f"保存进程 '{process_name}' 图标失败: {e}")
-    return False
+        with open(icon_filename, 'rb') as f:
+            return f.read(8) == b'\x89PNG\r\n\x1a\n' and os.path.getsize(icon_filename) > 8
+    except OSError:
+        return False
 
-# 进程图标缓存
-_process_icon_cache = {}
-
-def get_process_icon(folder_name):
+def extract_exe_icon(exe_path):
     """
-    根据文件夹名称（通常是进程名称）获取其对应的图标。
-    首先尝试从缓存加载，然后从文件夹中加载预保存的图标，如果失败则尝试从实时进程中提取，
-    最后回退到默认图标。
+    从可执行文件中提取图标，返回 QImage；失败时返回 None。
     """
-    if folder_name in _process_icon_cache:
-        print(f"从缓存加载图标: {folder_name}")
-        return _process_icon_cache[folder_name]
-
-    default_icon_path = "icon.png"
-    if hasattr(sys, '_MEIPASS'):
-        default_icon_path = os.path.join(sys._MEIPASS, default_icon_path)
-
-    screenshot_base_dir = BASE_SCREENSHOT_DIR
-    if CUSTOM_SCREENSHOT_DIR and os.path.isdir(CUSTOM_SCREENSHOT_DIR):
-        screenshot_base_dir = CUSTOM_SCREENSHOT_DIR
-    
-    folder_full_path = os.path.join(screenshot_base_dir, folder_name)
-    icon_in_folder_path = os.path.join(folder_full_path, "icon.png")
-
-    # 1. 尝试从文件夹中加载预保存的图标
-    if os.path.exists(icon_in_folder_path):
-        pixmap = QPixmap(icon_in_folder_path)
-        if not pixmap.isNull():
-            icon = QIcon(pixmap)
-            _process_icon_cache[folder_name] = icon
-            print(f"从文件夹 '{folder_name}' 加载预保存图标并缓存。")
-            return icon
-        else:
-            print(f"警告: 无法从 '{icon_in_folder_path}' 加载图标，尝试从实时进程获取。")
+    hicon = win32gui.ExtractIcon(0, exe_path, 0)
+    if not hicon:
+        process_log.warning("从 '%s' 提取图标失败: win32gui.ExtractIcon 返回空句柄。", exe_path)
+        return None
+    try:
+        image = QImage.fromHICON(hicon)
+    finally:
+        win32gui.DestroyIcon(hicon)
+    return None if image.isNull() else image
 
-    # 2. 如果文件夹中没有预保存的图标，或者加载失败，则尝试从实时进程中提取
-    process_name_for_live_lookup = folder_name
+def save_process_icon(process_name, target_dir):
+    """
+    根据进程名称获取其可执行文件的图标并保存到指定目录。
+    文件夹中已有有效的 icon.png 时直接跳过。
+    """
+    icon_filename = os.path.join(target_dir, "icon.png")
+    if is_valid_icon_file(icon_filename):
+        return True
     try:
-        for proc in psutil.process_iter(['name', 'exe']):
-            if proc.info['name'] and proc.info['name'].lower() == process_name_for_live_lookup.lower() + ".exe":
-                exe_path = proc.info['exe']
-                if exe_path and os.path.exists(exe_path):
-                    try:
-                        hicon = win32gui.ExtractIcon(0, exe_path, 0)
-                        if hicon:
-                            pixmap = QPixmap.fromImage(QImage.fromHICON(hicon))
-                            win32gui.DestroyIcon(hicon)
-                            if not pixmap.isNull():
-                                icon = QIcon(pixmap)
-                                _process_icon_cache[folder_name] = icon
-                                print(f"从实时进程 '{process_name_for_live_lookup}' 提取图标并缓存。")
-                                return icon
-                        else:
-                            print(f"从 '{exe_path}' 提取图标失败: win32gui.ExtractIcon 返回空句柄。")
-                    except Exception as icon_e:
-                        print(f"从 '{exe_path}' 提取并保存图标失败: {icon_e}")
-                break
+        exe_path = process_cache.exe_for_name(process_name)
+        if exe_path and os.path.exists(exe_path):
+            try:
+                image = process_cache.icon_for_exe(exe_path) or extract_exe_icon(exe_path)
+                if image is not None:
+                    process_cache.remember_icon(exe_path, image)
+                    image.save(icon_filename, "PNG")
+                    process_log.info("进程 '%s' 的图标已保存到: %s", process_name, icon_filename)
+                    return True
+            except Exception as icon_e:
+                process_log.warning("从 '%s' 提取并保存图标失败: %s", exe_path, icon_e)
     except Exception as e:
-        print(f"获取进程 '{process_name_for_live_lookup}' 图标失败: {e}")
-    
-    # 3. 如果上述方法都失败，返回默认图标
-    print(f"未能为 '{folder_name}' 获取特定图标，使用默认图标并缓存。")
-    default_icon = QIcon(default_icon_path)
-    _process_icon_cache[folder_name] = default_icon
-    return default_icon
+        process_log.warning("保存进程 '%s' 图标失败: %s", process_name, e)
+    return False
 
 class ScreenshotWorker(QRunnable):
     """
-    用于在后台执行截图后处理任务（保存图标和播放音效）的QRunnable。
+    用于在后台执行截图后处理任务（播放音效和保存图标）的QRunnable。
+    trace 为该截图的耗时记录，记录 sound 和 icon 阶段后交给 trace_recorder。
     """
-    def __init__(self, process_name, screenshot_dir):
+    def __init__(self, process_name, screenshot_dir, play_sound=True, trace=None):
         super().__init__()
         self.process_name = process_name
         self.screenshot_dir = screenshot_dir
+        self.play_sound = play_sound
+        self.trace = trace
 
     def run(self):
-        # 1. 保存进程图标
-        save_process_icon(self.process_name, self.screenshot_dir)
-        
-        # 2. 播放截图音效
+        trace = self.trace or NULL_TRACE
         try:
-            playsound('screenshot_sound.wav')
-            print("截图音效已播放。")
-        except Exception as sound_e:
-            print(f"播放截图音效失败: {sound_e}")
+            # 1. 播放截图音效：只是通知音效线程，立即返回，先于保存图标以便尽早听到快门声
+            if self.play_sound and SOUND_ENABLED:
+                with trace.stage("sound"):
+                    get_sound_player().play()
+
+            # 2. 保存进程图标
+            with trace.stage("icon"):
+                save_process_icon(self.process_name, self.screenshot_dir)
+        finally:
+            if self.trace is not None:
+                trace_recorder.finish(self.trace)
+
+def get_resource_path(name):
+    """程序自带文件的路径：打包后位于 _MEIPASS，否则位于程序所在目录。绝对路径原样返回。"""
+    if os.path.isabs(name):
+        return name
+    base_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, name)
+
+# 截图音效服务，首次使用时创建
+sound_player = None
+_sound_player_lock = threading.Lock()
+
+def get_sound_player():
+    """获取（必要时创建）截图音效服务。"""
+    global sound_player
+    with _sound_player_lock:
+        if sound_player is None:
+            backend = create_sound_backend(SOUND_BACKEND) if SOUND_BACKEND else None
+            sound_player = SoundPlayer(get_resource_path(SOUND_FILE), backend, SOUND_MIN_INTERVAL_MS / 1000)
+        return sound_player
+
+# 全局截图上下文，首次截图时创建
+capture_context = None
+
+def get_capture_context():
+    """
+    获取（必要时创建）全局截图上下文。
+    """
+    global capture_context
+    if capture_context is None:
+        # 排队中的帧、正在编码的帧各占一块缓冲，再多留一块给正在抓取的帧
+        buffer_pool = FrameBufferPool(max_free_per_size=CAPTURE_QUEUE_SIZE + CAPTURE_ENCODE_WORKERS + 1)
+        capture_context = CaptureContext(GdiCaptureBackend(), buffer_pool)
+    return capture_context
+
+def get_output_format(process_name):
+    """
+    返回指定进程文件夹应使用的输出格式：优先使用 [FolderFormats] 中的设置，否则使用全局设置。
+    """
+    return build_output_format(FOLDER_OUTPUT_FORMATS.get(process_name.lower(), OUTPUT_FORMAT), PNG_COMPRESS_LEVEL)
+
+# 热键处理函数（nativeEvent）从收到消息到返回的耗时
+hotkey_latency = LatencyStats("热键返回延迟")
+# 每次截图的分阶段耗时记录，在托盘菜单的“截图耗时统计”中查看汇总
+trace_recorder = TraceRecorder(TRACE_BUFFER_SIZE, TRACE_JSONL_FILE)
 
-def take_screenshot_windows_api():
+class TaskPool:
     """
-    使用Windows API根据鼠标当前位置截取对应屏幕并保存到本地文件。
-    如果Windows API截图失败，则尝试使用ImageGrab进行全屏截图。
-    截图后处理（保存图标和播放音效）将提交到线程池异步执行。
+    带名字和统计的线程池：每个池有独立的线程数上限和线程优先级，
+    记录排队深度、任务从提交到开始执行的等待时间和执行时间。
+    底层的 QThreadPool 在第一次提交任务时才创建，没用到的池不占资源。
     """
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    def __init__(self, name, max_threads, priority=QThread.NormalPriority):
+        self.name = name
+        self._pool = None
+        self._max_threads = max(1, max_threads)
+        self._priority = priority
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._completed = 0
+        self.wait_time = LatencyStats(f"{name}线程池排队等待")
+        self.run_time = LatencyStats(f"{name}线程池任务耗时")
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = QThreadPool()
+                self._pool.setMaxThreadCount(self._max_threads)
+                if hasattr(self._pool, "setThreadPriority"): # Qt 6.2 起支持
+                    self._pool.setThreadPriority(self._priority)
+            return self._pool
+
+    def set_max_threads(self, max_threads):
+        with self._lock:
+            self._max_threads = max(1, max_threads)
+            if self._pool is not None:
+                self._pool.setMaxThreadCount(self._max_threads)
+
+    def max_threads(self):
+        return self._max_threads
+
+    def start(self, task):
+        """提交一个 QRunnable 或普通函数。"""
+        pool = self._get_pool()
+        with self._lock:
+            self._queued += 1
+        pool.start(_PooledTask(self, task))
+
+    def _task_started(self, submitted_at):
+        with self._lock:
+            self._queued -= 1
+        self.wait_time.record((time.perf_counter() - submitted_at) * 1000)
+
+    def _task_finished(self, started_at):
+        with self._lock:
+            self._completed += 1
+        self.run_time.record((time.perf_counter() - started_at) * 1000)
+
+    def wait_for_done(self, timeout_ms=-1):
+        if self._pool is None:
+            return True
+        return self._pool.waitForDone(timeout_ms)
+
+    def stats(self):
+        with self._lock:
+            queued, completed = self._queued, self._completed
+            active = self._pool.activeThreadCount() if self._pool is not None else 0
+        wait = self.wait_time.summary()
+        return {
+            "max_threads": self._max_threads,
+            "active": active,
+            "queued": queued,
+            "completed": completed,
+            "wait_p95_ms": round(wait["p95"], 1) if wait["count"] else 0.0,
+            "wait_max_ms": round(wait["max"], 1) if wait["count"] else 0.0,
+        }
+
+class _PooledTask(QRunnable):
+    """TaskPool 中的一个任务：包装 QRunnable 或函数，记录等待和执行时间。"""
+    def __init__(self, owner, task):
+        super().__init__()
+        self.owner = owner
+        self.task = task # 保持引用，直到任务执行完
+        self.submitted_at = time.perf_counter()
+        self.setAutoDelete(True)
 
-    current_mouse_x, current_mouse_y = mouse.Controller().position
-    process_name = get_foreground_process_name() # 获取最上层窗口的进程名称
-    
-    global CUSTOM_SCREENSHOT_DIR
-    
-    if CUSTOM_SCREENSHOT_DIR and os.path.isdir(CUSTOM_SCREENSHOT_DIR):
-        final_screenshot_base_dir = CUSTOM_SCREENSHOT_DIR
-        print(f"使用自定义截图目录: {final_screenshot_base_dir}")
-    else:
-        final_screenshot_base_dir = BASE_SCREENSHOT_DIR
-        print(f"使用默认截图根目录: {final_screenshot_base_dir}")
+    def run(self):
+        self.owner._task_started(self.submitted_at)
+        started_at = time.perf_counter()
+        try:
+            if isinstance(self.task, QRunnable):
+                self.task.run()
+            else:
+                self.task()
+        except Exception as e:
+            pool_log.error("%s线程池任务失败: %s", self.owner.name, e)
+        finally:
+            self.owner._task_finished(started_at)
 
-    screenshot_dir = os.path.join(final_screenshot_base_dir, process_name)
-    os.makedirs(screenshot_dir, exist_ok=True)
+# 截图后处理优先级最高；查看窗口解码次之；转码扫描、回放写盘等维护任务最低
+capture_pool = TaskPool("截图后处理", POOL_CAPTURE_THREADS, QThread.HighPriority)
+viewer_pool = TaskPool("查看窗口", POOL_VIEWER_THREADS, QThread.LowPriority)
+maintenance_pool = TaskPool("后台维护", POOL_MAINTENANCE_THREADS, QThread.LowestPriority)
 
-    filename = os.path.join(screenshot_dir, f"{timestamp}.png")
+# 全局截图流水线实例，首次截图时创建
+capture_pipeline = None
+# 全局后台转码任务，首次使用 raw 格式时创建
+deferred_transcoder = None
 
-    img = None
-    try:
-        monitors = get_monitors()
-        target_monitor = None
-        for m in monitors:
-            if m.x <= current_mouse_x < m.x + m.width and \
-               m.y <= current_mouse_y < m.y + m.height:
-                target_monitor = m
-                break
-        
-        if target_monitor is None and monitors:
-            target_monitor = monitors[0] # 如果鼠标不在任何已知显示器上，则默认截取主显示器
-
-        if target_monitor:
-            hdesktop = win32gui.GetDesktopWindow()
-            desktop_dc = win32gui.GetWindowDC(hdesktop)
-            img_dc = win32ui.CreateDCFromHandle(desktop_dc)
-            
-            mem_dc = img_dc.CreateCompatibleDC()
-            
-            screenshot_bitmap = win32ui.CreateBitmap()
-            screenshot_bitmap.CreateCompatibleBitmap(img_dc, target_monitor.width, target_monitor.height)
-            mem_dc.SelectObject(screenshot_bitmap)
-            
-            mem_dc.BitBlt((0, 0), (target_monitor.width, target_monitor.height), 
-                          img_dc, (target_monitor.x, target_monitor.y), win32con.SRCCOPY)
-            
-            bmpinfo = screenshot_bitmap.GetInfo()
-            bmpstr = screenshot_bitmap.GetBitmapBits(True)
-            img = Image.frombuffer(
-                'RGB',
-                (bmpinfo['bmWidth'], bmpinfo['bmHeight']),
-                bmpstr, 'raw', 'BGRX', 0, 1
-            )
+def get_deferred_transcoder():
+    """
+    获取（必要时创建并启动）后台转码任务，并把上次未完成的转码加入队列。
+    """
+    global deferred_transcoder
+    if deferred_transcoder is None:
+        deferred_transcoder = DeferredTranscoder(
+            compress_level=ARCHIVE_COMPRESS_LEVEL,
+            is_busy=lambda: capture_pipeline is not None and capture_pipeline.is_busy(),
+            on_transcoded=_on_frame_transcoded,
+        )
+        deferred_transcoder.start()
+        deferred_transcoder.enqueue_existing(get_screenshot_base_dir(), maintenance_pool.start)
+    return deferred_transcoder
+
+def _on_frame_saved(frame):
+    # 将保存图标和播放音效的任务提交到线程池
+    if frame.post_process:
+        frame.trace.hold() # 图标和音效阶段完成后才提交耗时记录
+        worker = ScreenshotWorker(frame.process_name, frame.screenshot_dir, trace=frame.trace)
+        capture_pool.start(worker)
+    if frame.output_format.deferred:
+        get_deferred_transcoder().enqueue(frame.filename)
+
+def _on_frame_encoded(frame, image):
+    # 用内存中的帧生成缩略图，并把截图登记到截图库目录
+    store_capture_thumbnail(frame, image)
+    catalog = get_library_catalog()
+    if catalog is not None:
+        catalog.add_file(frame.filename, monitor=frame.monitor, size=image.size,
+                         image_format=frame.output_format.pil_format)
+
+def _on_frame_transcoded(old_path, new_path):
+    move_thumbnail(old_path, new_path)
+    catalog = get_library_catalog()
+    if catalog is not None:
+        catalog.move(old_path, new_path)
+
+def get_capture_pipeline():
+    """
+    获取（必要时创建并启动）全局截图流水线。
+    """
+    global capture_pipeline
+    if capture_pipeline is None:
+        capture_pipeline = CapturePipeline(
+            queue_size=CAPTURE_QUEUE_SIZE,
+            policy=CAPTURE_BACKPRESSURE,
+            workers=CAPTURE_ENCODE_WORKERS,
+            on_saved=_on_frame_saved,
+            on_encoded=_on_frame_encoded,
+            tracer=trace_recorder,
+        )
+        capture_pipeline.start()
+    return capture_pipeline
+
+def preload_capture_modules():
+    """
+    托盘就绪后在后台加载截图要用到的模块（Pillow、psutil、win32process）和截图音效，第一次截图不必等待。
+    """
+    started = time.perf_counter()
+    Image.load()
+    psutil.load()
+    win32process.load()
+    if SOUND_ENABLED:
+        get_sound_player().start()
+    app_log.debug("后台预加载模块耗时 %.0fms", (time.perf_counter() - started) * 1000)
+
+def get_screenshot_base_dir():
+    """
+    返回当前生效的截图根目录（自定义目录优先）。
+    """
+    if CUSTOM_SCREENSHOT_DIR and os.path.isdir(CUSTOM_SCREENSHOT_DIR):
+        return CUSTOM_SCREENSHOT_DIR
+    return BASE_SCREENSHOT_DIR
 
-            win32gui.DeleteObject(screenshot_bitmap.GetHandle())
-            mem_dc.DeleteDC()
-            img_dc.DeleteDC()
-            win32gui.ReleaseDC(hdesktop, desktop_dc)
-            print("使用Windows API成功截图。")
-        else:
-            print("未找到任何显示器信息，尝试使用ImageGrab进行全屏截图。")
-            img = ImageGrab.grab() # 回退到ImageGrab进行全屏截图
-            print("使用ImageGrab进行全屏截图。")
+def resolve_capture_target(trace=NULL_TRACE):
+    """
+    根据鼠标当前位置和前景窗口确定截图目标。trace 记录 cursor 和 process 阶段。
+    """
+    with trace.stage("cursor"):
+        current_mouse_x, current_mouse_y = win32api.GetCursorPos()
+    with trace.stage("process"):
+        process_name = get_foreground_process_name() # 获取最上层窗口的进程名称
 
-    except Exception as e:
-        print(f"Windows API截图失败: {e}，尝试使用ImageGrab进行全屏截图。")
-        try:
-            img = ImageGrab.grab() # 回退到ImageGrab进行全屏截图
-            print("使用ImageGrab进行全屏截图。")
-        except Exception as grab_e:
-            print(f"ImageGrab截图也失败: {grab_e}")
-            img = None
+    final_screenshot_base_dir = get_screenshot_base_dir()
+    screenshot_dir = os.path.join(final_screenshot_base_dir, process_name)
+    return CaptureTarget(current_mouse_x, current_mouse_y, process_name, screenshot_dir,
+                         get_output_format(process_name))
 
-    if img:
-        try:
-            img.save(filename)
-            print(f"截图已保存到: {filename}")
-            # 将保存图标和播放音效的任务提交到线程池
-            worker = ScreenshotWorker(process_name, screenshot_dir)
-            thread_pool.start(worker)
-        except Exception as save_e:
-            print(f"保存截图文件失败: {save_e}")
-    else:
-        print("未能成功截图。")
+def grab_screenshot_frame(hotkey_time=None, target=None, trace=None):
+    """
+    抓取阶段：根据鼠标当前位置确定目标屏幕和保存路径，只抓取原始像素。
+    如果Windows API截图失败，则尝试使用ImageGrab进行全屏截图。
+    返回 CaptureFrame，失败时返回 None。
+    """
+    if target is None:
+        target = resolve_capture_target(trace or NULL_TRACE)
+    return grab_target_frame(get_capture_context(), target, hotkey_time, trace=trace)
+
+# 当前正在进行的连拍
+current_burst = None
+
+def start_burst_capture(hotkey_time=None):
+    """
+    开始一次连拍。热键处理中只确定截图目标并启动连拍线程。
+    """
+    global current_burst
+    if current_burst is not None and current_burst.is_running():
+        capture_log.info("上一次连拍尚未结束，忽略本次按键。")
+        return False
+    target = resolve_capture_target()
+    pipeline = get_capture_pipeline()
+    dropped_before = pipeline.stats()["dropped"]
+
+    def grab_frame(index):
+        frame = grab_screenshot_frame(hotkey_time if index == 0 else None, target)
+        if frame is not None:
+            frame.post_process = index == 0 # 只为第一帧保存图标和播放音效
+        return frame
+
+    def on_finished(stats):
+        pipeline_dropped = pipeline.stats()["dropped"] - dropped_before
+        if pipeline_dropped:
+            capture_log.warning("连拍期间截图流水线丢弃了 %s 帧。", pipeline_dropped)
+
+    current_burst = BurstCapture(BURST_FRAME_COUNT, BURST_INTERVAL_MS, grab_frame, pipeline.submit, on_finished)
+    capture_log.info("开始连拍: %s 帧, 间隔 %sms", BURST_FRAME_COUNT, BURST_INTERVAL_MS)
+    return current_burst.start()
+
+def write_replay_frames(frames, screenshot_dir):
+    """
+    把回放帧写入截图目录，文件名使用各帧的抓取时间。JPEG 数据直接写盘，不需要重新编码。
+    """
+    os.makedirs(screenshot_dir, exist_ok=True)
+    catalog = get_library_catalog()
+    for frame in frames:
+        filename = make_screenshot_filename(screenshot_dir, ".jpg", frame.captured_at)
+        with open(filename, 'wb') as f:
+            f.write(frame.data)
+        if catalog is not None:
+            catalog.add_file(filename, size=frame.size, image_format="JPEG")
+    replay_log.info("已保存 %s 帧即时回放到: %s", len(frames), screenshot_dir)
+
+# 即时回放缓冲，开启后创建
+replay_buffer = None
+
+def set_replay_enabled(enabled):
+    """开启或关闭后台即时回放缓存。"""
+    global replay_buffer
+    if enabled:
+        if replay_buffer is None:
+            replay_buffer = ReplayBuffer(
+                get_capture_context(), win32api.GetCursorPos,
+                fps=REPLAY_FPS, seconds=REPLAY_SECONDS, memory_mb=REPLAY_MEMORY_MB,
+                scale=REPLAY_SCALE, jpeg_quality=REPLAY_JPEG_QUALITY,
+            )
+        replay_buffer.start()
+    elif replay_buffer is not None:
+        replay_buffer.stop()
+        replay_buffer = None
+        replay_log.info("即时回放已关闭。")
+
+def discard_frame(frame, reason="截图流水线未运行"):
+    """截图流水线没有接收的帧：缓冲区归还到池中，耗时记录标记错误后提交。"""
+    frame.release()
+    frame.trace.set(error=reason)
+    trace_recorder.finish(frame.trace)
+
+def save_instant_replay(hotkey_time=None):
+    """
+    保存即时回放：缓冲中的帧加上当前这一帧，写入与普通截图相同的进程文件夹。
+    当前帧走普通截图流程，缓冲帧在后台线程中写盘。
+    """
+    if replay_buffer is None or not replay_buffer.is_running():
+        replay_log.info("即时回放未开启，按普通截图处理。")
+        return take_screenshot_windows_api(hotkey_time)
+    frames = replay_buffer.snapshot()
+    target = resolve_capture_target()
+    frame = grab_screenshot_frame(hotkey_time, target)
+    if frame is not None and not get_capture_pipeline().submit(frame):
+        replay_log.warning("截图流水线未运行，当前帧被丢弃。")
+        discard_frame(frame)
+    maintenance_pool.start(lambda: write_replay_frames(frames, target.screenshot_dir))
+    return True
+
+def take_screenshot_windows_api(hotkey_time=None):
+    """
+    使用Windows API截图并保存到本地文件：按 CAPTURE_MODE 截取鼠标所在屏幕，
+    或同时截取所有屏幕（拼成一张或每个屏幕一张）。
+    本函数只完成像素抓取并把帧交给截图流水线，编码、写盘以及
+    截图后处理（保存图标和播放音效）都在后台线程中异步执行。
+    """
+    trace = CaptureTrace(hotkey_time)
+    target = resolve_capture_target(trace)
+    frames = grab_target_frames(get_capture_context(), target, CAPTURE_MODE, hotkey_time, trace=trace)
+    if not frames:
+        capture_log.error("未能成功截图。")
+        trace.set(error="抓取失败")
+        trace_recorder.finish(trace)
+        return False
+    pipeline = get_capture_pipeline()
+    if len(frames) > 1:
+        pipeline.ensure_workers(len(frames)) # 各屏幕的截图并行编码
+    pending = list(frames)
+    try:
+        while pending:
+            if not pipeline.submit(pending[0]):
+                capture_log.warning("截图流水线未运行，截图被丢弃。")
+                return False
+            pending.pop(0)
+    finally:
+        for frame in pending: # 未提交的帧归还缓冲区
+            discard_frame(frame)
+    return True
+
+# 可用作截图按键的功能键；单个字母或数字按其大写字符作为虚拟键码
+FUNCTION_KEY_VK_CODES = {f"f{i}": win32con.VK_F1 + i - 1 for i in range(1, 13)}
+
+def normalize_key_name(key_name):
+    """把按键名（如 'F10'、'a'）规范化为保存用的写法，无法作为截图按键时返回 None。"""
+    key_name = key_name.strip()
+    if key_name.lower() in FUNCTION_KEY_VK_CODES:
+        return key_name.lower()
+    if len(key_name) == 1:
+        return key_name
+    return None
+
+def key_to_vk(key_name):
+    """把按键名转换为Windows虚拟键码，不支持的按键返回 None。"""
+    key_name = normalize_key_name(key_name)
+    if key_name is None:
+        return None
+    if key_name in FUNCTION_KEY_VK_CODES:
+        return FUNCTION_KEY_VK_CODES[key_name]
+    return ord(key_name.upper()) # 对于普通字符，转换为大写字母的ASCII值
 
 def load_config():
     """
     从配置文件加载设置。
     """
     global KEYBINDING, CUSTOM_SCREENSHOT_DIR
+    global CAPTURE_QUEUE_SIZE, CAPTURE_BACKPRESSURE, CAPTURE_ENCODE_WORKERS, CAPTURE_MODE
+    global OUTPUT_FORMAT, PNG_COMPRESS_LEVEL, ARCHIVE_COMPRESS_LEVEL, FOLDER_OUTPUT_FORMATS
+    global BURST_FRAME_COUNT, BURST_INTERVAL_MS, BURST_MODIFIER
+    global REPLAY_ENABLED, REPLAY_FPS, REPLAY_SECONDS, REPLAY_MEMORY_MB, REPLAY_SCALE, REPLAY_JPEG_QUALITY, REPLAY_MODIFIER
+    global THUMBNAIL_CACHE_MB, FULLSCREEN_CACHE_MB
+    global TRACE_BUFFER_SIZE, TRACE_JSONL_FILE
+    global LOG_LEVEL, LOG_FILE, LOG_CONSOLE, PRELOAD_MODULES
+    global SOUND_ENABLED, SOUND_FILE, SOUND_BACKEND, SOUND_MIN_INTERVAL_MS
+    global POOL_CAPTURE_THREADS, POOL_VIEWER_THREADS, POOL_MAINTENANCE_THREADS
     config = configparser.ConfigParser()
     if os.path.exists(CONFIG_FILE):
         config.read(CONFIG_FILE, encoding='utf-8')
+        # 日志设置最先生效，之后加载其他设置时的提示按新的级别输出
+        if 'Logging' in config:
+            level = config['Logging'].get('level', LOG_LEVEL).strip().lower()
+            if level in LOG_LEVELS:
+                LOG_LEVEL = level
+            else:
+                config_log.warning("未知的日志级别 '%s'，使用 %s。", level, LOG_LEVEL)
+            LOG_FILE = config['Logging'].get('file', LOG_FILE).strip()
+            try:
+                LOG_CONSOLE = config['Logging'].getboolean('console', LOG_CONSOLE)
+            except ValueError as e:
+                config_log.warning("加载日志设置失败: %s，使用默认值。", e)
+            configure_logging(LOG_LEVEL, LOG_FILE, LOG_CONSOLE, sys.stdout)
+        if 'Startup' in config:
+            try:
+                PRELOAD_MODULES = config['Startup'].getboolean('preload_modules', PRELOAD_MODULES)
+            except ValueError as e:
+                config_log.warning("加载启动设置失败: %s，使用默认值。", e)
+        if 'Sound' in config:
+            sound = config['Sound']
+            try:
+                SOUND_ENABLED = sound.getboolean('enabled', SOUND_ENABLED)
+                SOUND_MIN_INTERVAL_MS = max(0, sound.getint('min_interval_ms', SOUND_MIN_INTERVAL_MS))
+            except ValueError as e:
+                config_log.warning("加载截图音效设置失败: %s，使用默认值。", e)
+            SOUND_FILE = sound.get('file', SOUND_FILE).strip() or SOUND_FILE
+            backend = sound.get('backend', SOUND_BACKEND).strip().lower()
+            if not backend or backend in SOUND_BACKENDS:
+                SOUND_BACKEND = backend
+            else:
+                config_log.warning("未知的音效输出 '%s'，自动选择。", backend)
         if 'Settings' in config:
             if 'keybinding' in config['Settings']:
                 key_str = config['Settings']['keybinding']
-                try:
-                    # 尝试从字符串解析为pynput Key对象（如'f12' -> keyboard.Key.f12）
-                    if hasattr(keyboard.Key, key_str.lower()):
-                        KEYBINDING = getattr(keyboard.Key, key_str.lower())
-                    elif len(key_str) == 1: # 尝试解析单个字符
-                        KEYBINDING = keyboard.KeyCode.from_char(key_str)
-                    else:
-                        # 如果都不是，则尝试作为KeyCode处理，如果失败则保持默认
-                        # 这一步可能需要更健壮的解析，但目前先这样
-                        KEYBINDING = keyboard.KeyCode.from_char(key_str)
-                        print(f"警告: 无法完全识别的按键字符串 '{key_str}'，尝试作为KeyCode处理。")
-                except Exception as e:
-                    print(f"加载按键绑定失败: {e}，将使用默认按键F10。")
-                    KEYBINDING = keyboard.Key.f10 # 加载失败时恢复默认F10
+                key_name = normalize_key_name(key_str)
+                if key_name is not None:
+                    KEYBINDING = key_name
+                else:
+                    config_log.warning("无法识别的按键 '%s'，将使用默认按键F10。", key_str)
+                    KEYBINDING = "f10" # 加载失败时恢复默认F10
             if 'custom_screenshot_dir' in config['Settings']:
                 CUSTOM_SCREENSHOT_DIR = config['Settings']['custom_screenshot_dir']
-                print(f"加载自定义截图目录: {CUSTOM_SCREENSHOT_DIR}")
+                config_log.info("加载自定义截图目录: %s", CUSTOM_SCREENSHOT_DIR)
+        if 'Capture' in config:
+            capture = config['Capture']
+            try:
+                CAPTURE_QUEUE_SIZE = max(1, capture.getint('queue_size', CAPTURE_QUEUE_SIZE))
+                CAPTURE_ENCODE_WORKERS = max(1, capture.getint('encode_workers', CAPTURE_ENCODE_WORKERS))
+            except ValueError as e:
+                config_log.warning("加载截图流水线设置失败: %s，使用默认值。", e)
+            policy = capture.get('backpressure', CAPTURE_BACKPRESSURE).strip().lower()
+            if policy in BACKPRESSURE_POLICIES:
+                CAPTURE_BACKPRESSURE = policy
+            else:
+                config_log.warning("未知的背压策略 '%s'，使用 %s。", policy, CAPTURE_BACKPRESSURE)
+            mode = capture.get('mode', CAPTURE_MODE).strip().lower()
+            if mode in CAPTURE_MODES:
+                CAPTURE_MODE = mode
+            else:
+                config_log.warning("未知的截图范围 '%s'，使用 %s。", mode, CAPTURE_MODE)
+        if 'Output' in config:
+            output = config['Output']
+            fmt = output.get('format', OUTPUT_FORMAT).strip().lower()
+            if fmt in OUTPUT_FORMAT_NAMES:
+                OUTPUT_FORMAT = fmt
+            else:
+                config_log.warning("未知的截图格式 '%s'，使用 %s。", fmt, OUTPUT_FORMAT)
+            try:
+                PNG_COMPRESS_LEVEL = min(9, max(0, output.getint('png_compress_level', PNG_COMPRESS_LEVEL)))
+                ARCHIVE_COMPRESS_LEVEL = min(9, max(0, output.getint('archive_compress_level', ARCHIVE_COMPRESS_LEVEL)))
+            except ValueError as e:
+                config_log.warning("加载PNG压缩级别失败: %s，使用默认值。", e)
+        if 'Burst' in config:
+            burst = config['Burst']
+            try:
+                BURST_FRAME_COUNT = max(1, burst.getint('frame_count', BURST_FRAME_COUNT))
+                BURST_INTERVAL_MS = max(0, burst.getint('interval_ms', BURST_INTERVAL_MS))
+            except ValueError as e:
+                config_log.warning("加载连拍设置失败: %s，使用默认值。", e)
+            modifier = burst.get('modifier', BURST_MODIFIER).strip().lower()
+            if modifier in HOTKEY_MODIFIER_NAMES:
+                BURST_MODIFIER = modifier
+            else:
+                config_log.warning("未知的连拍修饰键 '%s'，使用 %s。", modifier, BURST_MODIFIER)
+        if 'Replay' in config:
+            replay = config['Replay']
+            try:
+                REPLAY_ENABLED = replay.getboolean('enabled', REPLAY_ENABLED)
+                REPLAY_FPS = max(0.1, replay.getfloat('fps', REPLAY_FPS))
+                REPLAY_SECONDS = max(1, replay.getint('seconds', REPLAY_SECONDS))
+                REPLAY_MEMORY_MB = max(8, replay.getint('memory_mb', REPLAY_MEMORY_MB))
+                REPLAY_SCALE = max(1, replay.getint('scale', REPLAY_SCALE))
+                REPLAY_JPEG_QUALITY = min(95, max(10, replay.getint('jpeg_quality', REPLAY_JPEG_QUALITY)))
+            except ValueError as e:
+                config_log.warning("加载即时回放设置失败: %s，使用默认值。", e)
+            modifier = replay.get('modifier', REPLAY_MODIFIER).strip().lower()
+            if modifier in HOTKEY_MODIFIER_NAMES:
+                REPLAY_MODIFIER = modifier
+            else:
+                config_log.warning("未知的回放修饰键 '%s'，使用 %s。", modifier, REPLAY_MODIFIER)
+        if 'Viewer' in config:
+            try:
+                THUMBNAIL_CACHE_MB = max(8, config['Viewer'].getint('thumbnail_cache_mb', THUMBNAIL_CACHE_MB))
+                FULLSCREEN_CACHE_MB = max(32, config['Viewer'].getint('fullscreen_cache_mb', FULLSCREEN_CACHE_MB))
+            except ValueError as e:
+                config_log.warning("加载查看窗口设置失败: %s，使用默认值。", e)
+        if 'Trace' in config:
+            try:
+                TRACE_BUFFER_SIZE = max(10, config['Trace'].getint('buffer_size', TRACE_BUFFER_SIZE))
+            except ValueError as e:
+                config_log.warning("加载截图耗时记录设置失败: %s，使用默认值。", e)
+            TRACE_JSONL_FILE = config['Trace'].get('jsonl_file', TRACE_JSONL_FILE).strip()
+            trace_recorder.configure(TRACE_BUFFER_SIZE, TRACE_JSONL_FILE)
+        if 'Pools' in config:
+            pools = config['Pools']
+            try:
+                POOL_CAPTURE_THREADS = max(1, pools.getint('capture_threads', POOL_CAPTURE_THREADS))
+                POOL_VIEWER_THREADS = max(1, pools.getint('viewer_threads', POOL_VIEWER_THREADS))
+                POOL_MAINTENANCE_THREADS = max(1, pools.getint('maintenance_threads', POOL_MAINTENANCE_THREADS))
+            except ValueError as e:
+                config_log.warning("加载线程池设置失败: %s，使用默认值。", e)
+            capture_pool.set_max_threads(POOL_CAPTURE_THREADS)
+            viewer_pool.set_max_threads(POOL_VIEWER_THREADS)
+            maintenance_pool.set_max_threads(POOL_MAINTENANCE_THREADS)
+        if 'FolderFormats' in config:
+            FOLDER_OUTPUT_FORMATS = {}
+            for folder_name, fmt in config['FolderFormats'].items():
+                fmt = fmt.strip().lower()
+                if fmt in OUTPUT_FORMAT_NAMES:
+                    FOLDER_OUTPUT_FORMATS[folder_name.lower()] = fmt
+                else:
+                    config_log.warning("文件夹 '%s' 的截图格式 '%s' 无法识别，已忽略。", folder_name, fmt)
 
 def save_config():
     """
@@ -306,716 +879,144 @@ def save_config():
     """
     global KEYBINDING, CUSTOM_SCREENSHOT_DIR
     config = configparser.ConfigParser()
+    # 先读取原有配置，保留手动编辑的其他节
+    if os.path.exists(CONFIG_FILE):
+        config.read(CONFIG_FILE, encoding='utf-8')
     config['Settings'] = {}
-    # 将pynput的Key对象转换为字符串保存
-    config['Settings']['keybinding'] = str(KEYBINDING).replace('Key.', '').replace("'", "")
+    config['Settings']['keybinding'] = KEYBINDING
     config['Settings']['custom_screenshot_dir'] = CUSTOM_SCREENSHOT_DIR
+    config['Capture'] = {
+        'queue_size': str(CAPTURE_QUEUE_SIZE),
+        'backpressure': CAPTURE_BACKPRESSURE,
+        'encode_workers': str(CAPTURE_ENCODE_WORKERS),
+        'mode': CAPTURE_MODE,
+    }
+    config['Output'] = {
+        'format': OUTPUT_FORMAT,
+        'png_compress_level': str(PNG_COMPRESS_LEVEL),
+        'archive_compress_level': str(ARCHIVE_COMPRESS_LEVEL),
+    }
+    config['Burst'] = {
+        'frame_count': str(BURST_FRAME_COUNT),
+        'interval_ms': str(BURST_INTERVAL_MS),
+        'modifier': BURST_MODIFIER,
+    }
+    config['Replay'] = {
+        'enabled': str(REPLAY_ENABLED).lower(),
+        'fps': str(REPLAY_FPS),
+        'seconds': str(REPLAY_SECONDS),
+        'memory_mb': str(REPLAY_MEMORY_MB),
+        'scale': str(REPLAY_SCALE),
+        'jpeg_quality': str(REPLAY_JPEG_QUALITY),
+        'modifier': REPLAY_MODIFIER,
+    }
+    config['Viewer'] = {
+        'thumbnail_cache_mb': str(THUMBNAIL_CACHE_MB),
+        'fullscreen_cache_mb': str(FULLSCREEN_CACHE_MB),
+    }
+    config['Trace'] = {
+        'buffer_size': str(TRACE_BUFFER_SIZE),
+        'jsonl_file': TRACE_JSONL_FILE,
+    }
+    config['Sound'] = {
+        'enabled': str(SOUND_ENABLED).lower(),
+        'file': SOUND_FILE,
+        'backend': SOUND_BACKEND,
+        'min_interval_ms': str(SOUND_MIN_INTERVAL_MS),
+    }
+    config['Startup'] = {
+        'preload_modules': str(PRELOAD_MODULES).lower(),
+    }
+    config['Logging'] = {
+        'level': LOG_LEVEL,
+        'file': LOG_FILE,
+        'console': str(LOG_CONSOLE).lower(),
+    }
+    config['Pools'] = {
+        'capture_threads': str(POOL_CAPTURE_THREADS),
+        'viewer_threads': str(POOL_VIEWER_THREADS),
+        'maintenance_threads': str(POOL_MAINTENANCE_THREADS),
+    }
     with open(CONFIG_FILE, 'w', encoding='utf-8') as configfile:
         config.write(configfile)
-    print("配置已保存。")
-
-class SettingsWindow(QMainWindow):
-    keybinding_changed = Signal(object) # 发送新的pynput Key对象
-    path_changed = Signal(str) # 发送新的路径
+    config_log.info("配置已保存。")
 
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("设置")
-        # 移除 setFixedSize 以允许窗口最大化和调整大小
-        self.setWindowFlags(Qt.Window) # 确保窗口显示在任务栏并可最小化
+# 缩略图缓存，按截图根目录创建
+_thumbnail_store = None
+_thumbnail_store_lock = threading.Lock()
 
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        self.layout = QVBoxLayout(self.central_widget)
-        self.layout.setContentsMargins(20, 20, 20, 20) # 增加边距
-        self.layout.setSpacing(20) # 增加间距
-
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #f0f2f5; /* 浅灰色背景 */
-            }
-            QFrame {
-                background-color: #ffffff; /* 白色背景 */
-                border: 1px solid #e0e0e0; /* 浅边框 */
-                border-radius: 8px; /* 圆角 */
-                padding: 15px; /* 内部填充 */
-            }
-            QLabel {
-                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
-                font-size: 14px;
-                color: #333333; /* 深灰色字体 */
-            }
-            QLabel#current_key_label, QLabel#current_path_label {
-                font-weight: bold;
-                color: #007bff; /* 蓝色强调色 */
-            }
-            QLineEdit {
-                border: 1px solid #cccccc; /* 浅灰色边框 */
-                border-radius: 5px; /* 圆角 */
-                padding: 8px; /* 内部填充 */
-                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
-                font-size: 13px;
-                color: #555555;
-                background-color: #fdfdfd;
-            }
-            QLineEdit:focus {
-                border: 1px solid #007bff; /* 聚焦时边框变为蓝色 */
-            }
-            QLineEdit:read-only {
-                background-color: #f5f5f5; /* 只读状态的背景色 */
-            }
-            QPushButton {
-                background-color: #007bff; /* 蓝色背景 */
-                color: white; /* 白色字体 */
-                border: none;
-                border-radius: 5px; /* 圆角 */
-                padding: 8px 15px; /* 内部填充 */
-                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
-                font-size: 13px;
-                font-weight: 500;
-            }
-            QPushButton:hover {
-                background-color: #0056b3; /* 悬停时的深蓝色 */
-            }
-            QPushButton:pressed {
-                background-color: #004085; /* 按下时的更深蓝色 */
-            }
-            QPushButton#clear_button { /* 为清除按钮设置不同样式 */
-                background-color: #dc3545; /* 红色 */
-            }
-            QPushButton#clear_button:hover {
-                background-color: #c82333;
-            }
-            QPushButton#clear_button:pressed {
-                background-color: #bd2130;
-            }
-        """)
-
-        self.init_ui()
-
-    def init_ui(self):
-        # 截图按键设置
-        key_frame = QFrame()
-        key_frame.setObjectName("key_frame") # 添加对象名以便QSS选择器使用
-        key_layout = QVBoxLayout(key_frame)
-        key_layout.setContentsMargins(15, 15, 15, 15) # 调整内部边距
-        key_layout.setSpacing(10) # 调整内部间距
-
-        key_label_layout = QHBoxLayout()
-        self.current_key_label = QLabel(f"当前截图按键: {str(KEYBINDING).replace('Key.', '').replace("'", "")}")
-        self.current_key_label.setObjectName("current_key_label") # 添加对象名
-        key_label_layout.addWidget(self.current_key_label)
-        key_label_layout.addStretch()
-        key_layout.addLayout(key_label_layout)
-
-        key_input_layout = QHBoxLayout()
-        self.key_entry = QLineEdit()
-        self.key_entry.setPlaceholderText("按下任意键...")
-        self.key_entry.setReadOnly(True) # 初始设置为只读
-        self.key_entry.setText(str(KEYBINDING).replace("Key.", "").replace("'", ""))
-        key_input_layout.addWidget(self.key_entry)
-
-        self.listen_button = QPushButton("点击设置新按键")
-        self.listen_button.clicked.connect(self.start_listening_for_entry)
-        key_input_layout.addWidget(self.listen_button)
-
-        self.save_key_button = QPushButton("保存按键")
-        self.save_key_button.clicked.connect(self.save_keybinding_only)
-        key_input_layout.addWidget(self.save_key_button)
-        key_layout.addLayout(key_input_layout)
-        
-        self.layout.addWidget(key_frame)
-
-        # 截图保存路径设置
-        path_frame = QFrame()
-        path_frame.setObjectName("path_frame") # 添加对象名
-        path_layout = QVBoxLayout(path_frame)
-        path_layout.setContentsMargins(15, 15, 15, 15) # 调整内部边距
-        path_layout.setSpacing(10) # 调整内部间距
-
-        path_label_layout = QHBoxLayout()
-        self.current_path_label = QLabel(f"当前自定义路径: {CUSTOM_SCREENSHOT_DIR if CUSTOM_SCREENSHOT_DIR else '未设置 (使用默认)'}")
-        self.current_path_label.setObjectName("current_path_label") # 添加对象名
-        path_label_layout.addWidget(self.current_path_label)
-        path_label_layout.addStretch()
-        path_layout.addLayout(path_label_layout)
-
-        path_input_layout = QHBoxLayout()
-        self.path_entry = QLineEdit()
-        self.path_entry.setReadOnly(True) # 初始设置为只读
-        self.path_entry.setText(CUSTOM_SCREENSHOT_DIR if CUSTOM_SCREENSHOT_DIR else os.path.abspath(BASE_SCREENSHOT_DIR))
-        path_input_layout.addWidget(self.path_entry)
-
-        browse_button = QPushButton("浏览...")
-        browse_button.clicked.connect(self.browse_directory)
-        path_input_layout.addWidget(browse_button)
-        path_layout.addLayout(path_input_layout)
-
-        path_buttons_layout = QHBoxLayout()
-        clear_button = QPushButton("清除自定义路径")
-        clear_button.setObjectName("clear_button") # 添加对象名
-        clear_button.clicked.connect(self.clear_custom_path)
-        path_buttons_layout.addWidget(clear_button)
-
-        save_path_button = QPushButton("保存路径")
-        save_path_button.clicked.connect(self.save_path_only)
-        path_buttons_layout.addWidget(save_path_button)
-        path_layout.addLayout(path_buttons_layout)
-
-        self.layout.addWidget(path_frame)
-        self.layout.addStretch() # 填充剩余空间
-
-        self.key_listener_for_entry = None
-
-    def start_listening_for_entry(self):
-        self.key_entry.setText("按下任意键...")
-        self.key_entry.setReadOnly(False) # 允许输入
-        self.key_entry.setFocus() # 聚焦输入框
-
-        if self.key_listener_for_entry and self.key_listener_for_entry.running:
-            self.key_listener_for_entry.stop()
-
-        def on_key_press_for_entry(key):
-            try:
-                key_name = str(key).replace("Key.", "").replace("'", "")
-                self.key_entry.setText(key_name)
-                if self.key_listener_for_entry:
-                    self.key_listener_for_entry.stop()
-                self.key_entry.setReadOnly(True) # 恢复只读
-            except AttributeError:
-                key_name = str(key).replace("Key.", "").replace("'", "")
-                self.key_entry.setText(key_name)
-                if self.key_listener_for_entry:
-                    self.key_listener_for_entry.stop()
-                self.key_entry.setReadOnly(True) # 恢复只读
-
-        self.key_listener_for_entry = keyboard.Listener(on_press=on_key_press_for_entry)
-        self.key_listener_for_entry.start()
-
-    def save_keybinding_only(self):
-        global KEYBINDING
-        new_key_str = self.key_entry.text().strip()
-        if new_key_str:
-            try:
-                if hasattr(keyboard.Key, new_key_str):
-                    KEYBINDING = getattr(keyboard.Key, new_key_str)
-                elif len(new_key_str) == 1:
-                    KEYBINDING = keyboard.KeyCode.from_char(new_key_str)
-                else:
-                    QMessageBox.critical(self, "错误", f"无法识别的按键: {new_key_str}")
-                    print(f"无法识别的按键: {new_key_str}")
-                    return
-                self.current_key_label.setText(f"当前截图按键: {str(KEYBINDING).replace('Key.', '').replace("'", "")}")
-                print(f"截图按键已更新为: {KEYBINDING}")
-                save_config()
-                self.keybinding_changed.emit(KEYBINDING) # 发送信号通知主窗口
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"保存按键失败: {e}")
-                print(f"保存按键失败: {e}")
-        else:
-            QMessageBox.warning(self.parent(), "警告", "按键绑定不能为空。") # 修正：使用self.parent()
-            
-    def browse_directory(self):
-        folder_selected = QFileDialog.getExistingDirectory(self, "选择截图保存目录", self.path_entry.text())
-        if folder_selected:
-            self.path_entry.setText(folder_selected)
-
-    def clear_custom_path(self):
-        self.path_entry.setText(os.path.abspath(BASE_SCREENSHOT_DIR))
-        self.current_path_label.setText("当前自定义路径: 未设置 (使用默认)")
-        global CUSTOM_SCREENSHOT_DIR
-        CUSTOM_SCREENSHOT_DIR = ""
-        save_config()
-        print("自定义截图目录已清除，将使用默认路径。")
-        self.path_changed.emit(CUSTOM_SCREENSHOT_DIR) # 发送信号通知主窗口
-
-    def save_path_only(self):
-        global CUSTOM_SCREENSHOT_DIR
-        new_custom_path = self.path_entry.text().strip()
-        if new_custom_path:
-            if os.path.isdir(new_custom_path):
-                CUSTOM_SCREENSHOT_DIR = new_custom_path
-                self.current_path_label.setText(f"当前自定义路径: {CUSTOM_SCREENSHOT_DIR}")
-                print(f"自定义截图目录已更新为: {CUSTOM_SCREENSHOT_DIR}")
-                save_config()
-                self.path_changed.emit(CUSTOM_SCREENSHOT_DIR) # 发送信号通知主窗口
-            else:
-                QMessageBox.critical(self, "错误", f"无效的路径: {new_custom_path}\n请选择一个有效的文件夹。")
-                print(f"无效的自定义路径: {new_custom_path}，将不保存此路径。")
-                self.path_entry.setText(CUSTOM_SCREENSHOT_DIR if CUSTOM_SCREENSHOT_DIR else os.path.abspath(BASE_SCREENSHOT_DIR))
-        else:
-            CUSTOM_SCREENSHOT_DIR = ""
-            self.current_path_label.setText("当前自定义路径: 未设置 (使用默认)")
-            print("自定义截图目录已清除，将使用默认路径。")
-            save_config()
-            self.path_changed.emit(CUSTOM_SCREENSHOT_DIR) # 发送信号通知主窗口
-
-    def closeEvent(self, event):
-        if self.key_listener_for_entry and self.key_listener_for_entry.running:
-            self.key_listener_for_entry.stop()
-        event.accept()
-
-from PySide6.QtWidgets import QStackedWidget # 导入QStackedWidget
-from PySide6.QtCore import QObject # 导入QObject
-
-class IconLoader(QObject, QRunnable): # 继承QObject和QRunnable
+def get_thumbnail_store():
     """
-    用于在后台线程中加载进程图标的QRunnable。
+    获取当前截图根目录对应的缩略图缓存；根目录变化时重新打开。无法创建时返回 None。
     """
-    icon_loaded = Signal(str, QIcon) # 信号：folder_name, QIcon
-
-    def __init__(self, folder_name):
-        QObject.__init__(self) # 初始化QObject
-        QRunnable.__init__(self) # 初始化QRunnable
-        self.folder_name = folder_name
-        self.setAutoDelete(True) # 任务完成后自动删除
-
-    def run(self):
-        icon = get_process_icon(self.folder_name)
-        self.icon_loaded.emit(self.folder_name, icon)
+    global _thumbnail_store
+    db_path = os.path.join(get_screenshot_base_dir(), THUMBNAIL_DB_NAME)
+    with _thumbnail_store_lock:
+        if _thumbnail_store is not None and _thumbnail_store.db_path == db_path:
+            return _thumbnail_store
+        if _thumbnail_store is not None:
+            _thumbnail_store.close()
+            _thumbnail_store = None
+        try:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            _thumbnail_store = ThumbnailStore(db_path, THUMBNAIL_CACHE_MB * 1024 * 1024)
+        except Exception as e:
+            viewer_log.warning("打开缩略图缓存失败: %s", e)
+        return _thumbnail_store
 
-class ImageThumbnailLoader(QObject, QRunnable): # 继承QObject和QRunnable
+def store_capture_thumbnail(frame, image):
     """
-    用于在后台线程中加载图片缩略图的QRunnable。
+    截图写盘后，直接用内存中的帧生成缩略图并写入缩略图缓存，
+    新截图出现在查看窗口时不需要再完整解码原图。在编码线程中调用，不影响热键延迟。
     """
-    thumbnail_loaded = Signal(str, QPixmap) # 信号：image_path, QPixmap
+    store = get_thumbnail_store()
+    if store is None:
+        return
+    stat = os.stat(frame.filename)
+    store.put(frame.filename, stat.st_mtime_ns, stat.st_size, THUMBNAIL_SIZE, encode_thumbnail(image))
+
+def move_thumbnail(old_path, new_path):
+    """转码完成后把缩略图缓存从旧文件转移到新文件。"""
+    store = get_thumbnail_store()
+    if store is None:
+        return
+    try:
+        stat = os.stat(new_path)
+        store.rename(old_path, new_path, stat.st_mtime_ns, stat.st_size)
+    except Exception as e:
+        viewer_log.warning("转移缩略图缓存失败: %s", e)
 
-    def __init__(self, image_path, size: QSize):
-        QObject.__init__(self) # 初始化QObject
-        QRunnable.__init__(self) # 初始化QRunnable
-        self.image_path = image_path
-        self.size = size
-        self.setAutoDelete(True) # 任务完成后自动删除
+# 截图库目录，按截图根目录创建
+_library_catalog = None
+_library_catalog_lock = threading.Lock()
+# 截图库变化的监听者: listener(kind, folder, filename)，可能在任意线程中被调用
+library_change_listeners = []
 
-    def run(self):
+def _notify_library_change(kind, folder, filename):
+    for listener in list(library_change_listeners):
         try:
-            pixmap = QPixmap(self.image_path)
-            if not pixmap.isNull():
-                pixmap = pixmap.scaled(self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.thumbnail_loaded.emit(self.image_path, pixmap)
-            else:
-                print(f"警告: 无法加载图片 {self.image_path} 进行缩略图生成。")
-                self.thumbnail_loaded.emit(self.image_path, QPixmap()) # 发送空Pixmap
+            listener(kind, folder, filename)
         except Exception as e:
-            print(f"生成图片 {self.image_path} 缩略图失败: {e}")
-            self.thumbnail_loaded.emit(self.image_path, QPixmap()) # 发送空Pixmap
-
-class ViewScreenshotsWindow(QMainWindow):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setWindowTitle("查看截图")
-        self.resize(800, 600) # 设置默认大小，但允许用户调整和最大化
-        self.setWindowFlags(Qt.Window)
+            viewer_log.warning("通知截图库变化失败: %s", e)
 
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        self.main_layout = QVBoxLayout(self.central_widget)
-        self.main_layout.setContentsMargins(20, 20, 20, 20)
-        self.main_layout.setSpacing(15)
-
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: #f0f2f5; /* 浅灰色背景 */
-            }
-            QFrame#itemFrame { /* 为项目容器定义样式 */
-                background-color: #ffffff; /* 白色背景 */
-                border: 1px solid #e0e0e0; /* 浅边框 */
-                border-radius: 8px; /* 圆角 */
-                padding: 10px; /* 内部填充 */
-            }
-            QFrame#itemFrame:hover { /* 鼠标悬停时背景变蓝 */
-                background-color: #e0f2ff; /* 浅蓝色 */
-                border: 1px solid #007bff; /* 蓝色边框 */
-            }
-            QLabel {
-                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
-                font-size: 14px;
-                color: #333333; /* 深灰色字体 */
-            }
-            QLabel#folder_name_label, QLabel#image_name_label {
-                font-weight: bold;
-                color: #007bff; /* 蓝色强调色 */
-            }
-            QPushButton {
-                background-color: #007bff; /* 蓝色背景 */
-                color: white; /* 白色字体 */
-                border: none;
-                border-radius: 5px; /* 圆角 */
-                padding: 8px 15px; /* 内部填充 */
-                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
-                font-size: 13px;
-                font-weight: 500;
-            }
-            QPushButton:hover {
-                background-color: #0056b3; /* 悬停时的深蓝色 */
-            }
-            QPushButton:pressed {
-                background-color: #004085; /* 按下时的更深蓝色 */
-            }
-            QScrollArea {
-                border: none; /* 移除滚动区域的边框 */
-            }
-            QGraphicsView {
-                border: none; /* 移除图片查看器的边框 */
-            }
-            /* 调整网格布局中项目的对齐方式 */
-            QGridLayout {
-                alignment: Qt.AlignLeft | Qt.AlignTop;
-            }
-        """)
-
-        self.stacked_widget = QStackedWidget(self)
-        self.main_layout.addWidget(self.stacked_widget)
-
-        # 文件夹视图
-        self.folders_view_widget = QWidget()
-        self.folders_view_layout = QVBoxLayout(self.folders_view_widget)
-        self.folders_view_layout.setContentsMargins(0, 0, 0, 0)
-        self.folders_view_layout.setSpacing(10)
-
-        self.folders_scroll_area = QScrollArea(self)
-        self.folders_scroll_area.setWidgetResizable(True)
-        self.folders_content = QWidget()
-        self.folders_scroll_area.setWidget(self.folders_content)
-        self.folders_grid_layout = QGridLayout(self.folders_content)
-        self.folders_grid_layout.setAlignment(Qt.AlignLeft | Qt.AlignTop) # 显式设置对齐方式
-        self.folders_grid_layout.setSpacing(10) # 新增：设置网格布局间距
-        self.folders_view_layout.addWidget(self.folders_scroll_area)
-        self.stacked_widget.addWidget(self.folders_view_widget)
-
-        # 图片视图
-        self.images_view_widget = QWidget()
-        self.images_view_layout = QVBoxLayout(self.images_view_widget)
-        self.images_view_layout.setContentsMargins(0, 0, 0, 0)
-        self.images_view_layout.setSpacing(10)
-
-        self.back_button_layout = QHBoxLayout()
-        self.back_button = QPushButton("返回文件夹列表")
-        self.back_button.clicked.connect(self.show_folders_view)
-        self.back_button_layout.addWidget(self.back_button)
-        self.back_button_layout.addStretch()
-        self.images_view_layout.addLayout(self.back_button_layout)
-
-        self.images_scroll_area = QScrollArea(self)
-        self.images_scroll_area.setWidgetResizable(True)
-        self.images_content = QWidget()
-        self.images_scroll_area.setWidget(self.images_content)
-        self.images_grid_layout = QGridLayout(self.images_content)
-        self.images_grid_layout.setAlignment(Qt.AlignLeft | Qt.AlignTop) # 显式设置对齐方式
-        self.images_grid_layout.setSpacing(10) # 新增：设置网格布局间距
-        self.images_view_layout.addWidget(self.images_scroll_area)
-        self.stacked_widget.addWidget(self.images_view_widget)
-
-        # 全屏图片视图
-        self.fullscreen_image_view_widget = QWidget()
-        self.fullscreen_image_view_layout = QVBoxLayout(self.fullscreen_image_view_widget)
-        self.fullscreen_image_view_layout.setContentsMargins(0, 0, 0, 0)
-        self.fullscreen_image_view_layout.setSpacing(10)
-
-        self.fullscreen_back_button_layout = QHBoxLayout()
-        self.fullscreen_back_button = QPushButton("返回图片列表")
-        self.fullscreen_back_button.clicked.connect(self.show_images_view_from_fullscreen)
-        self.fullscreen_back_button_layout.addWidget(self.fullscreen_back_button)
-        self.fullscreen_back_button_layout.addStretch()
-        self.fullscreen_image_view_layout.addLayout(self.fullscreen_back_button_layout)
-
-        self.fullscreen_graphics_scene = QGraphicsScene()
-        self.fullscreen_graphics_view = QGraphicsView(self.fullscreen_graphics_scene)
-        self.fullscreen_graphics_view.setRenderHint(QPainter.Antialiasing)
-        self.fullscreen_graphics_view.setRenderHint(QPainter.SmoothPixmapTransform)
-        # 移除QPainter.HighQualityAntialiasing，因为它在PySide6中不存在
-        self.fullscreen_graphics_view.setDragMode(QGraphicsView.ScrollHandDrag) # 允许拖动
-        self.fullscreen_graphics_view.setTransformationAnchor(QGraphicsView.AnchorUnderMouse) # 鼠标下缩放
-        self.fullscreen_graphics_view.setResizeAnchor(QGraphicsView.AnchorUnderMouse) # 鼠标下调整大小
-
-        self.fullscreen_image_view_layout.addWidget(self.fullscreen_graphics_view)
-        self.stacked_widget.addWidget(self.fullscreen_image_view_widget)
-
-        self.current_image_pixmap_item = None
-
-        # 新增：存储文件夹和图片数据
-        self.folder_items_data = []
-        self.image_items_data = []
-        self.current_folder_path = "" # 确保这个变量被初始化
-
-        # 存储 QLabel 引用，以便异步更新
-        self.icon_labels = {}
-        self.image_labels = {}
-
-        # 信号连接现在在每次创建IconLoader和ImageThumbnailLoader实例时进行，
-        # 因此不再需要在这里创建临时的signal_proxy。
-
-        # 延迟重新布局的定时器
-        self.resize_timer = QTimer(self)
-        self.resize_timer.setSingleShot(True)
-        self.resize_timer.setInterval(200) # 200毫秒延迟
-        self.resize_timer.timeout.connect(self._deferred_repopulate_grid)
-
-        self.load_screenshot_folders() # 初始加载文件夹视图
-        self.show_folders_view() # 默认显示文件夹视图
-
-    def _update_folder_icon(self, folder_name, icon):
-        """槽函数：接收异步加载的图标并更新对应的QLabel。"""
-        if folder_name in self.icon_labels:
-            label = self.icon_labels[folder_name]
-            if not icon.isNull():
-                label.setPixmap(icon.pixmap(QSize(64, 64)))
-            else:
-                # 如果图标加载失败，可以显示一个默认的占位符
-                label.setText("?")
-                label.setStyleSheet("font-size: 30px; color: gray;")
-            print(f"UI更新: 文件夹 '{folder_name}' 的图标已更新。")
-
-    def _update_image_thumbnail(self, image_path, pixmap):
-        """槽函数：接收异步加载的缩略图并更新对应的QLabel。"""
-        if image_path in self.image_labels:
-            label = self.image_labels[image_path]
-            if not pixmap.isNull():
-                label.setPixmap(pixmap)
-            else:
-                # 如果缩略图加载失败，可以显示一个默认的占位符
-                label.setText("无法加载")
-                label.setStyleSheet("font-size: 12px; color: gray;")
-            print(f"UI更新: 图片 '{os.path.basename(image_path)}' 的缩略图已更新。")
-
-    def show_folders_view(self):
-        self.setWindowTitle("查看截图")
-        self.stacked_widget.setCurrentWidget(self.folders_view_widget)
-        # 只有在第一次显示或需要强制刷新时才加载文件夹，避免反复切换时的重复加载
-        if not self.folder_items_data: # 或者可以添加一个标志位 self._folders_loaded = False
-            self.load_screenshot_folders()
-        # 清空旧的引用，防止内存泄漏
-        self.icon_labels.clear()
-
-    def show_images_view_from_fullscreen(self):
-        # 从全屏图片视图返回到图片列表视图
-        self.setWindowTitle(f"查看截图 - {os.path.basename(self.current_folder_path)}")
-        self.stacked_widget.setCurrentWidget(self.images_view_widget)
-        # 不需要重新加载图片，因为current_folder_path已经设置，并且图片列表应该还在
-
-    # 新增：用于重新填充文件夹网格的方法
-    def _repopulate_folders_grid(self):
-        # 清除现有内容
-        while self.folders_grid_layout.count():
-            item = self.folders_grid_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-
-        if not self.folder_items_data:
-            return
-
-        # 计算每行可以容纳的列数
-        item_width = 120 # 估算的项目宽度
-        scroll_area_width = self.folders_scroll_area.viewport().width()
-        if scroll_area_width <= 0:
-            cols = 1
-        else:
-            cols = max(1, scroll_area_width // item_width)
-
-        row = 0
-        col = 0
-        for folder_name, folder_path in self.folder_items_data:
-            item_layout = QVBoxLayout()
-            item_layout.setAlignment(Qt.AlignCenter)
-            item_layout.setSpacing(5)
-
-            icon_label = QLabel("加载中...") # 占位符
-            icon_label.setFixedSize(64, 64)
-            icon_label.setAlignment(Qt.AlignCenter)
-            icon_label.setStyleSheet("font-size: 10px; color: gray;") # 占位符样式
-            item_layout.addWidget(icon_label)
-            self.icon_labels[folder_name] = icon_label # 存储引用
-
-            # 提交图标加载任务到线程池
-            loader = IconLoader(folder_name)
-            # 必须在IconLoader实例上连接信号，而不是在类上
-            loader.icon_loaded.connect(self._update_folder_icon)
-            thread_pool.start(loader)
-
-            name_label = QLabel(folder_name)
-            name_label.setObjectName("folder_name_label")
-            name_label.setAlignment(Qt.AlignCenter)
-            item_layout.addWidget(name_label)
-
-            container_widget = QFrame()
-            container_widget.setObjectName("itemFrame")
-            container_widget.setLayout(item_layout)
-            container_widget.setCursor(Qt.PointingHandCursor)
-            container_widget.mousePressEvent = lambda event, path=folder_path: self.show_images_view(path)
-
-            container_widget.setFixedSize(120, 120) # 设置固定大小，确保形状规则
-
-            self.folders_grid_layout.addWidget(container_widget, row, col)
-            
-            col += 1
-            if col >= cols:
-                col = 0
-                row += 1
-        
-        self.folders_grid_layout.setRowStretch(row, 1)
-        self.folders_grid_layout.setColumnStretch(self.folders_grid_layout.columnCount(), 1)
-
-    # 新增：用于重新填充图片网格的方法
-    def _repopulate_images_grid(self):
-        # 清除现有内容
-        while self.images_grid_layout.count():
-            item = self.images_grid_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-
-        if not self.image_items_data:
-            return
-
-        # 计算每行可以容纳的列数
-        item_width = 220
-        scroll_area_width = self.images_scroll_area.viewport().width()
-        if scroll_area_width <= 0:
-            cols = 1
-        else:
-            cols = max(1, scroll_area_width // item_width)
-
-        row = 0
-        col = 0
-        for image_name, image_path in self.image_items_data:
-            item_layout = QVBoxLayout()
-            item_layout.setAlignment(Qt.AlignCenter)
-            item_layout.setSpacing(5)
-
-            image_label = QLabel("加载中...") # 占位符
-            image_label.setFixedSize(200, 150)
-            image_label.setAlignment(Qt.AlignCenter)
-            image_label.setStyleSheet("font-size: 10px; color: gray;") # 占位符样式
-            item_layout.addWidget(image_label)
-            self.image_labels[image_path] = image_label # 存储引用
-
-            # 提交缩略图加载任务到线程池
-            loader = ImageThumbnailLoader(image_path, image_label.size())
-            # 必须在ImageThumbnailLoader实例上连接信号，而不是在类上
-            loader.thumbnail_loaded.connect(self._update_image_thumbnail)
-            thread_pool.start(loader)
-
-            name_label = QLabel(image_name)
-            name_label.setObjectName("image_name_label")
-            name_label.setAlignment(Qt.AlignCenter)
-            name_label.setWordWrap(True)
-            item_layout.addWidget(name_label)
-
-            container_widget = QFrame()
-            container_widget.setObjectName("itemFrame")
-            container_widget.setLayout(item_layout)
-            container_widget.setCursor(Qt.PointingHandCursor)
-            container_widget.mousePressEvent = lambda event, path=image_path: self.open_image_fullscreen(path)
-
-            container_widget.setMinimumSize(200, 180)
-            container_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-
-            self.images_grid_layout.addWidget(container_widget, row, col)
-            
-            col += 1
-            if col >= cols:
-                col = 0
-                row += 1
-        
-        self.images_grid_layout.setRowStretch(row, 1)
-        self.images_grid_layout.setColumnStretch(self.images_grid_layout.columnCount(), 1)
-
-    def _deferred_repopulate_grid(self):
-        """
-        延迟执行的网格重新填充方法，由定时器触发。
-        """
-        if self.stacked_widget.currentWidget() == self.folders_view_widget:
-            self._repopulate_folders_grid()
-        elif self.stacked_widget.currentWidget() == self.images_view_widget:
-            self._repopulate_images_grid()
-
-    def _on_folders_scroll_area_resized(self):
-        """当文件夹滚动区域大小改变时重新填充网格。"""
-        # 不再直接调用，而是通过定时器触发
-        self.resize_timer.start()
-
-    def _on_images_scroll_area_resized(self):
-        """当图片滚动区域大小改变时重新填充网格。"""
-        # 不再直接调用，而是通过定时器触发
-        self.resize_timer.start()
-
-    def load_screenshot_folders(self):
-        # 清除现有数据
-        self.folder_items_data = []
-
-        screenshot_base_dir = BASE_SCREENSHOT_DIR
-        if CUSTOM_SCREENSHOT_DIR and os.path.isdir(CUSTOM_SCREENSHOT_DIR):
-            screenshot_base_dir = CUSTOM_SCREENSHOT_DIR
-
-        print(f"DEBUG: 截图根目录: {screenshot_base_dir}")
-        folders = [f for f in os.listdir(screenshot_base_dir) if os.path.isdir(os.path.join(screenshot_base_dir, f))]
-        print(f"DEBUG: 识别到的截图文件夹: {folders}")
-        
-        for folder_name in sorted(folders):
-            folder_path = os.path.join(screenshot_base_dir, folder_name)
-            self.folder_items_data.append((folder_name, folder_path))
-        
-        self._repopulate_folders_grid() # 初始加载时立即填充网格
-
-    def show_images_view(self, folder_path):
-        self.current_folder_path = folder_path
-        self.setWindowTitle(f"查看截图 - {os.path.basename(folder_path)}")
-        self.stacked_widget.setCurrentWidget(self.images_view_widget)
-        self.load_images_for_folder(folder_path)
-
-    def load_images_for_folder(self, folder_path):
-        # 清除现有数据
-        self.image_items_data = []
-
-        print(f"DEBUG: 当前图片文件夹路径: {folder_path}")
-        image_files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')) and f.lower() != 'icon.png']
-        print(f"DEBUG: 识别到的图片文件: {image_files}")
-        
-        for image_name in sorted(image_files):
-            image_path = os.path.join(folder_path, image_name)
-            self.image_items_data.append((image_name, image_path))
-        
-        self._repopulate_images_grid() # 初始加载时立即填充网格
-
-    def open_image_fullscreen(self, image_path):
-        # 清除旧的图片
-        self.fullscreen_graphics_scene.clear()
-        self.current_image_pixmap_item = None
-
-        pixmap = QPixmap(image_path)
-        if not pixmap.isNull():
-            self.current_image_pixmap_item = self.fullscreen_graphics_scene.addPixmap(pixmap)
-            # 明确设置QGraphicsPixmapItem的变换模式为平滑
-            self.current_image_pixmap_item.setTransformationMode(Qt.SmoothTransformation)
-            self.fullscreen_graphics_view.fitInView(self.current_image_pixmap_item, Qt.KeepAspectRatio) # 适应视图大小
-            self.setWindowTitle(f"查看截图 - {os.path.basename(image_path)}")
-            self.stacked_widget.setCurrentWidget(self.fullscreen_image_view_widget)
-        else:
-            # 如果图片加载失败，显示错误信息并返回到图片列表
-            QMessageBox.warning(self, "加载图片失败", f"无法加载图片: {os.path.basename(image_path)}")
-            print(f"全屏显示图片 {image_path} 失败：无法加载。")
-            self.show_images_view(self.current_folder_path) # 返回到图片列表
-
-    def wheelEvent(self, event):
-        # 仅在全屏图片视图激活时处理滚轮事件
-        if self.stacked_widget.currentWidget() == self.fullscreen_image_view_widget:
-            zoom_factor = 1.15 # 每次缩放的因子
-            if event.angleDelta().y() > 0:
-                # 向上滚动，放大
-                self.fullscreen_graphics_view.scale(zoom_factor, zoom_factor)
-            else:
-                # 向下滚动，缩小
-                self.fullscreen_graphics_view.scale(1 / zoom_factor, 1 / zoom_factor)
-        else:
-            super().wheelEvent(event) # 如果不在全屏视图，将事件传递给父类
-
-    def resizeEvent(self, event):
-        """
-        当窗口大小改变时，启动或重置定时器，延迟重新布局网格。
-        """
-        super().resizeEvent(event)
-        self.resize_timer.start() # 启动或重置定时器
+def get_library_catalog():
+    """
+    获取当前截图根目录对应的截图库目录；根目录变化时重新打开。无法创建时返回 None。
+    """
+    global _library_catalog
+    db_path = os.path.join(get_screenshot_base_dir(), LIBRARY_DB_NAME)
+    with _library_catalog_lock:
+        if _library_catalog is not None and _library_catalog.db_path == db_path:
+            return _library_catalog
+        if _library_catalog is not None:
+            _library_catalog.close()
+            _library_catalog = None
+        try:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            _library_catalog = LibraryCatalog(db_path, on_change=_notify_library_change)
+        except Exception as e:
+            viewer_log.warning("打开截图库目录失败: %s", e)
+        return _library_catalog
 
 class F10CaptureApp(QMainWindow):
     def __init__(self):
@@ -1044,7 +1045,7 @@ class F10CaptureApp(QMainWindow):
             }
         """)
 
-        self.status_label = QLabel(f"F10截图工具 (热键: {str(KEYBINDING).replace('Key.', '').replace("'", "")}) 已启动，在后台运行。")
+        self.status_label = QLabel(f"F10截图工具 (热键: {KEYBINDING}) 已启动，在后台运行。")
         self.status_label.setAlignment(Qt.AlignCenter)
         self.layout.addWidget(self.status_label)
 
@@ -1052,9 +1053,20 @@ class F10CaptureApp(QMainWindow):
         self.settings_window = None
         self.view_screenshots_window = None # 新增：查看截图窗口实例
         self.HOTKEY_ID = 100 # 定义热键ID
+        self.BURST_HOTKEY_ID = 101 # 连拍热键ID
+        self.REPLAY_HOTKEY_ID = 102 # 即时回放热键ID
 
         self.init_tray_icon()
         self.register_hotkey() # 注册全局热键
+        app_log.info("启动到热键就绪耗时 %.0fms", (time.perf_counter() - STARTUP_STARTED) * 1000)
+        if PRELOAD_MODULES:
+            maintenance_pool.start(preload_capture_modules)
+        if OUTPUT_FORMAT == "raw" or "raw" in FOLDER_OUTPUT_FORMATS.values():
+            get_deferred_transcoder() # 继续上次未完成的转码
+        if REPLAY_ENABLED:
+            set_replay_enabled(True)
+        # 后台补齐截图库目录，打开查看窗口时不需要再扫描
+        maintenance_pool.start(lambda: get_library_catalog() and get_library_catalog().reconcile())
         self.hide() # 启动时隐藏主窗口，只显示托盘图标
 
     def init_tray_icon(self):
@@ -1063,14 +1075,14 @@ class F10CaptureApp(QMainWindow):
         icon_path = "icon.png"
         if hasattr(sys, '_MEIPASS'):
             icon_path = os.path.join(sys._MEIPASS, icon_path)
-            print(f"从 _MEIPASS 加载图标: {icon_path}")
+            app_log.debug("从 _MEIPASS 加载图标: %s", icon_path)
         else:
-            print(f"从当前目录加载图标: {icon_path}")
+            app_log.debug("从当前目录加载图标: %s", icon_path)
 
         try:
             self.tray_icon.setIcon(QIcon(icon_path))
         except Exception as e:
-            print(f"无法加载图标 {icon_path}: {e}，使用默认图标。")
+            app_log.warning("无法加载图标 %s: %s，使用默认图标。", icon_path, e)
             pixmap = QIcon().fromTheme("applications-other") # 尝试使用系统主题图标
             if pixmap.isNull():
                 # 如果系统主题图标也找不到，则创建一个空白图标
@@ -1108,9 +1120,35 @@ class F10CaptureApp(QMainWindow):
         """)
 
         screenshot_action = QAction("截图", self)
-        screenshot_action.triggered.connect(take_screenshot_windows_api)
+        screenshot_action.triggered.connect(lambda: take_screenshot_windows_api())
         tray_menu.addAction(screenshot_action)
 
+        burst_action = QAction("连拍", self)
+        burst_action.triggered.connect(lambda: start_burst_capture())
+        tray_menu.addAction(burst_action)
+
+        capture_mode_menu = tray_menu.addMenu("截图范围")
+        self.capture_mode_group = QActionGroup(self)
+        for mode, label in (("cursor", "鼠标所在屏幕"), ("stitched", "所有屏幕（拼成一张）"), ("per_monitor", "所有屏幕（每个屏幕一张）")):
+            action = QAction(label, self)
+            action.setCheckable(True)
+            action.setChecked(mode == CAPTURE_MODE)
+            action.setData(mode)
+            self.capture_mode_group.addAction(action)
+            capture_mode_menu.addAction(action)
+        self.capture_mode_group.triggered.connect(self.set_capture_mode)
+
+        self.replay_action = QAction("即时回放", self)
+        self.replay_action.setCheckable(True)
+        self.replay_action.setChecked(REPLAY_ENABLED)
+        self.replay_action.toggled.connect(self.toggle_replay)
+        tray_menu.addAction(self.replay_action)
+
+        self.save_replay_action = QAction("保存即时回放", self)
+        self.save_replay_action.setEnabled(REPLAY_ENABLED)
+        self.save_replay_action.triggered.connect(lambda: save_instant_replay())
+        tray_menu.addAction(self.save_replay_action)
+
         settings_action = QAction("设置", self)
         settings_action.triggered.connect(self.open_settings_window)
         tray_menu.addAction(settings_action)
@@ -1119,6 +1157,10 @@ class F10CaptureApp(QMainWindow):
         view_screenshots_action.triggered.connect(self.open_view_screenshots_window)
         tray_menu.addAction(view_screenshots_action)
 
+        capture_stats_action = QAction("截图耗时统计", self)
+        capture_stats_action.triggered.connect(self.show_capture_stats)
+        tray_menu.addAction(capture_stats_action)
+
         # 添加一个分隔线
         tray_menu.addSeparator()
 
@@ -1129,33 +1171,11 @@ class F10CaptureApp(QMainWindow):
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.show()
 
-    def get_vk_code(self, key_obj):
+    def get_vk_code(self, key_name):
         """
-        将pynput Key对象或字符串转换为Windows虚拟键码。
+        将按键名转换为Windows虚拟键码。
         """
-        if isinstance(key_obj, keyboard.Key):
-            if key_obj == keyboard.Key.f1: return win32con.VK_F1
-            if key_obj == keyboard.Key.f2: return win32con.VK_F2
-            if key_obj == keyboard.Key.f3: return win32con.VK_F3
-            if key_obj == keyboard.Key.f4: return win32con.VK_F4
-            if key_obj == keyboard.Key.f5: return win32con.VK_F5
-            if key_obj == keyboard.Key.f6: return win32con.VK_F6
-            if key_obj == keyboard.Key.f7: return win32con.VK_F7
-            if key_obj == keyboard.Key.f8: return win32con.VK_F8
-            if key_obj == keyboard.Key.f9: return win32con.VK_F9
-            if key_obj == keyboard.Key.f10: return win32con.VK_F10
-            if key_obj == keyboard.Key.f11: return win32con.VK_F11
-            if key_obj == keyboard.Key.f12: return win32con.VK_F12
-            # 可以根据需要添加其他特殊键的映射
-        elif isinstance(key_obj, keyboard.KeyCode) and key_obj.char:
-            return ord(key_obj.char.upper()) # 对于普通字符，转换为大写字母的ASCII值
-        elif isinstance(key_obj, str):
-            if len(key_obj) == 1:
-                return ord(key_obj.upper())
-            elif key_obj.lower() == 'f10': # 兼容字符串'f10'
-                return win32con.VK_F10
-            # 可以添加其他字符串到VK_CODE的映射
-        return None
+        return key_to_vk(key_name)
 
     def register_hotkey(self):
         """
@@ -1164,13 +1184,15 @@ class F10CaptureApp(QMainWindow):
         # 注销旧热键（如果存在）
         try:
             win32gui.UnregisterHotKey(self.winId().__int__(), self.HOTKEY_ID)
-            print("旧热键已注销。")
+            hotkey_log.info("旧热键已注销。")
         except Exception as e:
             # 1419 是 ERROR_HOTKEY_NOT_REGISTERED，表示热键未注册，这是正常情况
             if e.args[0] == 1419:
-                print("信息: 热键未注册，无需注销。")
+                hotkey_log.info("热键未注册，无需注销。")
             else:
-                print(f"注销旧热键时发生未知错误: {e}")
+                hotkey_log.warning("注销旧热键时发生未知错误: %s", e)
+        self.unregister_modifier_hotkey(self.BURST_HOTKEY_ID)
+        self.unregister_modifier_hotkey(self.REPLAY_HOTKEY_ID)
 
         # 注册新热键
         try:
@@ -1178,13 +1200,48 @@ class F10CaptureApp(QMainWindow):
             if vk_code is not None:
                 # MOD_NOREPEAT 标志可以防止热键重复触发
                 win32gui.RegisterHotKey(self.winId().__int__(), self.HOTKEY_ID, win32con.MOD_NOREPEAT, vk_code)
-                print(f"全局热键 {str(KEYBINDING).replace('Key.', '').replace("'", "")} (VK_CODE: {vk_code}) 已注册。")
+                hotkey_log.info("全局热键 %s (VK_CODE: %s) 已注册。", KEYBINDING, vk_code)
+                self.register_modifier_hotkey(self.BURST_HOTKEY_ID, BURST_MODIFIER, vk_code, "连拍")
+                self.update_replay_hotkey()
             else:
-                QMessageBox.critical(self, "错误", f"无法注册热键: {str(KEYBINDING).replace('Key.', '').replace("'", "")}\n未找到对应的虚拟键码。")
-                print(f"无法注册热键: {KEYBINDING}，未找到对应的虚拟键码。")
+                QMessageBox.critical(self, "错误", f"无法注册热键: {KEYBINDING}\n未找到对应的虚拟键码。")
+                hotkey_log.error("无法注册热键: %s，未找到对应的虚拟键码。", KEYBINDING)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"注册全局热键失败: {e}\n请尝试以管理员身份运行程序。")
-            print(f"注册全局热键失败: {e}")
+            hotkey_log.error("注册全局热键失败: %s", e)
+
+    def register_modifier_hotkey(self, hotkey_id, modifier_name, vk_code, description):
+        """
+        注册“修饰键 + 截图按键”形式的附加热键。注册失败不影响普通截图热键。
+        """
+        modifiers = {
+            "shift": win32con.MOD_SHIFT,
+            "ctrl": win32con.MOD_CONTROL,
+            "alt": win32con.MOD_ALT,
+        }
+        if modifier_name not in modifiers:
+            return
+        try:
+            win32gui.RegisterHotKey(self.winId().__int__(), hotkey_id,
+                                    win32con.MOD_NOREPEAT | modifiers[modifier_name], vk_code)
+            hotkey_log.info("%s热键 %s+%s 已注册。", description, modifier_name, KEYBINDING)
+        except Exception as e:
+            hotkey_log.error("注册%s热键失败: %s", description, e)
+
+    def update_replay_hotkey(self):
+        """即时回放开启时才注册回放热键，关闭后立即把组合键还给其他程序。"""
+        self.unregister_modifier_hotkey(self.REPLAY_HOTKEY_ID)
+        if not REPLAY_ENABLED:
+            return
+        vk_code = self.get_vk_code(KEYBINDING)
+        if vk_code is not None:
+            self.register_modifier_hotkey(self.REPLAY_HOTKEY_ID, REPLAY_MODIFIER, vk_code, "即时回放")
+
+    def unregister_modifier_hotkey(self, hotkey_id):
+        try:
+            win32gui.UnregisterHotKey(self.winId().__int__(), hotkey_id)
+        except Exception:
+            pass # 未注册时忽略
 
     def unregister_hotkey(self):
         """
@@ -1192,9 +1249,11 @@ class F10CaptureApp(QMainWindow):
         """
         try:
             win32gui.UnregisterHotKey(self.winId().__int__(), self.HOTKEY_ID)
-            print("全局热键已注销。")
+            hotkey_log.info("全局热键已注销。")
         except Exception as e:
-            print(f"注销全局热键失败: {e}")
+            hotkey_log.warning("注销全局热键失败: %s", e)
+        self.unregister_modifier_hotkey(self.BURST_HOTKEY_ID)
+        self.unregister_modifier_hotkey(self.REPLAY_HOTKEY_ID)
 
     def nativeEvent(self, eventType, message):
         """
@@ -1206,16 +1265,60 @@ class F10CaptureApp(QMainWindow):
             msg_ptr = ctypes.cast(message.__int__(), ctypes.POINTER(MSG))
             msg = msg_ptr.contents # 获取 MSG 结构体的内容
 
+            if msg.message == win32con.WM_DISPLAYCHANGE:
+                # 显示器分辨率或布局变化，丢弃缓存的截图资源
+                if capture_context is not None:
+                    capture_context.invalidate()
+                    capture_log.info("检测到显示设置变化，截图上下文已失效。")
+                return False, 0 # 交给Qt继续处理
+
             if msg.message == win32con.WM_HOTKEY:
                 hotkey_id = win32api.LOWORD(msg.wParam)
                 if hotkey_id == self.HOTKEY_ID:
-                    print("检测到全局热键按下！正在截图...")
-                    take_screenshot_windows_api()
+                    hotkey_time = time.perf_counter()
+                    hotkey_log.debug("检测到全局热键按下！正在截图...")
+                    take_screenshot_windows_api(hotkey_time)
+                    elapsed_ms = (time.perf_counter() - hotkey_time) * 1000
+                    hotkey_latency.record(elapsed_ms)
+                    hotkey_log.debug("热键处理返回耗时: %.1fms", elapsed_ms)
+                    return True, 0 # 消息已处理
+                if hotkey_id == self.BURST_HOTKEY_ID:
+                    hotkey_time = time.perf_counter()
+                    hotkey_log.debug("检测到连拍热键按下！")
+                    start_burst_capture(hotkey_time)
+                    hotkey_latency.record((time.perf_counter() - hotkey_time) * 1000)
+                    return True, 0 # 消息已处理
+                if hotkey_id == self.REPLAY_HOTKEY_ID:
+                    hotkey_time = time.perf_counter()
+                    hotkey_log.debug("检测到即时回放热键按下！")
+                    save_instant_replay(hotkey_time)
+                    hotkey_latency.record((time.perf_counter() - hotkey_time) * 1000)
                     return True, 0 # 消息已处理
         return False, 0 # 消息未处理
 
+    def show_capture_stats(self):
+        """显示最近若干次截图各阶段耗时的 p50/p95/p99。"""
+        text = trace_recorder.format_summary()
+        trace_log.info("%s", text)
+        QMessageBox.information(self, "截图耗时统计", f"<pre>{text}</pre>")
+
+    def set_capture_mode(self, action):
+        global CAPTURE_MODE
+        CAPTURE_MODE = action.data()
+        capture_log.info("截图范围已更新为: %s", CAPTURE_MODE)
+        save_config()
+
+    def toggle_replay(self, enabled):
+        global REPLAY_ENABLED
+        REPLAY_ENABLED = enabled
+        set_replay_enabled(enabled)
+        self.save_replay_action.setEnabled(enabled)
+        self.update_replay_hotkey()
+        save_config()
+
     def open_settings_window(self):
         if self.settings_window is None:
+            from gui_settings import SettingsWindow # 第一次打开时才加载设置窗口
             self.settings_window = SettingsWindow() # 移除父窗口，使其成为独立的顶级窗口
             self.settings_window.keybinding_changed.connect(self.update_keybinding)
             self.settings_window.path_changed.connect(self.update_path_display)
@@ -1227,22 +1330,51 @@ class F10CaptureApp(QMainWindow):
         KEYBINDING = new_key
         # 重新注册全局热键以应用新的按键绑定
         self.register_hotkey()
-        print(f"主窗口已更新按键绑定为: {KEYBINDING}")
+        config_log.info("主窗口已更新按键绑定为: %s", KEYBINDING)
 
     def update_path_display(self, new_path):
         global CUSTOM_SCREENSHOT_DIR
         CUSTOM_SCREENSHOT_DIR = new_path
-        print(f"主窗口已更新自定义路径为: {CUSTOM_SCREENSHOT_DIR}")
+        config_log.info("主窗口已更新自定义路径为: %s", CUSTOM_SCREENSHOT_DIR)
 
     def open_view_screenshots_window(self):
         if self.view_screenshots_window is None:
+            from gui_viewer import ViewScreenshotsWindow # 第一次打开时才加载查看窗口及其 QGraphics* 依赖
             self.view_screenshots_window = ViewScreenshotsWindow()
+        else:
+            self.view_screenshots_window.reconcile_library() # 补齐窗口关闭期间在程序外的改动
         self.view_screenshots_window.show()
         self.view_screenshots_window.activateWindow()
 
     def quit_app(self):
-        print("正在退出应用程序...")
+        app_log.info("正在退出应用程序...")
         self.unregister_hotkey() # 退出前注销热键
+        if replay_buffer is not None:
+            replay_buffer.stop() # 停止后台抓取，之后才能释放截图上下文
+        if capture_pipeline is not None:
+            capture_pipeline.stop() # 等待队列中的截图写完
+            app_log.info("%s", hotkey_latency)
+            app_log.info("%s", capture_pipeline.shot_to_file)
+            if trace_log.isEnabledFor(logging.INFO):
+                trace_log.info("%s", trace_recorder.format_summary())
+            pipeline_log.info("截图流水线统计: %s", capture_pipeline.stats())
+        if capture_context is not None:
+            capture_log.info("帧缓冲池统计: %s", capture_context.buffer_pool.stats())
+        if capture_context is not None:
+            capture_context.close() # 释放缓存的DC和位图
+        if deferred_transcoder is not None:
+            # 未完成的转码会在下次启动时继续
+            deferred_transcoder.stop()
+        if sound_player is not None:
+            sound_player.stop()
+            app_log.info("截图音效统计: %s, %s", sound_player.stats(), sound_player.trigger_latency)
+        for pool in (capture_pool, viewer_pool, maintenance_pool):
+            pool_log.info("%s线程池统计: %s", pool.name, pool.stats())
+        maintenance_pool.wait_for_done(3000) # 等待回放帧写完
+        if _thumbnail_store is not None:
+            _thumbnail_store.close()
+        if _library_catalog is not None:
+            _library_catalog.close()
         if self.tray_icon:
             self.tray_icon.hide()
         if self.settings_window:
@@ -1257,6 +1389,10 @@ class F10CaptureApp(QMainWindow):
         event.ignore() # 忽略关闭事件，防止程序退出
 
 if __name__ == "__main__":
+    # 直接运行时本模块名为 __main__；gui_viewer、gui_settings 通过 import gui_app 读写设置，
+    # 登记别名后它们拿到的是同一个模块，而不是重新导入一份
+    sys.modules.setdefault("gui_app", sys.modules[__name__])
+    configure_logging(LOG_LEVEL, LOG_FILE, LOG_CONSOLE, sys.stdout) # 读取配置前先按默认设置输出
     # 尝试创建命名互斥量，不立即拥有
     mutex = win32event.CreateMutex(None, 0, MUTEX_NAME)
     last_error = win32api.GetLastError()
@@ -1268,7 +1404,7 @@ if __name__ == "__main__":
         # 成功获取互斥量，表示当前是唯一实例
         # 如果 last_error 是 ERROR_ALREADY_EXISTS，说明互斥量之前存在但现在可以获取了（可能之前的实例异常退出）
         if last_error == winerror.ERROR_ALREADY_EXISTS:
-            print("信息: 互斥量已存在，但成功获取。可能之前的实例异常退出。")
+            app_log.info("互斥量已存在，但成功获取。可能之前的实例异常退出。")
         
         # 程序首次运行或之前的实例异常退出
         load_config() # 在程序启动时加载配置
@@ -1284,7 +1420,7 @@ if __name__ == "__main__":
         sys.exit(exit_code)
     else:
         # 无法获取互斥量，说明有其他实例正在运行
-        print("警告: 无法获取互斥量，程序已在运行。")
+        app_log.warning("无法获取互斥量，程序已在运行。")
         app_instance = QApplication.instance()
         if app_instance is None:
             app_instance = QApplication(sys.argv) # 仅在没有实例时创建
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+设置窗口：截图按键、自定义保存路径和截图格式。
+只在第一次打开设置窗口时由 gui_app 导入；设置项是 gui_app 的模块级变量，这里直接读写 gui_app 中的值。
+"""
+import os
+
+from PySide6.QtWidgets import (
+    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QFileDialog,
+    QMessageBox, QFrame, QComboBox
+)
+from PySide6.QtCore import Qt, Signal
+
+import gui_app
+from gui_app import config_log, normalize_key_name, save_config, get_deferred_transcoder
+
+class SettingsWindow(QMainWindow):
+    keybinding_changed = Signal(object) # 发送新的按键名
+    path_changed = Signal(str) # 发送新的路径
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("设置")
+        # 移除 setFixedSize 以允许窗口最大化和调整大小
+        self.setWindowFlags(Qt.Window) # 确保窗口显示在任务栏并可最小化
+
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.layout = QVBoxLayout(self.central_widget)
+        self.layout.setContentsMargins(20, 20, 20, 20) # 增加边距
+        self.layout.setSpacing(20) # 增加间距
+
+        self.setStyleSheet("""
+            QMainWindow {
+                background-color: #f0f2f5; /* 浅灰色背景 */
+            }
+            QFrame {
+                background-color: #ffffff; /* 白色背景 */
+                border: 1px solid #e0e0e0; /* 浅边框 */
+                border-radius: 8px; /* 圆角 */
+                padding: 15px; /* 内部填充 */
+            }
+            QLabel {
+                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
+                font-size: 14px;
+                color: #333333; /* 深灰色字体 */
+            }
+            QLabel#current_key_label, QLabel#current_path_label {
+                font-weight: bold;
+                color: #007bff; /* 蓝色强调色 */
+            }
+            QLineEdit {
+                border: 1px solid #cccccc; /* 浅灰色边框 */
+                border-radius: 5px; /* 圆角 */
+                padding: 8px; /* 内部填充 */
+                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
+                font-size: 13px;
+                color: #555555;
+                background-color: #fdfdfd;
+            }
+            QLineEdit:focus {
+                border: 1px solid #007bff; /* 聚焦时边框变为蓝色 */
+            }
+            QLineEdit:read-only {
+                background-color: #f5f5f5; /* 只读状态的背景色 */
+            }
+            QPushButton {
+                background-color: #007bff; /* 蓝色背景 */
+                color: white; /* 白色字体 */
+                border: none;
+                border-radius: 5px; /* 圆角 */
+                padding: 8px 15px; /* 内部填充 */
+                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
+                font-size: 13px;
+                font-weight: 500;
+            }
+            QPushButton:hover {
+                background-color: #0056b3; /* 悬停时的深蓝色 */
+            }
+            QPushButton:pressed {
+                background-color: #004085; /* 按下时的更深蓝色 */
+            }
+            QPushButton#clear_button { /* 为清除按钮设置不同样式 */
+                background-color: #dc3545; /* 红色 */
+            }
+            QPushButton#clear_button:hover {
+                background-color: #c82333;
+            }
+            QPushButton#clear_button:pressed {
+                background-color: #bd2130;
+            }
+        """)
+
+        self.init_ui()
+
+    def init_ui(self):
+        # 截图按键设置
+        key_frame = QFrame()
+        key_frame.setObjectName("key_frame") # 添加对象名以便QSS选择器使用
+        key_layout = QVBoxLayout(key_frame)
+        key_layout.setContentsMargins(15, 15, 15, 15) # 调整内部边距
+        key_layout.setSpacing(10) # 调整内部间距
+
+        key_label_layout = QHBoxLayout()
+        self.current_key_label = QLabel(f"当前截图按键: {gui_app.KEYBINDING}")
+        self.current_key_label.setObjectName("current_key_label") # 添加对象名
+        key_label_layout.addWidget(self.current_key_label)
+        key_label_layout.addStretch()
+        key_layout.addLayout(key_label_layout)
+
+        key_input_layout = QHBoxLayout()
+        self.key_entry = QLineEdit()
+        self.key_entry.setPlaceholderText("按下任意键...")
+        self.key_entry.setReadOnly(True) # 初始设置为只读
+        self.key_entry.setText(gui_app.KEYBINDING)
+        key_input_layout.addWidget(self.key_entry)
+
+        self.listen_button = QPushButton("点击设置新按键")
+        self.listen_button.clicked.connect(self.start_listening_for_entry)
+        key_input_layout.addWidget(self.listen_button)
+
+        self.save_key_button = QPushButton("保存按键")
+        self.save_key_button.clicked.connect(self.save_keybinding_only)
+        key_input_layout.addWidget(self.save_key_button)
+        key_layout.addLayout(key_input_layout)
+        
+        self.layout.addWidget(key_frame)
+
+        # 截图保存路径设置
+        path_frame = QFrame()
+        path_frame.setObjectName("path_frame") # 添加对象名
+        path_layout = QVBoxLayout(path_frame)
+        path_layout.setContentsMargins(15, 15, 15, 15) # 调整内部边距
+        path_layout.setSpacing(10) # 调整内部间距
+
+        path_label_layout = QHBoxLayout()
+        self.current_path_label = QLabel(f"当前自定义路径: {gui_app.CUSTOM_SCREENSHOT_DIR if gui_app.CUSTOM_SCREENSHOT_DIR else '未设置 (使用默认)'}")
+        self.current_path_label.setObjectName("current_path_label") # 添加对象名
+        path_label_layout.addWidget(self.current_path_label)
+        path_label_layout.addStretch()
+        path_layout.addLayout(path_label_layout)
+
+        path_input_layout = QHBoxLayout()
+        self.path_entry = QLineEdit()
+        self.path_entry.setReadOnly(True) # 初始设置为只读
+        self.path_entry.setText(gui_app.CUSTOM_SCREENSHOT_DIR if gui_app.CUSTOM_SCREENSHOT_DIR else os.path.abspath(gui_app.BASE_SCREENSHOT_DIR))
+        path_input_layout.addWidget(self.path_entry)
+
+        browse_button = QPushButton("浏览...")
+        browse_button.clicked.connect(self.browse_directory)
+        path_input_layout.addWidget(browse_button)
+        path_layout.addLayout(path_input_layout)
+
+        path_buttons_layout = QHBoxLayout()
+        clear_button = QPushButton("清除自定义路径")
+        clear_button.setObjectName("clear_button") # 添加对象名
+        clear_button.clicked.connect(self.clear_custom_path)
+        path_buttons_layout.addWidget(clear_button)
+
+        save_path_button = QPushButton("保存路径")
+        save_path_button.clicked.connect(self.save_path_only)
+        path_buttons_layout.addWidget(save_path_button)
+        path_layout.addLayout(path_buttons_layout)
+
+        self.layout.addWidget(path_frame)
+
+        # 截图格式设置
+        format_frame = QFrame()
+        format_frame.setObjectName("format_frame") # 添加对象名
+        format_layout = QVBoxLayout(format_frame)
+        format_layout.setContentsMargins(15, 15, 15, 15) # 调整内部边距
+        format_layout.setSpacing(10) # 调整内部间距
+
+        format_input_layout = QHBoxLayout()
+        format_input_layout.addWidget(QLabel("截图格式:"))
+        self.format_combo = QComboBox()
+        self.format_combo.addItem(f"PNG (压缩级别 {gui_app.PNG_COMPRESS_LEVEL})", "png")
+        self.format_combo.addItem("WebP 无损", "webp")
+        self.format_combo.addItem("QOI", "qoi")
+        self.format_combo.addItem("快速转储 (稍后转为PNG)", "raw")
+        self.format_combo.setCurrentIndex(max(0, self.format_combo.findData(gui_app.OUTPUT_FORMAT)))
+        format_input_layout.addWidget(self.format_combo)
+        format_input_layout.addStretch()
+
+        save_format_button = QPushButton("保存格式")
+        save_format_button.clicked.connect(self.save_format_only)
+        format_input_layout.addWidget(save_format_button)
+        format_layout.addLayout(format_input_layout)
+
+        self.layout.addWidget(format_frame)
+        self.layout.addStretch() # 填充剩余空间
+
+        self.key_listener_for_entry = None
+
+    def start_listening_for_entry(self):
+        self.key_entry.setText("按下任意键...")
+        self.key_entry.setReadOnly(False) # 允许输入
+        self.key_entry.setFocus() # 聚焦输入框
+
+        if self.key_listener_for_entry and self.key_listener_for_entry.running:
+            self.key_listener_for_entry.stop()
+
+        from pynput import keyboard # 只在录制按键时加载
+
+        def on_key_press_for_entry(key):
+            try:
+                key_name = str(key).replace("Key.", "").replace("'", "")
+                self.key_entry.setText(key_name)
+                if self.key_listener_for_entry:
+                    self.key_listener_for_entry.stop()
+                self.key_entry.setReadOnly(True) # 恢复只读
+            except AttributeError:
+                key_name = str(key).replace("Key.", "").replace("'", "")
+                self.key_entry.setText(key_name)
+                if self.key_listener_for_entry:
+                    self.key_listener_for_entry.stop()
+                self.key_entry.setReadOnly(True) # 恢复只读
+
+        self.key_listener_for_entry = keyboard.Listener(on_press=on_key_press_for_entry)
+        self.key_listener_for_entry.start()
+
+    def save_keybinding_only(self):
+        new_key_str = self.key_entry.text().strip()
+        if new_key_str:
+            try:
+                key_name = normalize_key_name(new_key_str)
+                if key_name is not None:
+                    gui_app.KEYBINDING = key_name
+                else:
+                    QMessageBox.critical(self, "错误", f"无法识别的按键: {new_key_str}")
+                    config_log.warning("无法识别的按键: %s", new_key_str)
+                    return
+                self.current_key_label.setText(f"当前截图按键: {gui_app.KEYBINDING}")
+                config_log.info("截图按键已更新为: %s", gui_app.KEYBINDING)
+                save_config()
+                self.keybinding_changed.emit(gui_app.KEYBINDING) # 发送信号通知主窗口
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"保存按键失败: {e}")
+                config_log.error("保存按键失败: %s", e)
+        else:
+            QMessageBox.warning(self.parent(), "警告", "按键绑定不能为空。") # 修正：使用self.parent()
+            
+    def browse_directory(self):
+        folder_selected = QFileDialog.getExistingDirectory(self, "选择截图保存目录", self.path_entry.text())
+        if folder_selected:
+            self.path_entry.setText(folder_selected)
+
+    def clear_custom_path(self):
+        self.path_entry.setText(os.path.abspath(gui_app.BASE_SCREENSHOT_DIR))
+        self.current_path_label.setText("当前自定义路径: 未设置 (使用默认)")
+        gui_app.CUSTOM_SCREENSHOT_DIR = ""
+        save_config()
+        config_log.info("自定义截图目录已清除，将使用默认路径。")
+        self.path_changed.emit(gui_app.CUSTOM_SCREENSHOT_DIR) # 发送信号通知主窗口
+
+    def save_path_only(self):
+        new_custom_path = self.path_entry.text().strip()
+        if new_custom_path:
+            if os.path.isdir(new_custom_path):
+                gui_app.CUSTOM_SCREENSHOT_DIR = new_custom_path
+                self.current_path_label.setText(f"当前自定义路径: {gui_app.CUSTOM_SCREENSHOT_DIR}")
+                config_log.info("自定义截图目录已更新为: %s", gui_app.CUSTOM_SCREENSHOT_DIR)
+                save_config()
+                self.path_changed.emit(gui_app.CUSTOM_SCREENSHOT_DIR) # 发送信号通知主窗口
+            else:
+                QMessageBox.critical(self, "错误", f"无效的路径: {new_custom_path}\n请选择一个有效的文件夹。")
+                config_log.warning("无效的自定义路径: %s，将不保存此路径。", new_custom_path)
+                self.path_entry.setText(gui_app.CUSTOM_SCREENSHOT_DIR if gui_app.CUSTOM_SCREENSHOT_DIR else os.path.abspath(gui_app.BASE_SCREENSHOT_DIR))
+        else:
+            gui_app.CUSTOM_SCREENSHOT_DIR = ""
+            self.current_path_label.setText("当前自定义路径: 未设置 (使用默认)")
+            config_log.info("自定义截图目录已清除，将使用默认路径。")
+            save_config()
+            self.path_changed.emit(gui_app.CUSTOM_SCREENSHOT_DIR) # 发送信号通知主窗口
+
+    def save_format_only(self):
+        gui_app.OUTPUT_FORMAT = self.format_combo.currentData()
+        config_log.info("截图格式已更新为: %s", gui_app.OUTPUT_FORMAT)
+        save_config()
+        if gui_app.OUTPUT_FORMAT == "raw":
+            get_deferred_transcoder() # 启动后台转码任务
+
+    def closeEvent(self, event):
+        if self.key_listener_for_entry and self.key_listener_for_entry.running:
+            self.key_listener_for_entry.stop()
+        event.accept()
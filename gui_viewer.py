@@ -0,0 +1,1509 @@
+# -*- coding: utf-8 -*-
+"""
+截图查看窗口：进程文件夹/图片网格、缩略图的异步加载和全屏浏览（超大图片使用分块金字塔）。
+只在第一次打开查看窗口时由 gui_app 导入，托盘进程启动时不加载这些界面类和 QGraphics* 依赖。
+查看窗口的设置项是 gui_app 的模块级变量，可能在运行中被重新加载，因此通过 gui_app.XXX 读取。
+"""
+import bisect
+import collections
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from PySide6.QtWidgets import (
+    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QMessageBox, QStackedWidget,
+    QGraphicsScene, QGraphicsView, QGraphicsObject, QGraphicsItem,
+    QListView, QAbstractItemView, QStyledItemDelegate, QStyle
+)
+from PySide6.QtGui import QIcon, QKeySequence, QShortcut, QPixmap, QImage, QImageReader, QPainter, QColor
+from PySide6.QtCore import (
+    Qt, QObject, Signal, QSize, QRunnable, QTimer, QByteArray, QBuffer, QIODevice,
+    QAbstractListModel, QModelIndex, QRect, QRectF, QFileSystemWatcher
+)
+
+from capture_engine import THUMBNAIL_SIZE, Image, LatencyStats, is_library_image, load_thumbnail_image
+
+import gui_app
+from gui_app import (
+    viewer_log, process_log, viewer_pool, maintenance_pool, process_cache, library_change_listeners,
+    extract_exe_icon, get_screenshot_base_dir, get_library_catalog, get_thumbnail_store,
+)
+
+# 全屏查看超大截图（多屏拼接、8K）时使用分块金字塔，只加载当前缩放级别下可见的图块
+TILED_VIEW_MIN_PIXELS = 12 * 1000 * 1000 # 超过该像素数的图片使用分块显示
+TILE_SIZE = 512 # 图块边长（像素）
+TILE_MEMORY_MB = 96 # 内存中图块缓存的上限
+TILE_PREVIEW_SIZE = 2048 # 先显示的低分辨率预览的最长边
+TILE_CACHE_MB = 512 # 磁盘上图块缓存的总大小上限，超出时淘汰最久未使用的金字塔
+TILE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "F10Capture_tiles")
+
+# 进程图标缓存
+_process_icon_cache = {}
+
+def get_process_icon(folder_name):
+    """
+    根据文件夹名称（通常是进程名称）获取其对应的图标。
+    首先尝试从缓存加载，然后从文件夹中加载预保存的图标，如果失败则尝试从实时进程中提取，
+    最后回退到默认图标。
+    """
+    if folder_name in _process_icon_cache:
+        process_log.debug("从缓存加载图标: %s", folder_name)
+        return _process_icon_cache[folder_name]
+
+    default_icon_path = "icon.png"
+    if hasattr(sys, '_MEIPASS'):
+        default_icon_path = os.path.join(sys._MEIPASS, default_icon_path)
+
+    screenshot_base_dir = get_screenshot_base_dir()
+    
+    folder_full_path = os.path.join(screenshot_base_dir, folder_name)
+    icon_in_folder_path = os.path.join(folder_full_path, "icon.png")
+
+    # 1. 尝试从文件夹中加载预保存的图标
+    if os.path.exists(icon_in_folder_path):
+        pixmap = QPixmap(icon_in_folder_path)
+        if not pixmap.isNull():
+            icon = QIcon(pixmap)
+            _process_icon_cache[folder_name] = icon
+            process_log.debug("从文件夹 '%s' 加载预保存图标并缓存。", folder_name)
+            return icon
+        else:
+            process_log.warning("无法从 '%s' 加载图标，尝试从实时进程获取。", icon_in_folder_path)
+
+    # 2. 如果文件夹中没有预保存的图标，或者加载失败，则尝试从实时进程中提取
+    process_name_for_live_lookup = folder_name
+    try:
+        exe_path = process_cache.exe_for_name(process_name_for_live_lookup)
+        if exe_path and os.path.exists(exe_path):
+            try:
+                image = process_cache.icon_for_exe(exe_path) or extract_exe_icon(exe_path)
+                if image is not None:
+                    process_cache.remember_icon(exe_path, image)
+                    icon = QIcon(QPixmap.fromImage(image))
+                    _process_icon_cache[folder_name] = icon
+                    process_log.debug("从实时进程 '%s' 提取图标并缓存。", process_name_for_live_lookup)
+                    return icon
+            except Exception as icon_e:
+                process_log.warning("从 '%s' 提取并保存图标失败: %s", exe_path, icon_e)
+    except Exception as e:
+        process_log.warning("获取进程 '%s' 图标失败: %s", process_name_for_live_lookup, e)
+    
+    # 3. 如果上述方法都失败，返回默认图标
+    process_log.debug("未能为 '%s' 获取特定图标，使用默认图标并缓存。", folder_name)
+    default_icon = QIcon(default_icon_path)
+    _process_icon_cache[folder_name] = default_icon
+    return default_icon
+
+
+def load_qimage(image_path):
+    """
+    加载图片为 QImage。Qt 无法解码的格式（例如 QOI）回退到 PIL 解码。
+    """
+    image = QImage(image_path)
+    if not image.isNull():
+        return image
+    try:
+        with Image.open(image_path) as pil_image:
+            rgba = pil_image.convert('RGBA')
+            data = rgba.tobytes('raw', 'RGBA')
+            return QImage(data, rgba.width, rgba.height, rgba.width * 4, QImage.Format_RGBA8888).copy()
+    except Exception as e:
+        viewer_log.warning("使用PIL加载图片 %s 失败: %s", image_path, e)
+        return QImage()
+
+def pil_to_qimage(image):
+    """把 PIL 图像转换为独立持有像素的 QImage（QImage 可以在工作线程中使用，QPixmap 不行）。"""
+    if image.mode == 'RGBA':
+        data = image.tobytes('raw', 'RGBA')
+        return QImage(data, image.width, image.height, image.width * 4, QImage.Format_RGBA8888).copy()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    data = image.tobytes('raw', 'RGB')
+    return QImage(data, image.width, image.height, image.width * 3, QImage.Format_RGB888).copy()
+
+
+def decode_thumbnail(image_path, thumb_size=THUMBNAIL_SIZE):
+    """
+    以尽量低的分辨率解码图片并缩小为缩略图，返回 QImage（可以在工作线程中调用）。
+    - JPEG: PIL 的 draft() 让解码器直接按 1/2、1/4、1/8 的比例做 DCT 缩放解码，不解出全分辨率像素；
+    - PNG/WebP/BMP: 没有降分辨率解码的办法，用 Qt 解码（PNG 与 PIL 相当，WebP 比 PIL 快约 3 倍），
+      再用 QImage 的平滑缩放（大倍数缩小时按面积平均，相当于盒式滤波）；
+    - Qt 无法解码的格式（例如 QOI）: PIL 解码后先 reduce() 整数倍盒式缩小，再做精细缩放。
+    """
+    reader = QImageReader(image_path)
+    if bytes(reader.format()) == b'jpeg': # 只读取文件头判断格式
+        try:
+            return pil_to_qimage(load_thumbnail_image(image_path, thumb_size))
+        except OSError:
+            pass # PIL 解码失败，交给 Qt
+    image = reader.read()
+    if not image.isNull():
+        return image.scaled(QSize(*thumb_size), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return pil_to_qimage(load_thumbnail_image(image_path, thumb_size))
+
+
+class IconLoader(QObject, QRunnable): # 继承QObject和QRunnable
+    """
+    用于在后台线程中加载进程图标的QRunnable。
+    """
+    icon_loaded = Signal(str, QIcon) # 信号：folder_name, QIcon
+
+    def __init__(self, folder_name):
+        QObject.__init__(self) # 初始化QObject
+        QRunnable.__init__(self) # 初始化QRunnable
+        self.folder_name = folder_name
+        self.is_cancelled = lambda: False # 由 ThumbnailScheduler 替换为代数检查
+        self.setAutoDelete(True) # 任务完成后自动删除
+
+    def run(self):
+        icon = get_process_icon(self.folder_name)
+        self.icon_loaded.emit(self.folder_name, icon)
+
+class ImageThumbnailLoader(QObject, QRunnable): # 继承QObject和QRunnable
+    """
+    用于在后台线程中加载图片缩略图的QRunnable。
+    工作线程只产生 QImage，转换为 QPixmap 的工作在GUI线程的槽函数中完成。
+    """
+    thumbnail_loaded = Signal(str, QImage) # 信号：image_path, QImage
+
+    def __init__(self, image_path, size: QSize):
+        QObject.__init__(self) # 初始化QObject
+        QRunnable.__init__(self) # 初始化QRunnable
+        self.image_path = image_path
+        self.size = size
+        self.is_cancelled = lambda: False # 由 ThumbnailScheduler 替换为代数检查
+        self.setAutoDelete(True) # 任务完成后自动删除
+
+    def run(self):
+        try:
+            thumb_size = (self.size.width(), self.size.height())
+            store = get_thumbnail_store()
+            stat = os.stat(self.image_path)
+            if store is not None:
+                data = store.get(self.image_path, stat.st_mtime_ns, stat.st_size, thumb_size)
+                if data is not None:
+                    image = QImage.fromData(data)
+                    if not image.isNull():
+                        self.thumbnail_loaded.emit(self.image_path, image)
+                        return
+
+            if self.is_cancelled(): # 缓存未命中时需要解码原图，任务已过期则直接放弃
+                return
+            image = decode_thumbnail(self.image_path, thumb_size)
+            if image.isNull():
+                viewer_log.warning("无法加载图片 %s 进行缩略图生成。", self.image_path)
+                self.thumbnail_loaded.emit(self.image_path, QImage()) # 发送空图像
+                return
+            if store is not None:
+                data = QByteArray()
+                qbuffer = QBuffer(data)
+                qbuffer.open(QIODevice.WriteOnly)
+                image.save(qbuffer, "JPG", 85)
+                store.put(self.image_path, stat.st_mtime_ns, stat.st_size, thumb_size, bytes(data))
+            self.thumbnail_loaded.emit(self.image_path, image)
+        except Exception as e:
+            viewer_log.warning("生成图片 %s 缩略图失败: %s", self.image_path, e)
+            self.thumbnail_loaded.emit(self.image_path, QImage()) # 发送空图像
+
+class ThumbnailScheduler(QObject):
+    """
+    缩略图加载任务调度器。
+
+    - 代数（generation）：切换文件夹或离开图片视图时调用 reset()，代数加一，
+      排队中的旧任务直接丢弃，已在执行的旧任务在解码前检查代数后放弃；
+    - 优先级：可见条目优先，其次按与可见区域的距离由近到远；
+      滚动后调用 reprioritize() 重新排序，离可见区域太远的任务被取消；
+    - 同时在执行的任务数有上限，新文件夹的缩略图不会排在大量旧任务后面。
+    """
+    job_done = Signal(int, bool) # 信号：任务所属的代数、是否因过期而放弃（从工作线程发出，排队到主线程处理）
+
+    def __init__(self, pool, max_in_flight=4, on_dropped=None, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+        self.max_in_flight = max(1, max_in_flight)
+        self.on_dropped = on_dropped # 回调: on_dropped(key)，任务未执行就被取消时调用
+        self.generation = 0
+        self._heap = [] # (优先级, 序号, 键)
+        self._jobs = {} # 键 -> 创建加载任务的函数
+        self._seq = 0
+        self._in_flight = 0
+        self._stats = {"submitted": 0, "started": 0, "dropped": 0, "stale": 0}
+        self._pump_timer = QTimer(self)
+        self._pump_timer.setSingleShot(True)
+        self._pump_timer.setInterval(0) # 合并同一轮绘制中的请求，排好优先级后再启动
+        self._pump_timer.timeout.connect(self._pump)
+        self.job_done.connect(self._on_job_done)
+
+    def submit(self, key, make_loader, priority):
+        """提交一个加载任务。make_loader() 返回 IconLoader/ImageThumbnailLoader。"""
+        self._jobs[key] = make_loader
+        self._seq += 1
+        heapq.heappush(self._heap, (priority, self._seq, key))
+        self._stats["submitted"] += 1
+        self._pump_timer.start()
+
+    def reset(self):
+        """开始新的一代：丢弃所有排队任务，正在执行的旧任务会在解码前放弃。"""
+        self.generation += 1
+        self._stats["dropped"] += len(self._jobs)
+        self._heap.clear()
+        self._jobs.clear()
+
+    def reprioritize(self, priority_of):
+        """
+        按新的可见区域重新计算优先级。priority_of(key) 返回 None 表示该任务已不需要，
+        取消并通知 on_dropped，之后条目重新可见时会再次请求。
+        """
+        heap = []
+        for key in list(self._jobs):
+            priority = priority_of(key)
+            if priority is None:
+                del self._jobs[key]
+                self._stats["dropped"] += 1
+                if self.on_dropped:
+                    self.on_dropped(key)
+                continue
+            self._seq += 1
+            heap.append((priority, self._seq, key))
+        heapq.heapify(heap)
+        self._heap = heap
+        self._pump_timer.start()
+
+    def _pump(self):
+        while self._in_flight < self.max_in_flight and self._heap:
+            _, _, key = heapq.heappop(self._heap)
+            make_loader = self._jobs.pop(key, None)
+            if make_loader is None: # 已被 reprioritize 取消或重复提交的旧堆项
+                continue
+            loader = make_loader()
+            generation = self.generation
+            loader.is_cancelled = lambda: self.generation != generation
+            self._in_flight += 1
+            self._stats["started"] += 1
+            self.pool.start(_ScheduledJob(self, loader, generation))
+
+    def _on_job_done(self, generation, stale):
+        # 统计只在主线程中修改，工作线程通过信号报告结果
+        self._in_flight -= 1
+        if stale:
+            self._stats["stale"] += 1
+        self._pump()
+
+    def stats(self):
+        return dict(self._stats, queued=len(self._jobs), in_flight=self._in_flight, generation=self.generation)
+
+class _ScheduledJob(QRunnable):
+    """包装一个加载任务：启动前检查代数，结束后通知调度器释放名额。"""
+    def __init__(self, scheduler, loader, generation):
+        super().__init__()
+        self.scheduler = scheduler
+        self.loader = loader
+        self.generation = generation
+        self.setAutoDelete(True)
+
+    def run(self):
+        stale = False
+        try:
+            if self.loader.is_cancelled():
+                stale = True
+                return
+            self.loader.run()
+        finally:
+            self.scheduler.job_done.emit(self.generation, stale)
+
+class ScreenshotItemModel(QAbstractListModel):
+    """
+    查看窗口中文件夹/图片网格的列表模型。模型只保存 (名称, 路径) 列表，
+    缩略图按需请求：只有视图真正绘制或预取的行才会触发加载，
+    已加载的缩略图保存在有数量上限的 LRU 中，内存占用与文件夹大小无关。
+    """
+    PathRole = Qt.UserRole + 1
+    StateRole = Qt.UserRole + 2 # "loading" / "failed" / "ready"
+
+    def __init__(self, request_thumbnail, key_index=1, max_cached=400, parent=None):
+        super().__init__(parent)
+        self.request_thumbnail = request_thumbnail # 回调: request_thumbnail(key, name, path)
+        self.key_index = key_index # 用 (名称, 路径) 中的哪一项作为缩略图的键
+        self.max_cached = max_cached
+        self._items = []
+        self._rows = {} # 键 -> 行号
+        self._pixmaps = collections.OrderedDict() # 键 -> QPixmap（LRU）
+        self._pending = set()
+        self._failed = set()
+
+    def set_items(self, items):
+        """替换全部条目并清空缩略图缓存。"""
+        self.beginResetModel()
+        self._items = list(items)
+        self._rows = {item[self.key_index]: row for row, item in enumerate(self._items)}
+        self._pixmaps.clear()
+        self._pending.clear()
+        self._failed.clear()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._items)
+
+    def item(self, row):
+        return self._items[row]
+
+    def items(self):
+        return list(self._items)
+
+    def apply_changes(self, added, removed_keys, changed_keys=()):
+        """
+        增量更新：删除 removed_keys 对应的条目，并按名称顺序插入 added 中的 (名称, 路径)；
+        changed_keys 中的条目内容已变化，丢弃其缩略图和失败记录，视图重绘时重新加载。
+        只发出行插入/删除/数据变化信号，其余条目和已加载的缩略图保持不变。
+        """
+        removed_rows = sorted((self._rows[key] for key in removed_keys if key in self._rows), reverse=True)
+        for row in removed_rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            key = self._items[row][self.key_index]
+            del self._items[row]
+            self._pixmaps.pop(key, None)
+            self._pending.discard(key)
+            self._failed.discard(key)
+            self.endRemoveRows()
+        present = {item[self.key_index] for item in self._items}
+        for item in sorted(added):
+            if item[self.key_index] in present:
+                continue
+            row = bisect.bisect_left(self._items, item[0], key=lambda existing: existing[0])
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._items.insert(row, item)
+            present.add(item[self.key_index])
+            self.endInsertRows()
+        self._rows = {item[self.key_index]: row for row, item in enumerate(self._items)}
+        for key in changed_keys:
+            row = self._rows.get(key)
+            if row is None:
+                continue
+            self._pixmaps.pop(key, None)
+            self._pending.discard(key)
+            self._failed.discard(key)
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole, self.StateRole])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._items):
+            return None
+        name, path = self._items[index.row()]
+        key = self._items[index.row()][self.key_index]
+        if role == Qt.DisplayRole:
+            return name
+        if role == self.PathRole:
+            return path
+        if role == Qt.DecorationRole:
+            pixmap = self._pixmaps.get(key)
+            if pixmap is not None:
+                self._pixmaps.move_to_end(key)
+                return pixmap
+            self._request(key, name, path)
+            return None
+        if role == self.StateRole:
+            if key in self._pixmaps:
+                return "ready"
+            return "failed" if key in self._failed else "loading"
+        return None
+
+    def _request(self, key, name, path):
+        if key in self._pending or key in self._failed:
+            return
+        self._pending.add(key)
+        self.request_thumbnail(key, name, path)
+
+    def prefetch(self, first, last):
+        """请求 [first, last] 行中尚未加载的缩略图（用于即将滚动到的区域）。"""
+        first = max(0, first)
+        last = min(len(self._items) - 1, last)
+        for row in range(first, last + 1):
+            name, path = self._items[row]
+            key = self._items[row][self.key_index]
+            if key not in self._pixmaps:
+                self._request(key, name, path)
+
+    def row_of(self, key):
+        return self._rows.get(key)
+
+    def cached_thumbnail(self, key):
+        """返回已加载的缩略图，没有时返回 None（不会触发加载）。"""
+        return self._pixmaps.get(key)
+
+    def forget_pending(self, key):
+        """加载任务被调度器取消后调用，条目再次可见时会重新请求。"""
+        self._pending.discard(key)
+
+    def set_thumbnail(self, key, pixmap):
+        """
+        写入异步加载完成的缩略图。条目已不在模型中（例如已切换文件夹）时忽略。
+        """
+        row = self._rows.get(key)
+        if row is None:
+            return
+        self._pending.discard(key)
+        if pixmap is None or pixmap.isNull():
+            self._failed.add(key)
+        else:
+            self._pixmaps[key] = pixmap
+            self._pixmaps.move_to_end(key)
+            while len(self._pixmaps) > self.max_cached:
+                self._pixmaps.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole, self.StateRole])
+
+class LibraryChangeFeed(QObject):
+    """
+    截图库变化的合并器：收集截图库目录（应用内截图、转码、扫描）发出的单条变化，
+    在没有新变化 quiet_ms 毫秒后（最长 max_wait_ms）一次性交给 on_batch，
+    一次 30 帧的连拍只触发一次增量更新。同一文件先增后删等情况只保留最后的状态。
+    """
+    _changed = Signal(str, str, str) # 信号：kind, folder, filename（从任意线程发出，排队到GUI线程）
+
+    def __init__(self, on_batch, quiet_ms=250, max_wait_ms=5000, parent=None):
+        super().__init__(parent)
+        self.on_batch = on_batch # 回调: on_batch(folders, files)，folders: {文件夹: kind}，files: {(文件夹, 文件名): kind}
+        self.max_wait_ms = max_wait_ms
+        self._folders = {}
+        self._files = {}
+        self._first_event_at = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(quiet_ms)
+        self._timer.timeout.connect(self.flush)
+        self._changed.connect(self._collect)
+
+    def notify(self, kind, folder, filename):
+        """线程安全：作为 library_change_listeners 中的监听者使用。"""
+        self._changed.emit(kind, folder, filename or "")
+
+    def _collect(self, kind, folder, filename):
+        if filename:
+            self._files[(folder, filename)] = kind
+        else:
+            self._folders[folder] = kind
+        now = time.monotonic()
+        if self._first_event_at is None:
+            self._first_event_at = now
+        if (now - self._first_event_at) * 1000 >= self.max_wait_ms:
+            self.flush() # 持续不断的变化也要定期刷新
+        else:
+            self._timer.start()
+
+    def flush(self):
+        self._timer.stop()
+        folders, files = self._folders, self._files
+        self._folders, self._files = {}, {}
+        self._first_event_at = None
+        if folders or files:
+            self.on_batch(folders, files)
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """
+    绘制网格中的一个条目：圆角卡片、居中的缩略图和下方的名称。
+    取代原来每个条目一个 QFrame + 两个 QLabel 的控件树。
+    """
+    def __init__(self, item_size, thumb_size, failed_text, parent=None):
+        super().__init__(parent)
+        self.item_size = item_size
+        self.thumb_size = thumb_size
+        self.failed_text = failed_text
+
+    def sizeHint(self, option, index):
+        return self.item_size
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        # 网格单元可能比卡片宽（重排时多余的宽度平均分给每一列），卡片水平居中
+        card = QRect(option.rect.x() + (option.rect.width() - self.item_size.width()) // 2, option.rect.y(),
+                     self.item_size.width(), self.item_size.height()).adjusted(1, 1, -1, -1)
+        if option.state & QStyle.State_MouseOver: # 鼠标悬停时背景变蓝
+            painter.setPen(QColor("#007bff"))
+            painter.setBrush(QColor("#e0f2ff"))
+        else:
+            painter.setPen(QColor("#e0e0e0"))
+            painter.setBrush(QColor("#ffffff"))
+        painter.drawRoundedRect(card, 8, 8)
+
+        thumb_rect = QRect(card.x() + (card.width() - self.thumb_size.width()) // 2, card.y() + 8,
+                           self.thumb_size.width(), self.thumb_size.height())
+        pixmap = index.data(Qt.DecorationRole)
+        if pixmap is not None and not pixmap.isNull():
+            size = pixmap.size().scaled(self.thumb_size, Qt.KeepAspectRatio)
+            target = QRect(0, 0, size.width(), size.height())
+            target.moveCenter(thumb_rect.center())
+            painter.drawPixmap(target, pixmap)
+        else:
+            painter.setPen(QColor("gray"))
+            font = painter.font()
+            font.setPixelSize(10)
+            painter.setFont(font)
+            failed = index.data(ScreenshotItemModel.StateRole) == "failed"
+            painter.drawText(thumb_rect, Qt.AlignCenter, self.failed_text if failed else "加载中...")
+
+        name_rect = QRect(card.x() + 4, thumb_rect.bottom() + 4, card.width() - 8, card.bottom() - thumb_rect.bottom() - 6)
+        font = painter.font()
+        font.setPixelSize(13)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor("#007bff")) # 蓝色强调色
+        painter.drawText(name_rect, Qt.AlignHCenter | Qt.AlignTop | Qt.TextWrapAnywhere, index.data(Qt.DisplayRole))
+        painter.restore()
+
+class ScreenshotGridView(QListView):
+    """
+    查看窗口的网格视图：图标模式的 QListView，条目大小统一，只有可见区域会被布局和绘制。
+    窗口大小变化时只重新计算列数和条目位置（reflow），不会重建模型或重新加载缩略图。
+    """
+    def __init__(self, model, delegate, spacing=10, parent=None):
+        super().__init__(parent)
+        self.cell_size = delegate.item_size + QSize(spacing, spacing) # 最小网格单元
+        self.setViewMode(QListView.IconMode)
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setGridSize(self.cell_size)
+        self.setMouseTracking(True) # 悬停效果需要鼠标跟踪
+        self.viewport().setCursor(Qt.PointingHandCursor)
+        self.setItemDelegate(delegate)
+        self.setModel(model)
+        self.verticalScrollBar().valueChanged.connect(lambda _: self.prefetch_near_visible())
+
+    def columns(self):
+        return max(1, self.viewport().width() // self.cell_size.width())
+
+    def reflow(self):
+        """
+        根据当前宽度重新计算列数，把多余的宽度平均分给每一列，然后重新排列条目。
+        返回重排耗时（毫秒）。
+        """
+        started = time.perf_counter()
+        grid = QSize(max(self.cell_size.width(), self.viewport().width() // self.columns()), self.cell_size.height())
+        if grid != self.gridSize():
+            self.setGridSize(grid)
+        self.doItemsLayout()
+        return (time.perf_counter() - started) * 1000
+
+    def visible_range(self):
+        """
+        返回 (第一个可见条目, 最后一个可见条目, 每页条目数)。
+        条目大小统一，因此可以直接根据滚动位置算出可见的行号范围。
+        """
+        grid = self.gridSize()
+        cols = max(1, self.viewport().width() // grid.width())
+        rows_per_page = self.viewport().height() // grid.height() + 1
+        first_row = self.verticalScrollBar().value() // grid.height()
+        return first_row * cols, (first_row + rows_per_page + 1) * cols - 1, rows_per_page * cols
+
+    def load_priority(self, row, max_pages=2):
+        """
+        缩略图加载优先级：可见条目为 0，其余按与可见区域的距离（条目数）递增；
+        超出可见区域上下 max_pages 屏的返回 None，表示不需要加载。
+        """
+        if row is None:
+            return None
+        first, last, page = self.visible_range()
+        distance = first - row if row < first else max(0, row - last)
+        if distance > max_pages * page:
+            return None
+        return distance
+
+    def prefetch_near_visible(self):
+        """预取可见区域上下各一屏的缩略图，滚动时新出现的条目已经加载好。"""
+        model = self.model()
+        if model.rowCount() == 0:
+            return
+        first, last, page = self.visible_range()
+        model.prefetch(first - page, last + page)
+
+class PixmapCache:
+    """按字节数限制大小的 QPixmap LRU 缓存（只在GUI线程中使用）。"""
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._pixmaps = collections.OrderedDict()
+        self.total_bytes = 0
+
+    @staticmethod
+    def _cost(pixmap):
+        return pixmap.width() * pixmap.height() * 4
+
+    def get(self, key):
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def __contains__(self, key):
+        return key in self._pixmaps
+
+    def put(self, key, pixmap):
+        old = self._pixmaps.pop(key, None)
+        if old is not None:
+            self.total_bytes -= self._cost(old)
+        self._pixmaps[key] = pixmap
+        self.total_bytes += self._cost(pixmap)
+        while self.total_bytes > self.budget_bytes and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self.total_bytes -= self._cost(evicted)
+
+    def discard(self, key):
+        old = self._pixmaps.pop(key, None)
+        if old is not None:
+            self.total_bytes -= self._cost(old)
+
+    def stats(self):
+        return {"images": len(self._pixmaps), "mb": self.total_bytes / (1024 * 1024)}
+
+class FullImageLoader(QObject, QRunnable):
+    """在后台把整张图片解码为 QImage，用于全屏浏览的预取。"""
+    image_loaded = Signal(str, QImage) # 信号：image_path, QImage
+
+    def __init__(self, image_path):
+        QObject.__init__(self)
+        QRunnable.__init__(self)
+        self.image_path = image_path
+        self.setAutoDelete(True)
+
+    def run(self):
+        self.image_loaded.emit(self.image_path, load_qimage(self.image_path))
+
+class TilePyramid:
+    """
+    一张大图的多分辨率分块金字塔，缓存在磁盘上：第 0 级为原图，之后每级宽高减半，
+    每级切成 TILE_SIZE 大小的图块，以最快压缩级别的 PNG 保存（截图压缩率高，读取一个图块只需几毫秒）。
+    新打开的图片不必等全部图块写完：生成期间金字塔持有已解码的原图，尚未写盘的图块按需从内存中切出。
+    金字塔以 (路径, 修改时间, 大小) 为键，同一张图再次打开时直接复用；缓存总大小受 TILE_CACHE_MB 限制。
+    """
+    def __init__(self, directory, width, height, levels, source=None):
+        self.directory = directory
+        self.width = width
+        self.height = height
+        self.levels = levels # [(宽, 高), ...]，第 0 级为原图尺寸
+        self._source = source # 生成期间持有的已解码原图（RGB），写完后释放
+        self._level_images = {} # 级别 -> 由原图 reduce() 得到的 PIL 图像，只在生成期间存在
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_dir_for(image_path):
+        stat = os.stat(image_path)
+        key = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        return os.path.join(TILE_CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    @classmethod
+    def open_cached(cls, image_path):
+        """返回已缓存的金字塔，不存在时返回 None。"""
+        directory = cls.cache_dir_for(image_path)
+        try:
+            with open(os.path.join(directory, "pyramid.json"), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(directory) # 更新访问时间，清理时最后淘汰
+        return cls(directory, meta["width"], meta["height"], [tuple(level) for level in meta["levels"]])
+
+    @classmethod
+    def create(cls, image_path, image):
+        """
+        由已解码的 PIL 图像创建金字塔，立即可以读取图块；之后调用 build() 把全部图块写入磁盘。
+        image 在 build() 结束之前必须保持可用。
+        """
+        directory = cls.cache_dir_for(image_path)
+        os.makedirs(directory, exist_ok=True)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        levels = [image.size]
+        while max(levels[-1]) > TILE_SIZE:
+            width, height = levels[-1]
+            levels.append((math.ceil(width / 2), math.ceil(height / 2))) # 与 reduce(2 ** 级别) 的结果尺寸一致
+        return cls(directory, image.width, image.height, levels, source=image)
+
+    def build(self):
+        """
+        把尚未写盘的图块全部写入磁盘（从最粗的级别开始，缩小查看时先用到），
+        最后写入预览图和 pyramid.json，并释放内存中的原图。
+        """
+        try:
+            for level in reversed(range(len(self.levels))):
+                cols, rows = self.tile_grid(level)
+                for row in range(rows):
+                    for col in range(cols):
+                        with self._lock:
+                            if not os.path.exists(self._tile_path(level, col, row)):
+                                self._save_tile(level, col, row)
+            with self._lock:
+                self._save(self._level_image(self._preview_level()), os.path.join(self.directory, "preview.png"))
+            with open(os.path.join(self.directory, "pyramid.json"), 'w', encoding='utf-8') as f:
+                json.dump({"width": self.width, "height": self.height, "levels": self.levels}, f)
+        finally:
+            with self._lock:
+                self._source = None
+                self._level_images.clear()
+        self.prune_cache(keep=self.directory)
+
+    def _tile_path(self, level, col, row):
+        return os.path.join(self.directory, f"{level}_{col}_{row}.png")
+
+    def _preview_level(self):
+        """第一个缩小到 TILE_PREVIEW_SIZE 以内的级别，用作预览图。"""
+        return next(level for level, size in enumerate(self.levels) if max(size) <= TILE_PREVIEW_SIZE)
+
+    def _level_image(self, level):
+        # 调用者持有 _lock
+        image = self._level_images.get(level)
+        if image is None:
+            # 直接从原图按 2^级别 缩小，比逐级缩小更快得到预览级别
+            image = self._source if level == 0 else self._source.reduce(2 ** level)
+            self._level_images[level] = image
+        return image
+
+    def _crop_tile(self, level, col, row):
+        # 调用者持有 _lock
+        image = self._level_image(level)
+        return image.crop((col * TILE_SIZE, row * TILE_SIZE,
+                           min(image.width, (col + 1) * TILE_SIZE), min(image.height, (row + 1) * TILE_SIZE)))
+
+    def _save_tile(self, level, col, row):
+        # 调用者持有 _lock
+        tile = self._crop_tile(level, col, row)
+        self._save(tile, self._tile_path(level, col, row))
+        return tile
+
+    @staticmethod
+    def _save(image, path):
+        # 先写临时文件再改名，中途失败不会留下残缺的图块
+        temp_path = path + ".tmp"
+        image.save(temp_path, "PNG", compress_level=1)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def prune_cache(keep=None):
+        """按最近使用的顺序保留金字塔，总大小超过 TILE_CACHE_MB 后的较旧金字塔全部删除。"""
+        try:
+            dirs = [os.path.join(TILE_CACHE_DIR, name) for name in os.listdir(TILE_CACHE_DIR)]
+            dirs.sort(key=os.path.getmtime, reverse=True)
+        except OSError:
+            return
+        budget = TILE_CACHE_MB * 1024 * 1024
+        total = 0
+        for directory in dirs:
+            try:
+                with os.scandir(directory) as entries:
+                    total += sum(entry.stat().st_size for entry in entries)
+            except OSError:
+                continue
+            if total <= budget or directory == keep:
+                continue
+            try:
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+                os.rmdir(directory)
+            except OSError as e:
+                viewer_log.warning("清理图块缓存 %s 失败: %s", directory, e)
+
+    def level_for_scale(self, scale):
+        """选择分辨率不低于屏幕显示所需的最粗一级：缩放比例为 1/2^n 时使用第 n 级。"""
+        if scale >= 1:
+            return 0
+        return min(len(self.levels) - 1, int(math.floor(math.log2(1 / scale))))
+
+    def tile_grid(self, level):
+        width, height = self.levels[level]
+        return math.ceil(width / TILE_SIZE), math.ceil(height / TILE_SIZE)
+
+    def tile_rect(self, level, col, row):
+        """图块在原图（场景）坐标中的矩形。"""
+        width, height = self.levels[level]
+        sx, sy = self.width / width, self.height / height
+        x0, y0 = col * TILE_SIZE, row * TILE_SIZE
+        x1, y1 = min(width, x0 + TILE_SIZE), min(height, y0 + TILE_SIZE)
+        return QRectF(x0 * sx, y0 * sy, (x1 - x0) * sx, (y1 - y0) * sy)
+
+    def load_tile(self, level, col, row):
+        """读取一个图块，返回 QImage（可以在工作线程中调用）。生成期间尚未写盘的图块从内存中切出并顺便写盘。"""
+        path = self._tile_path(level, col, row)
+        with self._lock:
+            if self._source is not None and not os.path.exists(path):
+                try:
+                    tile = self._save_tile(level, col, row)
+                except OSError as e:
+                    viewer_log.warning("写入图块 %s 失败: %s", path, e)
+                    tile = self._crop_tile(level, col, row)
+                return pil_to_qimage(tile)
+        return QImage(path)
+
+    def load_preview(self):
+        """返回预览图：生成期间直接使用内存中的预览级别，否则读取缓存的预览图。"""
+        with self._lock:
+            if self._source is not None:
+                return pil_to_qimage(self._level_image(self._preview_level()))
+        return QImage(os.path.join(self.directory, "preview.png"))
+
+class PyramidLoader(QObject, QRunnable):
+    """
+    在后台准备大图的金字塔：已缓存时直接读取预览；否则先尽快给出预览（JPEG 用 draft 降分辨率解码，
+    其他格式解码后用 reduce() 得到的级别），解码完成后金字塔立即可用，可见区域的图块按需从内存中切出，
+    其余图块随后在本任务中写入磁盘。完整分辨率的像素只在生成期间存在于内存中。
+    """
+    preview_ready = Signal(int, QImage) # 信号：token, 预览图
+    pyramid_ready = Signal(int, object) # 信号：token, TilePyramid（失败时为 None）
+
+    def __init__(self, token, image_path):
+        QObject.__init__(self)
+        QRunnable.__init__(self)
+        self.token = token
+        self.image_path = image_path
+        self.setAutoDelete(True)
+
+    def run(self):
+        try:
+            pyramid = TilePyramid.open_cached(self.image_path)
+            if pyramid is not None:
+                self.preview_ready.emit(self.token, pyramid.load_preview())
+                self.pyramid_ready.emit(self.token, pyramid)
+                return
+            with Image.open(self.image_path) as image:
+                is_jpeg = image.format == "JPEG"
+            if is_jpeg:
+                self.preview_ready.emit(self.token, decode_thumbnail(self.image_path, (TILE_PREVIEW_SIZE, TILE_PREVIEW_SIZE)))
+            with Image.open(self.image_path) as image:
+                image.load()
+                pyramid = TilePyramid.create(self.image_path, image)
+                if not is_jpeg:
+                    self.preview_ready.emit(self.token, pyramid.load_preview())
+                self.pyramid_ready.emit(self.token, pyramid)
+                try:
+                    pyramid.build()
+                except Exception as e:
+                    viewer_log.warning("写入图片 %s 的图块缓存失败: %s", self.image_path, e)
+        except Exception as e:
+            viewer_log.warning("生成图片 %s 的分块金字塔失败: %s", self.image_path, e)
+            self.pyramid_ready.emit(self.token, None)
+
+class TileLoader(QObject, QRunnable):
+    """在后台读取一个图块。"""
+    tile_loaded = Signal(int, int, int, int, QImage) # 信号：token, level, col, row, QImage
+
+    def __init__(self, token, pyramid, level, col, row):
+        QObject.__init__(self)
+        QRunnable.__init__(self)
+        self.token = token
+        self.pyramid = pyramid
+        self.key = (level, col, row)
+        self.setAutoDelete(True)
+
+    def run(self):
+        try:
+            image = self.pyramid.load_tile(*self.key)
+        except Exception as e:
+            viewer_log.warning("读取图块 %s 失败: %s", self.key, e)
+            image = QImage()
+        self.tile_loaded.emit(self.token, *self.key, image)
+
+class TiledImageItem(QGraphicsObject):
+    """
+    全屏视图中的分块图片项。绘制时根据当前缩放选择金字塔级别，只绘制与可见区域相交的图块；
+    尚未加载的图块先用低分辨率预览代替，并通过 request_tile 异步加载。
+    已加载的图块保存在有内存上限的 LRU 中，因此平移、缩放超大图片时内存占用有上限。
+    """
+    def __init__(self, width, height, request_tile, memory_bytes=TILE_MEMORY_MB * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.width = width
+        self.height = height
+        self.request_tile = request_tile # 回调: request_tile(level, col, row)
+        self.memory_bytes = memory_bytes
+        self.preview = None
+        self.pyramid = None
+        self._tiles = collections.OrderedDict() # (level, col, row) -> QPixmap
+        self._tile_bytes = 0
+        self._pending = set()
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption) # 让 paint 得到需要重绘的区域
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.width, self.height)
+
+    def set_preview(self, image):
+        self.preview = QPixmap.fromImage(image)
+        self.update()
+
+    def set_pyramid(self, pyramid):
+        self.pyramid = pyramid
+        self.update()
+
+    def set_tile(self, level, col, row, image):
+        key = (level, col, row)
+        self._pending.discard(key)
+        if image.isNull():
+            return
+        pixmap = QPixmap.fromImage(image)
+        self._tiles[key] = pixmap
+        self._tile_bytes += pixmap.width() * pixmap.height() * 4
+        while self._tile_bytes > self.memory_bytes and len(self._tiles) > 1:
+            _, old = self._tiles.popitem(last=False)
+            self._tile_bytes -= old.width() * old.height() * 4
+        self.update(self.pyramid.tile_rect(level, col, row))
+
+    def paint(self, painter, option, widget=None):
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if self.preview is not None and not self.preview.isNull():
+            sx, sy = self.preview.width() / self.width, self.preview.height() / self.height
+            source = QRectF(exposed.x() * sx, exposed.y() * sy, exposed.width() * sx, exposed.height() * sy)
+            painter.drawPixmap(exposed, self.preview, source)
+        if self.pyramid is None:
+            return
+        scale = option.levelOfDetailFromTransform(painter.worldTransform())
+        level = self.pyramid.level_for_scale(scale)
+        cols, rows = self.pyramid.tile_grid(level)
+        level_w, level_h = self.pyramid.levels[level]
+        tile_w = TILE_SIZE * self.width / level_w
+        tile_h = TILE_SIZE * self.height / level_h
+        first_col, last_col = int(exposed.left() // tile_w), min(cols - 1, int(exposed.right() // tile_w))
+        first_row, last_row = int(exposed.top() // tile_h), min(rows - 1, int(exposed.bottom() // tile_h))
+        for row in range(max(0, first_row), last_row + 1):
+            for col in range(max(0, first_col), last_col + 1):
+                key = (level, col, row)
+                pixmap = self._tiles.get(key)
+                if pixmap is not None:
+                    self._tiles.move_to_end(key)
+                    painter.drawPixmap(self.pyramid.tile_rect(*key), pixmap, QRectF(pixmap.rect()))
+                elif key not in self._pending:
+                    self._pending.add(key)
+                    self.request_tile(*key)
+
+    def stats(self):
+        return {"tiles": len(self._tiles), "mb": self._tile_bytes / (1024 * 1024), "pending": len(self._pending)}
+
+class ViewScreenshotsWindow(QMainWindow):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("查看截图")
+        self.resize(800, 600) # 设置默认大小，但允许用户调整和最大化
+        self.setWindowFlags(Qt.Window)
+
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.main_layout = QVBoxLayout(self.central_widget)
+        self.main_layout.setContentsMargins(20, 20, 20, 20)
+        self.main_layout.setSpacing(15)
+
+        self.setStyleSheet("""
+            QMainWindow {
+                background-color: #f0f2f5; /* 浅灰色背景 */
+            }
+            QLabel {
+                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
+                font-size: 14px;
+                color: #333333; /* 深灰色字体 */
+            }
+            QListView {
+                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
+                background-color: transparent;
+                border: none; /* 移除网格视图的边框 */
+            }
+            QPushButton {
+                background-color: #007bff; /* 蓝色背景 */
+                color: white; /* 白色字体 */
+                border: none;
+                border-radius: 5px; /* 圆角 */
+                padding: 8px 15px; /* 内部填充 */
+                font-family: "Segoe UI", "Helvetica Neue", Arial, sans-serif;
+                font-size: 13px;
+                font-weight: 500;
+            }
+            QPushButton:hover {
+                background-color: #0056b3; /* 悬停时的深蓝色 */
+            }
+            QPushButton:pressed {
+                background-color: #004085; /* 按下时的更深蓝色 */
+            }
+            QGraphicsView {
+                border: none; /* 移除图片查看器的边框 */
+            }
+        """)
+
+        self.stacked_widget = QStackedWidget(self)
+        self.main_layout.addWidget(self.stacked_widget)
+
+        # 文件夹视图
+        self.folders_view_widget = QWidget()
+        self.folders_view_layout = QVBoxLayout(self.folders_view_widget)
+        self.folders_view_layout.setContentsMargins(0, 0, 0, 0)
+        self.folders_view_layout.setSpacing(10)
+
+        # 缩略图调度器：文件夹图标和图片缩略图各自独立计代，切换视图时互不影响
+        self.folder_icon_scheduler = ThumbnailScheduler(
+            viewer_pool, viewer_pool.max_threads(), on_dropped=lambda key: self.folders_model.forget_pending(key), parent=self)
+        self.thumbnail_scheduler = ThumbnailScheduler(
+            viewer_pool, viewer_pool.max_threads(), on_dropped=lambda key: self.images_model.forget_pending(key), parent=self)
+
+        # 文件夹网格：模型/视图结构，只绘制可见的条目
+        self.folders_model = ScreenshotItemModel(self._request_folder_icon, key_index=0, parent=self)
+        self.folders_list_view = ScreenshotGridView(
+            self.folders_model, ThumbnailDelegate(QSize(120, 120), QSize(64, 64), "?", self), parent=self)
+        self.folders_list_view.clicked.connect(
+            lambda index: self.show_images_view(index.data(ScreenshotItemModel.PathRole)))
+        self.folders_list_view.verticalScrollBar().valueChanged.connect(lambda _: self._reprioritize_folder_icons())
+        self.folders_view_layout.addWidget(self.folders_list_view)
+        self.stacked_widget.addWidget(self.folders_view_widget)
+
+        # 图片视图
+        self.images_view_widget = QWidget()
+        self.images_view_layout = QVBoxLayout(self.images_view_widget)
+        self.images_view_layout.setContentsMargins(0, 0, 0, 0)
+        self.images_view_layout.setSpacing(10)
+
+        self.back_button_layout = QHBoxLayout()
+        self.back_button = QPushButton("返回文件夹列表")
+        self.back_button.clicked.connect(self.show_folders_view)
+        self.back_button_layout.addWidget(self.back_button)
+        self.back_button_layout.addStretch()
+        self.images_view_layout.addLayout(self.back_button_layout)
+
+        # 图片网格
+        self.images_model = ScreenshotItemModel(self._request_image_thumbnail, key_index=1, parent=self)
+        self.images_list_view = ScreenshotGridView(
+            self.images_model, ThumbnailDelegate(QSize(220, 190), QSize(*THUMBNAIL_SIZE), "无法加载", self), parent=self)
+        self.images_list_view.clicked.connect(
+            lambda index: self.open_image_fullscreen(index.data(ScreenshotItemModel.PathRole)))
+        self.images_list_view.verticalScrollBar().valueChanged.connect(lambda _: self._reprioritize_image_thumbnails())
+        self.images_view_layout.addWidget(self.images_list_view)
+        self.stacked_widget.addWidget(self.images_view_widget)
+
+        # 全屏图片视图
+        self.fullscreen_image_view_widget = QWidget()
+        self.fullscreen_image_view_layout = QVBoxLayout(self.fullscreen_image_view_widget)
+        self.fullscreen_image_view_layout.setContentsMargins(0, 0, 0, 0)
+        self.fullscreen_image_view_layout.setSpacing(10)
+
+        self.fullscreen_back_button_layout = QHBoxLayout()
+        self.fullscreen_back_button = QPushButton("返回图片列表")
+        self.fullscreen_back_button.clicked.connect(self.show_images_view_from_fullscreen)
+        self.fullscreen_back_button_layout.addWidget(self.fullscreen_back_button)
+        self.fullscreen_back_button_layout.addStretch()
+        self.fullscreen_image_view_layout.addLayout(self.fullscreen_back_button_layout)
+
+        self.fullscreen_graphics_scene = QGraphicsScene()
+        self.fullscreen_graphics_view = QGraphicsView(self.fullscreen_graphics_scene)
+        self.fullscreen_graphics_view.setRenderHint(QPainter.Antialiasing)
+        self.fullscreen_graphics_view.setRenderHint(QPainter.SmoothPixmapTransform)
+        # 移除QPainter.HighQualityAntialiasing，因为它在PySide6中不存在
+        self.fullscreen_graphics_view.setDragMode(QGraphicsView.ScrollHandDrag) # 允许拖动
+        self.fullscreen_graphics_view.setTransformationAnchor(QGraphicsView.AnchorUnderMouse) # 鼠标下缩放
+        self.fullscreen_graphics_view.setResizeAnchor(QGraphicsView.AnchorUnderMouse) # 鼠标下调整大小
+
+        self.fullscreen_image_view_layout.addWidget(self.fullscreen_graphics_view)
+        self.stacked_widget.addWidget(self.fullscreen_image_view_widget)
+
+        # 全屏浏览：左右方向键切换上一张/下一张，相邻图片在后台预取
+        for key, step in ((Qt.Key_Left, -1), (Qt.Key_Right, 1)):
+            shortcut = QShortcut(QKeySequence(key), self.fullscreen_image_view_widget)
+            shortcut.setContext(Qt.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(lambda step=step: self.step_fullscreen_image(step))
+        self.fullscreen_cache = PixmapCache(gui_app.FULLSCREEN_CACHE_MB * 1024 * 1024)
+        self.fullscreen_loading = set() # 正在后台解码的图片路径
+        self.current_image_path = ""
+        self.current_image_index = -1
+        self.fullscreen_direction = 1 # 最近一次浏览的方向，决定预取哪一侧
+
+        self.current_image_pixmap_item = None
+        self.tiled_item = None # 超大图片使用的分块图片项
+        self.tiled_token = 0 # 每打开一张图片加一，用于丢弃旧图片的后台加载结果
+
+        # 新增：存储文件夹和图片数据
+        self.folder_items_data = []
+        self.image_items_data = []
+        self.current_folder_path = "" # 确保这个变量被初始化
+
+        # 信号连接现在在每次创建IconLoader和ImageThumbnailLoader实例时进行，
+        # 因此不再需要在这里创建临时的signal_proxy。
+
+        # 延迟重新布局的定时器
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(200) # 200毫秒延迟
+        self.resize_timer.timeout.connect(self._deferred_reflow_grid)
+        self.reflow_time = LatencyStats("网格重排耗时")
+
+        # 截图库变化：应用内截图由截图库目录直接通知，程序外的改动由文件系统监视触发单个文件夹的扫描
+        self.library_feed = LibraryChangeFeed(self._apply_library_changes, parent=self)
+        library_change_listeners.append(self.library_feed.notify)
+        self.watched_root = ""
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self._on_directory_changed)
+        self._dirty_dirs = set()
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(300) # 合并同一批文件写入产生的多次目录变化
+        self.watch_timer.timeout.connect(self._reconcile_dirty_dirs)
+
+        self.load_screenshot_folders() # 初始加载文件夹视图
+        self.show_folders_view() # 默认显示文件夹视图
+
+    def _request_folder_icon(self, folder_name, name, folder_path):
+        # 提交图标加载任务到调度器，可见的文件夹优先
+        def make_loader():
+            loader = IconLoader(folder_name)
+            # 必须在IconLoader实例上连接信号，而不是在类上
+            loader.icon_loaded.connect(self._update_folder_icon)
+            return loader
+        priority = self.folders_list_view.load_priority(self.folders_model.row_of(folder_name))
+        self.folder_icon_scheduler.submit(folder_name, make_loader, 0 if priority is None else priority)
+
+    def _request_image_thumbnail(self, image_path, name, path):
+        # 提交缩略图加载任务到调度器，可见的图片优先
+        def make_loader():
+            loader = ImageThumbnailLoader(image_path, QSize(*THUMBNAIL_SIZE))
+            # 必须在ImageThumbnailLoader实例上连接信号，而不是在类上
+            loader.thumbnail_loaded.connect(self._update_image_thumbnail)
+            return loader
+        priority = self.images_list_view.load_priority(self.images_model.row_of(image_path))
+        self.thumbnail_scheduler.submit(image_path, make_loader, 0 if priority is None else priority)
+
+    def _reprioritize_folder_icons(self):
+        self.folder_icon_scheduler.reprioritize(
+            lambda key: self.folders_list_view.load_priority(self.folders_model.row_of(key)))
+
+    def _reprioritize_image_thumbnails(self):
+        self.thumbnail_scheduler.reprioritize(
+            lambda key: self.images_list_view.load_priority(self.images_model.row_of(key)))
+
+    def _update_folder_icon(self, folder_name, icon):
+        """槽函数：接收异步加载的图标并更新模型。"""
+        self.folders_model.set_thumbnail(folder_name, None if icon.isNull() else icon.pixmap(QSize(64, 64)))
+
+    def _update_image_thumbnail(self, image_path, image):
+        """槽函数：接收异步加载的缩略图并更新模型。QPixmap 只能在GUI线程中创建。"""
+        self.images_model.set_thumbnail(image_path, QPixmap.fromImage(image))
+
+    def show_folders_view(self):
+        self.setWindowTitle("查看截图")
+        self.stacked_widget.setCurrentWidget(self.folders_view_widget)
+        # 只有在第一次显示或需要强制刷新时才加载文件夹，避免反复切换时的重复加载
+        self.thumbnail_scheduler.reset() # 离开图片视图，未完成的缩略图任务作废
+        if not self.folder_items_data: # 或者可以添加一个标志位 self._folders_loaded = False
+            self.load_screenshot_folders()
+        else:
+            self.folders_list_view.reflow() # 窗口大小可能在其他视图中改变过
+            self._watch_directories() # 不再监视之前打开的文件夹
+
+    def show_images_view_from_fullscreen(self):
+        # 从全屏图片视图返回到图片列表视图
+        self.setWindowTitle(f"查看截图 - {os.path.basename(self.current_folder_path)}")
+        self.stacked_widget.setCurrentWidget(self.images_view_widget)
+        # 不需要重新加载图片，因为current_folder_path已经设置，并且图片列表应该还在
+        self.images_list_view.reflow() # 窗口大小可能在全屏视图中改变过
+
+    # 新增：用于重新填充文件夹网格的方法
+    def _repopulate_folders_grid(self):
+        self.folder_icon_scheduler.reset()
+        self.folders_model.set_items(self.folder_items_data)
+        self.folders_list_view.reflow()
+        self.folders_list_view.prefetch_near_visible()
+
+    # 新增：用于重新填充图片网格的方法
+    def _repopulate_images_grid(self):
+        self.thumbnail_scheduler.reset() # 上一个文件夹的缩略图任务作废，新文件夹的缩略图立即开始加载
+        self.images_model.set_items(self.image_items_data)
+        self.images_list_view.scrollToTop()
+        self.images_list_view.reflow()
+        self.images_list_view.prefetch_near_visible()
+
+    def _deferred_reflow_grid(self):
+        """
+        延迟执行的网格重排方法，由定时器触发。
+        只重新计算列数和条目位置，已加载的缩略图保留，不会提交新的解码任务。
+        """
+        if self.stacked_widget.currentWidget() == self.folders_view_widget:
+            view = self.folders_list_view
+        elif self.stacked_widget.currentWidget() == self.images_view_widget:
+            view = self.images_list_view
+        else:
+            return
+        elapsed_ms = view.reflow()
+        self.reflow_time.record(elapsed_ms)
+        if viewer_log.isEnabledFor(logging.DEBUG):
+            viewer_log.debug("网格重排: %s 项, %s 列, 耗时 %.1fms", view.model().rowCount(), view.columns(), elapsed_ms)
+        view.prefetch_near_visible() # 窗口变大时补充新露出的条目
+        if view is self.folders_list_view:
+            self._reprioritize_folder_icons()
+        else:
+            self._reprioritize_image_thumbnails()
+
+    def load_screenshot_folders(self):
+        # 优先查询截图库目录，只有目录不可用时才遍历文件系统
+        catalog = get_library_catalog()
+        if catalog is not None:
+            self.folder_items_data = catalog.folders()
+            self.reconcile_library()
+        else:
+            self.folder_items_data = self._list_folders_from_disk()
+        viewer_log.debug("识别到的截图文件夹: %s 个", len(self.folder_items_data))
+        self._repopulate_folders_grid() # 初始加载时立即填充网格
+        self._watch_directories()
+
+    def _list_folders_from_disk(self):
+        screenshot_base_dir = get_screenshot_base_dir()
+        viewer_log.debug("截图根目录: %s", screenshot_base_dir)
+        folders = [f for f in os.listdir(screenshot_base_dir)
+                   if os.path.isdir(os.path.join(screenshot_base_dir, f)) and not f.startswith('.')]
+        return [(folder_name, os.path.join(screenshot_base_dir, folder_name)) for folder_name in sorted(folders)]
+
+    def reconcile_library(self):
+        """在后台扫描截图根目录，补齐程序外的改动；变化通过 library_feed 增量更新网格。"""
+        catalog = get_library_catalog()
+        if catalog is not None:
+            maintenance_pool.start(catalog.reconcile)
+
+    def _watch_directories(self):
+        """监视截图根目录（文件夹增删）和当前打开的文件夹（文件增删）。"""
+        root = get_screenshot_base_dir()
+        wanted = {root}
+        if self.current_folder_path and self.stacked_widget.currentWidget() != self.folders_view_widget:
+            wanted.add(self.current_folder_path)
+        watched = set(self.fs_watcher.directories())
+        if watched - wanted:
+            self.fs_watcher.removePaths(list(watched - wanted))
+        for path in wanted - watched:
+            if os.path.isdir(path):
+                self.fs_watcher.addPath(path)
+        self.watched_root = root
+
+    def _on_directory_changed(self, path):
+        self._dirty_dirs.add(path)
+        self.watch_timer.start()
+
+    def _reconcile_dirty_dirs(self):
+        catalog = get_library_catalog()
+        dirty, self._dirty_dirs = self._dirty_dirs, set()
+        if catalog is None:
+            return
+        for path in dirty:
+            if os.path.normcase(path) == os.path.normcase(self.watched_root):
+                maintenance_pool.start(catalog.reconcile)
+            else:
+                maintenance_pool.start(lambda folder=os.path.basename(path): catalog.reconcile_folder(folder))
+        self._watch_directories() # 被删除后重建的目录需要重新加入监视
+
+    def _apply_library_changes(self, folders, files):
+        """
+        槽函数：把合并后的截图库变化增量应用到网格，只插入或删除变化的条目，
+        不重建模型，已加载的缩略图保持不变。
+        """
+        root = get_screenshot_base_dir()
+        self.folders_model.apply_changes(
+            [(name, os.path.join(root, name)) for name, kind in folders.items() if kind == "folder_added"],
+            [name for name, kind in folders.items() if kind == "folder_removed"])
+        self.folder_items_data = self.folders_model.items()
+
+        current = os.path.basename(self.current_folder_path) if self.current_folder_path else None
+        if current is None:
+            return
+        if folders.get(current) == "folder_removed":
+            self.images_model.apply_changes([], [path for _, path in self.image_items_data])
+        else:
+            # "changed" 合并时可能覆盖了同一批中的 "added"，因此也按新增处理；模型中已有的条目只刷新
+            added = [(filename, os.path.join(self.current_folder_path, filename))
+                     for (folder, filename), kind in files.items() if folder == current and kind in ("added", "changed")]
+            removed = [os.path.join(self.current_folder_path, filename)
+                       for (folder, filename), kind in files.items() if folder == current and kind == "removed"]
+            if not added and not removed:
+                return
+            # 已在网格中的文件（内容变化，或被删除后重新写入）需要丢弃旧的缩略图和全屏缓存
+            changed = [path for _, path in added if self.images_model.row_of(path) is not None]
+            store = get_thumbnail_store() if changed else None
+            for path in changed:
+                if store is not None:
+                    store.remove(path)
+                self.fullscreen_cache.discard(path)
+            self.images_model.apply_changes(added, removed, changed)
+            viewer_log.debug("查看窗口增量更新: 新增 %s 张, 变化 %s 张, 删除 %s 张",
+                             len(added) - len(changed), len(changed), len(removed))
+        self.image_items_data = self.images_model.items()
+        if self.stacked_widget.currentWidget() == self.images_view_widget:
+            self.images_list_view.prefetch_near_visible()
+
+    def show_images_view(self, folder_path):
+        self.current_folder_path = folder_path
+        self.setWindowTitle(f"查看截图 - {os.path.basename(folder_path)}")
+        self.stacked_widget.setCurrentWidget(self.images_view_widget)
+        self.load_images_for_folder(folder_path)
+        self._watch_directories()
+
+    def load_images_for_folder(self, folder_path):
+        viewer_log.debug("当前图片文件夹路径: %s", folder_path)
+        catalog = get_library_catalog()
+        if catalog is not None:
+            self.image_items_data = catalog.images(os.path.basename(folder_path))
+            # 未监视期间在程序外的改动，扫描后通过 library_feed 增量补上
+            maintenance_pool.start(lambda: catalog.reconcile_folder(os.path.basename(folder_path)))
+        else:
+            image_files = [f for f in os.listdir(folder_path) if is_library_image(f)]
+            self.image_items_data = [(image_name, os.path.join(folder_path, image_name)) for image_name in sorted(image_files)]
+        viewer_log.debug("识别到的图片文件: %s 个", len(self.image_items_data))
+        self._repopulate_images_grid() # 初始加载时立即填充网格
+
+    def open_image_fullscreen(self, image_path):
+        self.current_image_index = self._index_of_image(image_path)
+        self._show_fullscreen_image(image_path)
+
+    def _index_of_image(self, image_path):
+        return next((i for i, (_, path) in enumerate(self.image_items_data) if path == image_path), -1)
+
+    def step_fullscreen_image(self, step):
+        """切换到图片列表中的上一张（step=-1）或下一张（step=1）。"""
+        if self.stacked_widget.currentWidget() != self.fullscreen_image_view_widget or not self.image_items_data:
+            return
+        # 全屏期间图片列表可能被增量更新，按路径重新定位当前图片
+        current = self._index_of_image(self.current_image_path)
+        index = (current if current >= 0 else self.current_image_index) + step
+        if not 0 <= index < len(self.image_items_data):
+            return
+        self.fullscreen_direction = 1 if step > 0 else -1
+        self.current_image_index = index
+        self._show_fullscreen_image(self.image_items_data[index][1])
+
+    def _clear_fullscreen_scene(self):
+        # 清除旧的图片
+        self.fullscreen_graphics_scene.clear()
+        self.current_image_pixmap_item = None
+        self.tiled_item = None
+        self.tiled_token += 1 # 之前图片的后台任务结果作废
+
+    def _show_fullscreen_image(self, image_path):
+        """
+        显示一张图片：已预取的直接显示；否则先用缩略图放大占位，后台解码完成后替换。
+        超大图片走分块显示。之后预取相邻的图片。
+        """
+        self.current_image_path = image_path
+        self._clear_fullscreen_scene()
+        self.stacked_widget.setCurrentWidget(self.fullscreen_image_view_widget)
+        position = f" ({self.current_image_index + 1}/{len(self.image_items_data)})" if self.current_image_index >= 0 else ""
+
+        size = QImageReader(image_path).size() # 只读取文件头
+        if size.isValid() and size.width() * size.height() >= TILED_VIEW_MIN_PIXELS:
+            # 超大图片：先显示低分辨率预览，再按需加载可见区域的图块
+            self.tiled_item = TiledImageItem(size.width(), size.height(), self._request_tile)
+            self.fullscreen_graphics_scene.addItem(self.tiled_item)
+            self.fullscreen_graphics_scene.setSceneRect(self.tiled_item.boundingRect())
+            self.fullscreen_graphics_view.fitInView(self.tiled_item, Qt.KeepAspectRatio)
+            loader = PyramidLoader(self.tiled_token, image_path)
+            loader.preview_ready.connect(self._on_tiled_preview_ready)
+            loader.pyramid_ready.connect(self._on_pyramid_ready)
+            viewer_pool.start(loader)
+            self.setWindowTitle(f"查看截图 - {os.path.basename(image_path)} ({size.width()}x{size.height()}){position}")
+        else:
+            self.setWindowTitle(f"查看截图 - {os.path.basename(image_path)}{position}")
+            pixmap = self.fullscreen_cache.get(image_path)
+            if pixmap is not None:
+                self._display_fullscreen_pixmap(pixmap)
+            else:
+                thumbnail = self.images_model.cached_thumbnail(image_path)
+                if thumbnail is not None and size.isValid():
+                    self._display_fullscreen_pixmap(thumbnail, size)
+                self._load_full_image(image_path)
+        self._prefetch_fullscreen_neighbours()
+
+    def _display_fullscreen_pixmap(self, pixmap, size=None):
+        """显示一张 pixmap；size 不为空时表示这是缩略图占位，放大到原图尺寸显示。"""
+        self.fullscreen_graphics_scene.clear()
+        self.current_image_pixmap_item = self.fullscreen_graphics_scene.addPixmap(pixmap)
+        # 明确设置QGraphicsPixmapItem的变换模式为平滑
+        self.current_image_pixmap_item.setTransformationMode(Qt.SmoothTransformation)
+        if size is not None:
+            self.current_image_pixmap_item.setScale(size.width() / max(1, pixmap.width()))
+        self.fullscreen_graphics_scene.setSceneRect(self.current_image_pixmap_item.sceneBoundingRect())
+        self.fullscreen_graphics_view.fitInView(self.current_image_pixmap_item, Qt.KeepAspectRatio) # 适应视图大小
+
+    def _load_full_image(self, image_path):
+        if image_path in self.fullscreen_loading or image_path in self.fullscreen_cache:
+            return
+        self.fullscreen_loading.add(image_path)
+        loader = FullImageLoader(image_path)
+        loader.image_loaded.connect(self._on_full_image_loaded)
+        viewer_pool.start(loader)
+
+    def _prefetch_fullscreen_neighbours(self):
+        """按浏览方向预取后面 FULLSCREEN_PREFETCH_AHEAD 张和反方向 1 张（超大图片除外）。"""
+        if self.current_image_index < 0:
+            return
+        offsets = [self.fullscreen_direction * i for i in range(1, gui_app.FULLSCREEN_PREFETCH_AHEAD + 1)]
+        offsets.append(-self.fullscreen_direction)
+        for offset in offsets:
+            index = self.current_image_index + offset
+            if 0 <= index < len(self.image_items_data):
+                path = self.image_items_data[index][1]
+                size = QImageReader(path).size()
+                if size.isValid() and size.width() * size.height() < TILED_VIEW_MIN_PIXELS:
+                    self._load_full_image(path)
+
+    def _on_full_image_loaded(self, image_path, image):
+        """槽函数：后台解码完成，在GUI线程中转换为 QPixmap 放入缓存；如果正是当前图片则立即显示。"""
+        self.fullscreen_loading.discard(image_path)
+        if image.isNull():
+            if image_path == self.current_image_path and self.stacked_widget.currentWidget() == self.fullscreen_image_view_widget:
+                # 如果图片加载失败，显示错误信息并返回到图片列表
+                QMessageBox.warning(self, "加载图片失败", f"无法加载图片: {os.path.basename(image_path)}")
+                viewer_log.warning("全屏显示图片 %s 失败：无法加载。", image_path)
+                self.show_images_view(self.current_folder_path) # 返回到图片列表
+            return
+        pixmap = QPixmap.fromImage(image)
+        self.fullscreen_cache.put(image_path, pixmap)
+        if image_path == self.current_image_path and self.tiled_item is None:
+            self._display_fullscreen_pixmap(pixmap)
+
+    def _request_tile(self, level, col, row):
+        if self.tiled_item is None or self.tiled_item.pyramid is None:
+            return
+        loader = TileLoader(self.tiled_token, self.tiled_item.pyramid, level, col, row)
+        loader.tile_loaded.connect(self._on_tile_loaded)
+        viewer_pool.start(loader)
+
+    def _on_tiled_preview_ready(self, token, image):
+        if token == self.tiled_token and self.tiled_item is not None:
+            self.tiled_item.set_preview(image)
+
+    def _on_pyramid_ready(self, token, pyramid):
+        if token != self.tiled_token or self.tiled_item is None:
+            return
+        if pyramid is None:
+            QMessageBox.warning(self, "加载图片失败", "无法生成分块图片。")
+            return
+        self.tiled_item.set_pyramid(pyramid)
+
+    def _on_tile_loaded(self, token, level, col, row, image):
+        if token == self.tiled_token and self.tiled_item is not None:
+            self.tiled_item.set_tile(level, col, row, image)
+
+    def wheelEvent(self, event):
+        # 仅在全屏图片视图激活时处理滚轮事件
+        if self.stacked_widget.currentWidget() == self.fullscreen_image_view_widget:
+            if event.modifiers() & Qt.ShiftModifier:
+                # 按住Shift滚动切换上一张/下一张
+                delta = event.angleDelta().y() or event.angleDelta().x() # 部分平台按住Shift时滚动方向变为水平
+                self.step_fullscreen_image(-1 if delta > 0 else 1)
+                return
+            zoom_factor = 1.15 # 每次缩放的因子
+            if event.angleDelta().y() > 0:
+                # 向上滚动，放大
+                self.fullscreen_graphics_view.scale(zoom_factor, zoom_factor)
+            else:
+                # 向下滚动，缩小
+                self.fullscreen_graphics_view.scale(1 / zoom_factor, 1 / zoom_factor)
+        else:
+            super().wheelEvent(event) # 如果不在全屏视图，将事件传递给父类
+
+    def resizeEvent(self, event):
+        """
+        当窗口大小改变时，启动或重置定时器，延迟重新布局网格。
+        """
+        super().resizeEvent(event)
+        self.resize_timer.start() # 启动或重置定时器
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""CaptureContext 的资源缓存和帧缓冲池，使用假后端测试，不需要显示器。"""
+import pytest
+
+from capture_engine import CaptureContext, CaptureFrame, FakeCaptureBackend, MonitorInfo
+
+class CountingBackend(FakeCaptureBackend):
+    """记录抓取资源的创建和释放次数的假后端。"""
+    def __init__(self, monitors=None):
+        super().__init__(monitors)
+        self.created = 0
+        self.released = 0
+
+    def create_surface(self, monitor):
+        self.created += 1
+        return super().create_surface(monitor)
+
+    def release_surface(self, surface):
+        self.released += 1
+
+def make_context(monitors=None):
+    backend = CountingBackend(monitors or [MonitorInfo(0, 0, 64, 48, "FAKE1")])
+    return backend, CaptureContext(backend)
+
+def grab_and_release(context, x=0, y=0):
+    buffer, allocated, monitor = context.grab_at(x, y)
+    context.buffer_pool.release(buffer)
+    return buffer, allocated, monitor
+
+def test_surfaces_are_reused_across_grabs():
+    backend, context = make_context()
+    for _ in range(5):
+        grab_and_release(context)
+    assert backend.grabs == 5
+    assert backend.created == 1
+    assert backend.released == 0
+    assert context.rebuild_count == 1
+
+def test_topology_change_rebuilds_surfaces():
+    backend, context = make_context()
+    grab_and_release(context)
+    backend.monitors = [MonitorInfo(0, 0, 64, 48, "FAKE1"), MonitorInfo(64, 0, 32, 24, "FAKE2")]
+    buffer, _, monitor = grab_and_release(context, 70, 0)
+    assert context.rebuild_count == 2
+    assert backend.released == 1 # 旧布局的资源已释放
+    assert backend.created == 2
+    assert monitor.name == "FAKE2"
+    assert buffer.size == (32, 24)
+    assert len(context.monitors()) == 2
+
+def test_invalidate_forces_rebuild():
+    backend, context = make_context()
+    grab_and_release(context)
+    context.invalidate()
+    assert backend.released == 1
+    grab_and_release(context)
+    assert context.rebuild_count == 2
+    assert backend.created == 2
+
+def test_failed_grab_rebuilds_surface_once():
+    backend, context = make_context()
+    grab_and_release(context)
+    grab = backend.grab
+    calls = []
+    def flaky_grab(surface, monitor, buffer):
+        calls.append(surface)
+        if len(calls) == 1:
+            raise OSError("资源已失效")
+        grab(surface, monitor, buffer)
+    backend.grab = flaky_grab
+    grab_and_release(context)
+    assert len(calls) == 2
+    assert backend.released == 1
+    assert backend.created == 2
+
+def test_pool_buffers_return_after_frame_release():
+    backend, context = make_context()
+    pool = context.buffer_pool
+    buffers = []
+    for _ in range(3):
+        buffer, allocated, _ = context.grab_at(0, 0)
+        frame = CaptureFrame("test", ".", "test.png")
+        frame.set_buffer(buffer, pool, allocated)
+        buffers.append(buffer)
+        assert pool.stats()["outstanding"] == 1
+        frame.release()
+        assert pool.stats()["outstanding"] == 0
+    stats = pool.stats()
+    assert stats["allocations"] == 1
+    assert stats["reuses"] == 2
+    assert all(buffer is buffers[0] for buffer in buffers)
+
+def test_failed_grab_returns_buffer_to_pool():
+    backend, context = make_context()
+    def broken_grab(surface, monitor, buffer):
+        raise OSError("无法抓取")
+    backend.grab = broken_grab
+    with pytest.raises(OSError):
+        context.grab_at(0, 0)
+    assert context.buffer_pool.stats()["outstanding"] == 0
+
+def test_grab_all_returns_buffers_to_pool():
+    monitors = [MonitorInfo(0, 0, 64, 48, "FAKE1"), MonitorInfo(64, 0, 32, 24, "FAKE2")]
+    backend, context = make_context(monitors)
+    try:
+        grabbed = context.grab_all()
+        assert [monitor.name for _, _, monitor in grabbed] == ["FAKE1", "FAKE2"]
+        assert context.buffer_pool.stats()["outstanding"] == 2
+        for buffer, _, _ in grabbed:
+            context.buffer_pool.release(buffer)
+        context.grab_all()
+        assert backend.created == 2 # 第二次并行抓取复用已有资源
+    finally:
+        context.close()
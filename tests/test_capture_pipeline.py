@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""截图流水线的背压和停止，使用假后端抓取的帧，不需要显示器。"""
+import os
+import threading
+
+from capture_engine import (
+    CaptureContext, CaptureFrame, CapturePipeline, FakeCaptureBackend, MonitorInfo, OutputFormat,
+    build_output_format,
+)
+
+class FailingFormat(OutputFormat):
+    """写出一部分数据后失败，模拟磁盘写满。"""
+    def __init__(self):
+        super().__init__("png", ".png", "PNG")
+
+    def save(self, image, filename):
+        filename.write(b"\x89PNG partial")
+        raise OSError("磁盘已满")
+
+def make_frame(context, tmp_path, index, output_format=None):
+    buffer, allocated, _ = context.grab_at(0, 0)
+    output_format = output_format or build_output_format("raw")
+    frame = CaptureFrame("test", str(tmp_path), str(tmp_path / f"{index}{output_format.extension}"),
+                         output_format=output_format)
+    frame.set_buffer(buffer, context.buffer_pool, allocated)
+    return frame
+
+def test_blocked_submit_fails_when_pipeline_stops(tmp_path):
+    context = CaptureContext(FakeCaptureBackend([MonitorInfo(0, 0, 32, 24, "FAKE1")]))
+    release_worker = threading.Event()
+    worker_busy = threading.Event()
+
+    def on_saved(frame):
+        worker_busy.set()
+        release_worker.wait(5)
+
+    pipeline = CapturePipeline(queue_size=1, policy="block", workers=1, on_saved=on_saved)
+    pipeline.start()
+    try:
+        assert pipeline.submit(make_frame(context, tmp_path, 0)) # 由工作线程处理，卡在 on_saved 中
+        assert worker_busy.wait(5)
+        assert pipeline.submit(make_frame(context, tmp_path, 1)) # 占满队列
+
+        blocked = make_frame(context, tmp_path, 2)
+        result = []
+        submitter = threading.Thread(target=lambda: result.append(pipeline.submit(blocked)))
+        submitter.start()
+        submitter.join(0.2)
+        assert submitter.is_alive() # 队列已满，block 策略下等待空位
+
+        stopper = threading.Thread(target=pipeline.stop, kwargs={"timeout": 0.2})
+        stopper.start()
+        submitter.join(5)
+        assert result == [False] # 等待期间流水线停止，不能再入队
+        blocked.release()
+    finally:
+        release_worker.set()
+        stopper.join(5)
+    assert pipeline.stats()["saved"] == 2
+    assert context.buffer_pool.stats()["outstanding"] == 0
+
+def test_failed_encode_leaves_no_partial_file(tmp_path):
+    context = CaptureContext(FakeCaptureBackend([MonitorInfo(0, 0, 32, 24, "FAKE1")]))
+    pipeline = CapturePipeline(queue_size=2, workers=1)
+    pipeline.start()
+    assert pipeline.submit(make_frame(context, tmp_path, 0, FailingFormat()))
+    assert pipeline.submit(make_frame(context, tmp_path, 1))
+    pipeline.stop()
+    assert pipeline.stats()["failed"] == 1
+    assert sorted(os.listdir(tmp_path)) == ["1.raw.bmp"] # 失败的截图没有留下文件，也没有残留临时文件
+    assert context.buffer_pool.stats()["outstanding"] == 0
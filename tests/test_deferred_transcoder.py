@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""raw 快速转储的后台转码。"""
+from PIL import Image
+
+from capture_engine import RAW_DUMP_SUFFIX, DeferredTranscoder
+
+def write_dump(directory, name):
+    path = directory / (name + RAW_DUMP_SUFFIX)
+    Image.new("RGB", (16, 8), (10, 20, 30)).save(path, "BMP")
+    return str(path)
+
+def test_dumps_are_transcoded_to_png(tmp_path):
+    done = []
+    transcoder = DeferredTranscoder(compress_level=1, on_transcoded=lambda old, new: done.append((old, new)))
+    path = write_dump(tmp_path, "a")
+    transcoder.start()
+    transcoder.enqueue(path)
+    transcoder.stop(drain=True)
+    png = str(tmp_path / "a.png")
+    assert done == [(path, png)]
+    assert not (tmp_path / ("a" + RAW_DUMP_SUFFIX)).exists()
+    with Image.open(png) as image:
+        assert image.size == (16, 8)
+
+def test_callback_error_does_not_stop_the_transcoder(tmp_path):
+    calls = []
+    def on_transcoded(old, new):
+        calls.append(new)
+        if len(calls) == 1:
+            raise FileNotFoundError(new) # 例如文件刚被用户移走
+    transcoder = DeferredTranscoder(compress_level=1, on_transcoded=on_transcoded)
+    transcoder.start()
+    for name in ("a", "b"):
+        transcoder.enqueue(write_dump(tmp_path, name))
+    transcoder.stop(drain=True)
+    assert transcoder.transcoded == 2
+    assert len(calls) == 2
+    assert (tmp_path / "b.png").exists()
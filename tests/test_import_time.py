@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""启动路径的导入耗时预算（benchmarks/check_import_time.py）。较慢的机器可以设置 IMPORT_BUDGET_SCALE=1.5 放宽预算。"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import check_import_time
+
+@pytest.mark.parametrize("module", sorted(check_import_time.TARGETS))
+def test_import_budget(module):
+    budget_ms, forbidden, stubs = check_import_time.TARGETS[module]
+    scale = float(os.environ.get("IMPORT_BUDGET_SCALE", "1.0"))
+    assert check_import_time.check(module, budget_ms * scale, forbidden, stubs, runs=5)
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""延迟统计的百分位数。"""
+import pytest
+
+from capture_engine import LatencyStats, percentile
+
+@pytest.mark.parametrize("samples", [[5.0], [1.0, 9.0], [3.0, 1.0, 2.0], [4.0, 1.0, 3.0, 2.0], list(range(100, 0, -1))])
+def test_summary_uses_the_same_percentile_for_every_rank(samples):
+    stats = LatencyStats("测试")
+    for value in samples:
+        stats.record(value)
+    summary = stats.summary()
+    ordered = sorted(samples)
+    assert summary["p50"] == percentile(ordered, 0.5)
+    assert summary["p95"] == percentile(ordered, 0.95)
+    assert summary["p50"] <= summary["p95"] <= summary["p99"] <= summary["max"] == ordered[-1]
+
+def test_empty_summary():
+    assert LatencyStats("测试").summary() == {"count": 0}
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""截图库目录的扫描和变化通知。"""
+from PIL import Image
+
+from capture_engine import LIBRARY_DB_NAME, LibraryCatalog
+
+def test_rewritten_file_is_reported_as_changed(tmp_path):
+    folder = tmp_path / "notepad.exe"
+    folder.mkdir()
+    image_path = folder / "a.png"
+    Image.new("RGB", (16, 8)).save(image_path)
+    changes = []
+    catalog = LibraryCatalog(str(tmp_path / LIBRARY_DB_NAME),
+                             on_change=lambda kind, folder, filename: changes.append((kind, folder, filename)))
+    try:
+        catalog.reconcile_folder("notepad.exe")
+        assert changes == [("added", "notepad.exe", "a.png")]
+
+        changes.clear()
+        catalog.reconcile_folder("notepad.exe") # 没有变化时不通知
+        assert changes == []
+
+        Image.new("RGB", (32, 24), (200, 10, 10)).save(image_path) # 原地重写，大小变化
+        catalog.reconcile_folder("notepad.exe")
+        assert changes == [("changed", "notepad.exe", "a.png")]
+        assert catalog.images("notepad.exe") == [("a.png", str(image_path))]
+    finally:
+        catalog.close()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""快门音效服务：通过 null 输出测试合并、限速和计数，不需要声卡。"""
+import sys
+import time
+import wave
+
+import pytest
+
+from capture_engine import NullSoundBackend, SoundPlayer, create_sound_backend
+
+@pytest.fixture
+def wav_path(tmp_path):
+    path = tmp_path / "shutter.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(b"\0\0" * 800)
+    return path
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+def test_plays_through_null_backend(wav_path):
+    backend = NullSoundBackend()
+    player = SoundPlayer(str(wav_path), backend=backend, min_interval=0)
+    try:
+        assert player.play()
+        assert wait_until(lambda: player.stats()["played"] == 1)
+        stats = player.stats()
+        assert stats == {"played": 1, "coalesced": 0, "failed": 0, "backend": NullSoundBackend.name}
+        assert backend.plays == 1
+        assert backend.wav_bytes == wav_path.stat().st_size # WAV 只读取一次，原样交给输出
+        assert player.trigger_latency.summary()["count"] == 1
+    finally:
+        player.stop()
+
+def test_requests_are_coalesced_and_rate_limited(wav_path):
+    backend = NullSoundBackend(duration=0.05)
+    player = SoundPlayer(str(wav_path), backend=backend, min_interval=0.2)
+    try:
+        requests = 40
+        started = time.perf_counter()
+        accepted = 0
+        for _ in range(requests):
+            accepted += player.play()
+            time.sleep(0.005)
+        assert wait_until(lambda: player.stats()["played"] == accepted)
+        elapsed = time.perf_counter() - started
+        stats = player.stats()
+        assert stats["coalesced"] == requests - accepted # 已有请求等待播放时，新请求被合并
+        assert stats["played"] == backend.plays
+        # 两次播放的开始时间至少相隔 min_interval
+        assert 1 <= stats["played"] <= int(elapsed / player.min_interval) + 1
+        assert stats["failed"] == 0
+    finally:
+        player.stop()
+
+def test_failed_plays_are_counted(wav_path):
+    class FailingBackend(NullSoundBackend):
+        def play(self):
+            raise OSError("设备不可用")
+
+    player = SoundPlayer(str(wav_path), backend=FailingBackend(), min_interval=0)
+    try:
+        player.play()
+        assert wait_until(lambda: player.stats()["failed"] == 1)
+        assert player.stats()["played"] == 0
+    finally:
+        player.stop()
+
+def test_missing_file_makes_player_unavailable(tmp_path):
+    player = SoundPlayer(str(tmp_path / "missing.wav"), backend=NullSoundBackend())
+    try:
+        player.start()
+        assert wait_until(lambda: player.play() is False)
+        assert player.stats()["played"] == 0
+    finally:
+        player.stop()
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Windows 上默认使用真实的音效输出")
+def test_default_backend_is_null_off_windows(wav_path):
+    assert isinstance(create_sound_backend("null"), NullSoundBackend)
+    player = SoundPlayer(str(wav_path), min_interval=0)
+    try:
+        player.play()
+        assert wait_until(lambda: player.stats()["played"] == 1)
+        assert isinstance(player.active_backend, NullSoundBackend)
+    finally:
+        player.stop()